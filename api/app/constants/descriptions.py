@@ -5,6 +5,17 @@ Busca os detalhes completos de um imóvel rural utilizando o seu código oficial
 
 * **Validação**: O ID não pode ser apenas espaços em branco.
 * **Retorno**: Objeto contendo dados cadastrais e a geometria em formato GeoJSON.
+* **Projeção**: `fields` limita os atributos e `geometry` (`full`, `bbox`, `centroid`, `none`) a geometria.
+"""
+
+DESC_SOBREPOSICOES = """
+Lista as fazendas cujo polígono se sobrepõe ao do imóvel informado (CAR), da maior sobreposição para a menor.
+
+* **Performance**: As sobreposições são pré-calculadas pelo job `python -m scripts.overlaps` (tiles processados
+  em paralelo) e servidas por consulta indexada, sem `ST_Intersects` sobre a tabela inteira.
+* **Retorno**: Código, município e área de cada fazenda, a área sobreposta em m² (`overlap_area_m2`) e a fração
+  da área do imóvel informado que ela cobre (`overlap_ratio`).
+* **Atualização**: Reflete a base da última execução do job; rode-o novamente após um novo seed.
 """
 
 DESC_BUSCA_PONTO = """
@@ -12,14 +23,108 @@ Identifica quais fazendas englobam geograficamente o ponto (Latitude/Longitude)
 
 * **Geoprocessamento**: Utiliza a função `ST_Contains` do PostGIS.
 * **Paginação**: Suporta os parâmetros `page` e `size` no corpo da requisição.
+* **Cursor**: Envie o valor do header `X-Next-Cursor` no campo `cursor` para obter a próxima página
+  com custo constante (ordenação por `imovel_code`).
 * **Filtro Extra**: É possível filtrar por nome da cidade.
+* **Projeção**: `fields` e `geometry` (`full`, `bbox`, `centroid`, `none`) evitam ler e serializar o que não será usado.
+* **Zoom**: `zoom` devolve a geometria simplificada (níveis pré-calculados no seed) com precisão reduzida.
+* **Formatos binários**: Header `Accept` com Arrow IPC, GeoParquet ou FlatGeobuf (geometria em WKB).
+"""
+
+DESC_BUSCA_PONTO_LOTE = """
+Resolve várias coordenadas (ex.: pontos de GPS) em uma única requisição e consulta SQL.
+
+* **Geoprocessamento**: `unnest` das coordenadas + `JOIN LATERAL` com `ST_Contains` usando o índice GiST.
+* **Limites**: Até **1000** pontos por requisição e `size` fazendas por ponto.
+* **Retorno**: Objeto com as fazendas de cada ponto indexadas pela posição do ponto na lista.
 """
 
 DESC_BUSCA_RAIO = """
 Localiza todas as fazendas que possuem qualquer parte de seu território dentro do raio informado.
 
-* **Geoprocessamento**: Utiliza `ST_DWithin` para performance otimizada com índices GiST.
+* **Geoprocessamento**: Pré-filtro pelo retângulo envolvente do raio (`&&`, índice GiST) seguido de
+  `ST_DWithin` exato em `geography`.
 * **Limites**: O raio máximo permitido é de **500km** para evitar sobrecarga do servidor.
+* **Ordenação**: Resultados ordenados pela distância até o ponto (campo `distance_m`, em metros);
+  use o header `X-Next-Cursor` no campo `cursor` para paginar sem `OFFSET`.
+* **Projeção**: `fields` e `geometry` (`full`, `bbox`, `centroid`, `none`) evitam ler e serializar o que não será usado.
+* **Zoom**: `zoom` devolve a geometria simplificada (níveis pré-calculados no seed) com precisão reduzida.
+* **Formatos binários**: Header `Accept` com Arrow IPC, GeoParquet ou FlatGeobuf (geometria em WKB).
+* **Controle de carga**: Concorrência limitada por endpoint (429/503 com `Retry-After`) e consultas
+  com custo estimado (`EXPLAIN`) alto demais recusadas com 413.
+"""
+
+DESC_LOTE = """
+Resolve uma lista de códigos CAR (`ids`) em uma única requisição, para conciliações em lote.
+
+* **Performance**: Consultas indexadas `imovel_code = ANY(:ids)` em blocos, com a resposta enviada em streaming.
+* **Resposta**: `{"farms": [...], "missing": [...]}`; as fazendas seguem a ordem de entrada e têm o mesmo
+  formato de `GET /fazendas/{id}`. Os IDs não encontrados são listados em `missing`.
+* **Projeção**: `fields`, `geometry` e `zoom`, como nas demais buscas.
+* **Limites**: Até 50.000 IDs por requisição; IDs repetidos são retornados uma vez.
+"""
+
+DESC_BUSCA_AREA = """
+Localiza as fazendas que intersectam uma área desenhada pelo usuário (bacia hidrográfica, limite de município...).
+
+* **Área**: `area` (GeoJSON `Polygon`/`MultiPolygon`, WGS84) ou `bbox` (`[min_lon, min_lat, max_lon, max_lat]`).
+* **Geoprocessamento**: Polígonos grandes são divididos (`ST_Subdivide`); cada parte filtra pelo índice GiST (`&&`)
+  e os candidatos são confirmados com `ST_Intersects` exato.
+* **Interseção**: Com `intersection: true` cada fazenda traz `intersection_area_m2`, a área (m²) dentro da área buscada.
+* **Filtros e paginação**: Os mesmos da busca por ponto (`city`, `area_min`, `area_max`, `page`/`size` ou `cursor`).
+* **Projeção**: `fields`, `geometry` e `zoom`, como nas demais buscas.
+* **Formatos binários**: Header `Accept` com Arrow IPC, GeoParquet ou FlatGeobuf (geometria em WKB).
+* **Controle de carga**: Concorrência limitada por endpoint (429/503 com `Retry-After`) e consultas
+  com custo estimado (`EXPLAIN`) alto demais recusadas com 413.
+"""
+
+DESC_MUNICIPIOS = """
+Sugere nomes de municípios que começam com `q`, para autocompletar o filtro `city`.
+
+* **Busca**: Sem diferenciar acentos ou maiúsculas (`sao` encontra `São Paulo`).
+* **Performance**: Lista ordenada em memória (busca binária), atualizada a cada novo seed; não consulta o banco.
+"""
+
+DESC_PROXIMAS = """
+Retorna as `k` fazendas mais próximas do ponto (`lat`/`lon`), independente de raio.
+
+* **Geoprocessamento**: Operador KNN `<->` percorrendo o índice GiST para limitar a distância da
+  k-ésima fazenda, seguido de um `ST_DWithin` nesse raio ordenado pela distância geodésica (resultado exato).
+* **Retorno**: Lista ordenada pela distância (`distance_m`, em metros; 0 quando o ponto está dentro da fazenda).
+"""
+
+DESC_TILES = """
+Retorna as fazendas de um tile `{z}/{x}/{y}` (Web Mercator) no formato Mapbox Vector Tile.
+
+* **Geoprocessamento**: Utiliza `ST_AsMVTGeom`/`ST_AsMVT` com recorte e simplificação por nível de zoom.
+* **Cache**: Tiles ficam em cache (memória + disco) por versão do dataset e suportam `ETag`.
+* **Camada**: `farms`, com os atributos `imovel_code`, `city`, `area_size`, `status` e `type`.
+"""
+
+DESC_AGREGADOS = """
+Retorna as fazendas agregadas em células de uma grade, para mapas em zoom baixo
+(onde desenhar cada polígono seria ilegível e caro).
+
+* **Parâmetros**: `bbox` (`min_lon,min_lat,max_lon,max_lat`) e `zoom` do mapa.
+* **Células**: Grade de tiles Web Mercator, com 8x8 células por tile de 256px; cada fazenda
+  entra na célula do seu centróide.
+* **Resposta**: Quantidade de fazendas, soma de `area_size` e um ponto representativo
+  (média dos centróides) por célula.
+* **Performance**: Lido de uma pirâmide pré-calculada no seed, o custo não depende do número de fazendas.
+"""
+
+DESC_EXPORT = """
+Exporta **todas** as fazendas que atendem aos filtros, sem paginação, em streaming.
+
+* **Filtros**: `city`, `area_min`, `area_max` e, opcionalmente, um ponto (`latitude`/`longitude`)
+  com ou sem `raio_km`.
+* **Formatos**: `geojson` (FeatureCollection) ou `ndjson` (uma Feature por linha).
+* **Memória constante**: Leitura por cursor no servidor, independente do número de fazendas.
+* **Formatos binários**: Com o header `Accept` (`application/vnd.apache.arrow.stream`,
+  `application/vnd.apache.parquet` ou `application/flatgeobuf`) o arquivo é gerado direto das linhas
+  da consulta, com a geometria em WKB: bem menor e mais rápido de ler no GeoPandas que o GeoJSON.
+* **Controle de carga**: Concorrência limitada por endpoint (429/503 com `Retry-After`) e consultas
+  com custo estimado (`EXPLAIN`) alto demais recusadas com 413.
 """
 
 
@@ -29,6 +134,10 @@ INITIAL_DESCRIPTION = """
     ### Funcionalidades:
     * **Busca por Ponto**: Verifica se uma coordenada está dentro de uma fazenda.
     * **Busca por Raio**: Lista fazendas em um raio de distância (em km).
+    * **Busca por Área**: Fazendas que intersectam um polígono ou bbox.
+    * **Exportação**: GeoJSON/NDJSON em streaming para processamento em lote.
+    * **Tiles Vetoriais**: Fazendas em Mapbox Vector Tiles para o mapa.
+    * **Agregados**: Contagem e área total por célula para mapas em zoom baixo.
     * **Health Check**: Monitoramento de saúde da API e Banco de Dados.
     
     **Diferenciais Técnicos:** Paginação, Logs estruturados e Índices Espaciais.
@@ -7,14 +7,102 @@ FARM_BY_ID = responses = {
     500: {"description": "Erro interno no processamento espacial."}
 }
 
+FARM_OVERLAPS = {
+    200: {"description": "Fazendas sobrepostas ao imóvel (pode ser vazia)."},
+    400: {"description": "ID inválido ou mal formatado."},
+    404: {"description": "Nenhum imóvel encontrado com o ID fornecido."},
+    503: {"description": "Sobreposições ainda não calculadas (job scripts.overlaps)."}
+}
+
 FARMS_BY_POINTS = {
     200: {"description": "Lista de fazendas que contêm o ponto (pode ser vazia)."},
-    400: {"description": "Coordenadas fora dos limites geográficos aceitáveis."}
+    400: {"description": "Coordenadas fora dos limites geográficos aceitáveis."},
+    406: {"description": "Formato binário solicitado (Accept) não disponível no servidor."}
+}
+
+
+FARMS_BY_POINTS_BATCH = {
+    200: {"description": "Fazendas de cada ponto, indexadas pela posição do ponto."},
+    400: {"description": "Alguma coordenada está fora dos limites geográficos."},
+    422: {"description": "Lista de pontos vazia ou acima do limite por requisição."},
+    429: {"description": "Muitas requisições simultâneas neste endpoint (Retry-After)."},
+    503: {"description": "Servidor sobrecarregado ou consulta acima do tempo limite."}
 }
 
 
 FARMS_BY_RADIUS = {
     200: {"description": "Lista de fazendas encontradas no raio de busca."},
     400: {"description": "Valor de raio negativo ou coordenadas inválidas."},
-    413: {"description": "Raio de busca excede o limite de 500km."}
+    406: {"description": "Formato binário solicitado (Accept) não disponível no servidor."},
+    413: {"description": "Raio de busca excede o limite de 500km ou custo estimado da consulta alto demais."},
+    429: {"description": "Muitas requisições simultâneas neste endpoint (Retry-After)."},
+    503: {"description": "Servidor sobrecarregado ou consulta acima do tempo limite."}
+}
+
+
+FARMS_BY_IDS = {
+    200: {
+        "description": "Fazendas encontradas (em streaming) e a lista de IDs não encontrados.",
+        "content": {"application/json": {}}
+    },
+    400: {"description": "Lista com ID vazio."},
+    422: {"description": "Lista de IDs vazia ou acima do limite (50.000)."},
+    429: {"description": "Muitas requisições simultâneas neste endpoint (Retry-After)."},
+    503: {"description": "Servidor sobrecarregado ou consulta acima do tempo limite."}
+}
+
+
+FARMS_BY_AREA = {
+    200: {"description": "Lista de fazendas que intersectam a área."},
+    400: {"description": "Área ausente, duplicada (area e bbox), inválida ou com vértices demais."},
+    406: {"description": "Formato binário solicitado (Accept) não disponível no servidor."},
+    413: {"description": "Custo estimado da consulta alto demais: reduza a área ou adicione filtros."},
+    429: {"description": "Muitas requisições simultâneas neste endpoint (Retry-After)."},
+    503: {"description": "Servidor sobrecarregado ou consulta acima do tempo limite."}
+}
+
+
+FARM_TILES = {
+    200: {
+        "description": "Tile vetorial (pode ser vazio).",
+        "content": {"application/vnd.mapbox-vector-tile": {}}
+    },
+    304: {"description": "Tile não modificado desde a última requisição (ETag)."},
+    400: {"description": "Coordenadas de tile inválidas."}
+}
+
+
+FARMS_GRID = {
+    200: {"description": "Células com fazendas dentro do bbox (pode ser vazia)."},
+    400: {"description": "Bbox em formato inválido ou fora dos limites geográficos."},
+    422: {"description": "Zoom ausente ou fora do intervalo permitido (0 a 22)."}
+}
+
+
+FARMS_EXPORT = {
+    200: {
+        "description": "Fazendas em streaming no formato solicitado.",
+        "content": {
+            "application/geo+json": {}, "application/x-ndjson": {}, "application/vnd.apache.arrow.stream": {},
+            "application/vnd.apache.parquet": {}, "application/flatgeobuf": {}
+        }
+    },
+    400: {"description": "Filtro espacial incompleto ou inválido."},
+    406: {"description": "Formato binário solicitado (Accept) não disponível no servidor."},
+    413: {"description": "Custo estimado da exportação alto demais: adicione filtros."},
+    429: {"description": "Muitas requisições simultâneas neste endpoint (Retry-After)."},
+    503: {"description": "Servidor sobrecarregado ou consulta acima do tempo limite."}
+}
+
+
+FARMS_NEAREST = {
+    200: {"description": "Fazendas ordenadas pela distância até o ponto."},
+    400: {"description": "Coordenadas fora dos limites geográficos aceitáveis."},
+    422: {"description": "Valor de k fora do intervalo permitido (1 a 100)."}
+}
+
+
+CITIES_AUTOCOMPLETE = {
+    200: {"description": "Nomes de municípios em ordem alfabética (pode ser vazia)."},
+    422: {"description": "Parâmetro q ausente ou limit fora do intervalo permitido (1 a 50)."}
 }
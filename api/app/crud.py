@@ -1,38 +1,206 @@
+import asyncio
 import json
 import logging
+import time
+from contextlib import asynccontextmanager
+import shapely
+from sqlalchemy import Float, String, and_, any_, bindparam, cast, func, select, text, true, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
 from fastapi import HTTPException
-from geoalchemy2.functions import ST_Contains, ST_DWithin, ST_SetSRID, ST_Point, ST_AsGeoJSON
+from geoalchemy2 import Geography
+from geoalchemy2.functions import (
+    ST_Contains, ST_DWithin, ST_Distance, ST_MakeEnvelope, ST_SetSRID, ST_Point, ST_AsGeoJSON, ST_AsBinary,
+    ST_Centroid, ST_Envelope, ST_Intersects, ST_Intersection, ST_Area)
+from .database import AsyncSessionLocal
 from .models.farm import Farm
-from .schemas.farm import PointSearch, RadiusSearch, FilterParams
+from .schemas.farm import (
+    FARM_FIELDS, PointSearch, RadiusSearch, FilterParams, ExportRequest, BatchPointSearch, Projection,
+    AreaSearch, BatchIdLookup)
+from .services import cursors, metrics, spatial_index
+from .services.tile_cache import tile_cache
+from .services.pool_stats import pool_telemetry
+from .services.cache import COORDINATE_FIELDS, query_cache
+from .services.cities import normalize_city
+from .services.state_extents import state_extents
+from .services import admission, binary_formats, farm_grid, simplification
 
 logger = logging.getLogger(__name__)
 
+# Vector tiles settings: grid resolution, clipping buffer and how many screen
+# pixels (of a 256px tile) the geometries may be simplified at each zoom level
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+TILE_SIMPLIFY_PIXELS = 0.5
+WEB_MERCATOR_WORLD_SIZE = 40075016.68557849
 
-def apply_pagination(query, filters: FilterParams):
-    """It Calculates the displacement (offset) and limits the results"""
-    offset = (filters.page - 1) * filters.size
-    return query.offset(offset).limit(filters.size)
+# The KNN operator (<->) ranks by planar distance in degrees: its candidates only bound
+# the geodesic distance of the k-th farm. More of them give a tighter bound (radius of
+# the exact second pass), not a correct result
+KNN_OVERSAMPLING = 4
+# Slack (m) added to that bound, so float noise between ST_Distance and ST_DWithin
+# doesn't leave the k-th farm out
+KNN_BOUND_SLACK_M = 0.01
 
+# Large search polygons are split (ST_Subdivide) into pieces of at most this many
+# vertices: small bounding boxes keep the && probes on the GIST index selective
+AREA_SUBDIVIDE_VERTICES = 256
 
-def get_base_query(db: Session):
-    """Mandatory field to search farm"""
-    return db.query(
-        Farm.imovel_code, Farm.city, Farm.state_code,
-        Farm.area_size, Farm.fiscal_module, Farm.status,
-        Farm.type, Farm.created_at,
-        # convert spacial geometry to GeoJSON to plot
-        ST_AsGeoJSON(Farm.geometry).label("geometry")
+# Rows fetched per round trip from the server-side cursor of the export
+EXPORT_BATCH_SIZE = 1000
+
+# CAR codes resolved per query of a bulk lookup
+LOOKUP_CHUNK_SIZE = 1000
+
+TILE_QUERY_SQL = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(:z, :x, :y) AS geom
+    ),
+    mvtgeom AS (
+        SELECT ST_AsMVTGeom(
+                   ST_SimplifyPreserveTopology(ST_Transform(f.geometry, 3857), :tolerance),
+                   bounds.geom, :extent, :buffer, true) AS geom,
+               f.imovel_code, f.city, f.area_size, f.status, f.type
+        FROM farms f, bounds
+        WHERE f.geometry && ST_Transform(bounds.geom, 4326){states}
     )
+    SELECT ST_AsMVT(mvtgeom.*, 'farms', :extent, 'geom')
+    FROM mvtgeom
+    WHERE geom IS NOT NULL
+"""
+TILE_QUERY = text(TILE_QUERY_SQL.format(states=""))
+# Same tile restricted to the state partitions intersecting it
+TILE_QUERY_PRUNED = text(TILE_QUERY_SQL.format(states=" AND f.state_code = ANY(:states)")).bindparams(
+    bindparam("states", type_=ARRAY(String)))
+
+GRID_QUERY = text(f"""
+    SELECT farms, area_size, latitude, longitude
+    FROM {farm_grid.GRID_TABLE}
+    WHERE zoom = :zoom AND x BETWEEN :x0 AND :x1 AND y BETWEEN :y0 AND :y1
+    ORDER BY farms DESC
+    LIMIT :limit
+""")
+
+# Overlapping farm pairs (both directions), written by scripts/overlaps.py
+OVERLAPS_TABLE = "farm_overlaps"
+# The target farm row tells a missing farm (no rows) from a farm without overlaps (NULL overlap)
+OVERLAPS_QUERY = text(f"""
+    SELECT o.overlap_code AS imovel_code, f.city, f.area_size,
+           o.overlap_m2 AS overlap_area_m2, o.overlap_ratio
+    FROM farms t
+    LEFT JOIN {OVERLAPS_TABLE} o ON o.imovel_code = t.imovel_code
+    LEFT JOIN farms f ON f.imovel_code = o.overlap_code
+    WHERE t.imovel_code = :id
+    ORDER BY o.overlap_m2 DESC
+""")
+# SQLSTATE of a missing table: the overlaps job hasn't run on this database yet
+UNDEFINED_TABLE = "42P01"
+
+
+# CAR codes are ordered bytewise ("C"), like the str order of the in-memory backend: the
+# database collation (e.g. en_US) skips the hyphens and would page differently
+SORT_CODE = Farm.imovel_code.collate("C")
+
+
+def apply_pagination(query, filters: FilterParams, sort_keys=None):
+    """
+    It orders the results by the sort keys (imovel_code by default) and limits them.
+    With a cursor the page starts right after the last row already returned (keyset),
+    otherwise it calculates the displacement (offset) from the page number
+    """
+    sort_keys = sort_keys or [SORT_CODE]
+    query = query.order_by(*sort_keys)
+
+    if filters.cursor:
+        last_values = cursors.decode_cursor(filters.cursor, len(sort_keys))
+        query = query.filter(tuple_(*sort_keys) > tuple_(*last_values))
+    else:
+        query = query.offset((filters.page - 1) * filters.size)
+
+    return query.limit(filters.size)
+
+
+def next_cursor(results, filters: FilterParams, keys=("imovel_code",)):
+    """Token to fetch the page after these results (None on the last page)"""
+    if len(results) < filters.size:
+        return None
+    last = results[-1]
+    return cursors.encode_cursor([last[k] for k in keys])
+
+
+# Geometry of each mode, computed by PostGIS only when requested
+GEOMETRY_EXPRESSIONS = {
+    "full": lambda geom: geom,
+    "bbox": ST_Envelope,
+    "centroid": ST_Centroid,
+}
+
+
+def geometry_column(mode: str, zoom: int = None, wkb: bool = False):
+    """
+    GeoJSON (or WKB, for the binary formats) of the geometry for the mode. With a zoom the
+    precomputed simplified level is read instead of the original polygon and the GeoJSON
+    coordinates are rounded to the pixel
+    """
+    if zoom is None:
+        geom = GEOMETRY_EXPRESSIONS[mode](Farm.geometry)
+        return ST_AsBinary(geom) if wkb else ST_AsGeoJSON(geom)
+
+    geom = Farm.geometry
+    level = simplification.level_for_zoom(zoom)
+    if level is not None and mode == "full":
+        # Rows loaded before the levels existed fall back to the original polygon
+        geom = func.coalesce(getattr(Farm, simplification.level_column(level)), Farm.geometry)
+    if wkb:
+        return ST_AsBinary(GEOMETRY_EXPRESSIONS[mode](geom))
+    return ST_AsGeoJSON(GEOMETRY_EXPRESSIONS[mode](geom), simplification.precision_for_zoom(zoom))
+
+
+def farm_columns(projection: Projection = None, wkb: bool = False):
+    """
+    Farm fields selected by the projection (all of them by default). imovel_code is
+    always present (ordering and cursors) and the geometry is skipped when not wanted
+    """
+    fields = FARM_FIELDS if projection is None or projection.fields is None else projection.fields
+    columns = [getattr(Farm, f) for f in FARM_FIELDS if f == "imovel_code" or f in fields]
+
+    mode = "full" if projection is None else projection.geometry
+    if mode != "none":
+        # convert spacial geometry to GeoJSON to plot
+        columns.append(geometry_column(mode, projection and projection.zoom, wkb).label("geometry"))
+    return columns
+
+
+def get_base_query(db: Session, projection: Projection = None):
+    """ORM query with the farm fields, used by the sync scripts"""
+    return db.query(*farm_columns(projection))
+
+
+def get_base_select(projection: Projection = None, wkb: bool = False):
+    """Core select with the farm fields, shared by the sync and async paths"""
+    return select(*farm_columns(projection, wkb))
+
+
+def get_index_rows(db: Session):
+    """All farms with the API fields plus WKB geometry to build the in-memory replica"""
+    query = get_base_query(db).add_columns(ST_AsBinary(Farm.geometry).label("wkb"))
+    return query.all()
 
 
 def apply_extra_filters(query, filters: FilterParams):
     """
     Handling Edge Case: Empty Filters or Spaces within Strings
     """
-    if filters.city and filters.city.strip():
-        query = query.filter(Farm.city.ilike(f"%{filters.city.strip()}%"))
+    # Accent/case insensitive match on the seed-normalized column (GIN trigram index).
+    # The whole pattern is a single parameter, not a '%' || :city || '%' expression
+    city = normalize_city(filters.city)
+    if city:
+        escaped = city.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(Farm.city_norm.like(f"%{escaped}%", escape="\\"))
 
     if filters.area_min is not None:
         query = query.filter(Farm.area_size >= filters.area_min)
@@ -43,61 +211,436 @@ def apply_extra_filters(query, filters: FilterParams):
     return query
 
 
+def to_records(results):
+    """
+    It converts SQLAlchemy rows into dicts keeping the geometry as the GeoJSON
+    text produced by PostGIS (parsed only when the response needs it)
+    """
+    return [dict(r._asdict()) if hasattr(r, "_asdict") else dict(r) for r in results]
+
+
 def format_records(results):
     """
     Transforms the gross SQLAlchemy  result into clearly and Safe API JSON
     """
     output = []
-    for r in results:
+    for item in to_records(results):
         try:
-            item = dict(r._asdict())
-            if item.get("geometry"):
+            if isinstance(item.get("geometry"), str):
                 item["geometry"] = json.loads(item["geometry"])
             output.append(item)
         except (json.JSONDecodeError, TypeError) as e:
-            logger.error(
-                f"Erro ao decodificar geometria do imóvel {r.imovel_code}: {e}")
+            logger.error("Erro ao decodificar geometria do imóvel %s: %s", item.get('imovel_code'), e)
             continue  # Pula o registro corrompido mas não derruba a API
     return output
 
 
+def format_feature(row) -> str:
+    """
+    It builds a GeoJSON Feature splicing the geometry text produced by PostGIS,
+    so the export never parses the coordinates
+    """
+    item = dict(row._asdict())
+    # geometry=none exports features with a null geometry (valid GeoJSON)
+    geometry = item.pop("geometry", None) or "null"
+    return f'{{"type":"Feature","geometry":{geometry},"properties":{json.dumps(item)}}}'
+
+
+def join_features(features, ndjson: bool, first: bool) -> str:
+    """Joins a batch of features as NDJSON lines or FeatureCollection items"""
+    if ndjson:
+        return "\n".join(features) + "\n"
+    return ("" if first else ",") + ",".join(features)
+
+
+def prune_states(query, states):
+    """
+    Partition pruning: farms is partitioned by state_code, so a condition on it makes
+    PostgreSQL skip the partitions (and their indexes) of every other state.
+    None keeps the query as is (flat table or unknown extents)
+    """
+    if states is None:
+        return query
+    return query.filter(Farm.state_code == any_(bindparam("states", states, type_=ARRAY(String))))
+
+
+def point_bbox(longitude: float, latitude: float):
+    return longitude, latitude, longitude, latitude
+
+
+def build_by_id_query(farm_id: str, projection: Projection = None):
+    query = get_base_select(projection).filter(Farm.imovel_code == farm_id)
+    return prune_states(query, state_extents.states_of([farm_id])).limit(1)
+
+
+def build_by_ids_query(ids, projection: Projection = None):
+    """
+    A single array parameter (= ANY) instead of an IN list: same statement for
+    every chunk size, resolved with the imovel_code index
+    """
+    query = get_base_select(projection).filter(
+        Farm.imovel_code == any_(bindparam("ids", ids, type_=ARRAY(String))))
+    return prune_states(query, state_extents.states_of(ids))
+
+
+def build_point_query(payload: PointSearch, wkb: bool = False):
+    """Farms containing the point, filtered and paginated by imovel_code"""
+    # It creates a geografic point and define it as a WGS84
+    pt = ST_SetSRID(ST_Point(payload.longitude, payload.latitude), 4326)
+    query = get_base_select(payload, wkb)
+    # It check if this point is in farm geometry
+    query = query.filter(ST_Contains(Farm.geometry, pt))
+    query = prune_states(query, state_extents.states_for(point_bbox(payload.longitude, payload.latitude)))
+
+    # Applying extra filters
+    query = apply_extra_filters(query, payload)
+
+    # Applying pagination before executing the query
+    return apply_pagination(query, payload)
+
+
+def geodesic_distance(pt):
+    """Distance in meters on the spheroid between the farm and the point"""
+    return ST_Distance(
+        cast(Farm.geometry, Geography(srid=4326)), cast(pt, Geography(srid=4326)))
+
+
+def within_radius(longitude: float, latitude: float, radius_m: float):
+    """
+    Index friendly ST_DWithin: the bounding box of the circle (in degrees) is
+    matched with && against the GIST index on geometry, and only those candidates
+    are checked with the exact geography distance
+    """
+    pt = ST_SetSRID(ST_Point(longitude, latitude), 4326)
+    envelope = ST_MakeEnvelope(
+        *spatial_index.radius_bbox(longitude, latitude, radius_m), 4326)
+    return and_(
+        Farm.geometry.intersects(envelope),
+        ST_DWithin(cast(Farm.geometry, Geography(srid=4326)), cast(pt, Geography(srid=4326)), radius_m),
+    )
+
+
+def build_radius_query(payload: RadiusSearch, wkb: bool = False):
+    """Farms within the radius, filtered and paginated by distance"""
+    pt = ST_SetSRID(ST_Point(payload.longitude, payload.latitude), 4326)
+    # Geodesic distance (meters) used to order the results and as keyset cursor
+    distance = geodesic_distance(pt)
+    query = get_base_select(payload, wkb).add_columns(distance.label("distance_m"))
+    query = query.filter(
+        within_radius(payload.longitude, payload.latitude, payload.radius_km * 1000)
+    )
+    query = prune_states(query, state_extents.states_for(
+        spatial_index.radius_bbox(payload.longitude, payload.latitude, payload.radius_km * 1000)))
+
+    # Applying extra filters
+    query = apply_extra_filters(query, payload)
+
+    # Applying pagination ordered by distance before executing the query
+    return apply_pagination(query, payload, [distance, SORT_CODE])
+
+
+def build_area_query(payload: AreaSearch, area, wkb: bool = False):
+    """
+    Farms intersecting the area, filtered and paginated by imovel_code. Each piece of
+    the subdivided area probes the GIST index with && and the candidates are confirmed
+    with the exact ST_Intersects
+    """
+    states = state_extents.states_for(area.bounds)
+    area = func.ST_GeomFromGeoJSON(shapely.to_geojson(area))
+    pieces = select(func.ST_Subdivide(area, AREA_SUBDIVIDE_VERTICES).label("geom")).cte("area_pieces")
+    # A farm crossing several pieces is matched once (semi-join)
+    matches = prune_states(select(Farm.imovel_code).join(
+        pieces, and_(Farm.geometry.intersects(pieces.c.geom), ST_Intersects(Farm.geometry, pieces.c.geom))), states)
+    query = get_base_select(payload, wkb).filter(Farm.imovel_code.in_(matches))
+
+    if payload.intersection:
+        # Pieces don't overlap, so the areas of the per-piece intersections add up
+        overlap = (
+            select(func.sum(ST_Area(cast(ST_Intersection(Farm.geometry, pieces.c.geom), Geography(srid=4326)))))
+            .where(Farm.geometry.intersects(pieces.c.geom))
+            .scalar_subquery()
+        )
+        query = query.add_columns(overlap.label("intersection_area_m2"))
+
+    query = apply_extra_filters(query, payload)
+    return apply_pagination(query, payload)
+
+
+def build_nearest_bound_query(latitude: float, longitude: float, k: int):
+    """
+    First pass of the k nearest farms: the KNN operator walks the GIST index to get
+    candidates, and the k-th smallest of their geodesic distances bounds the true k-th
+    nearest farm (which planar degrees may rank elsewhere). Only codes and distances
+    are read here, the rows come from the exact second pass
+    """
+    pt = ST_SetSRID(ST_Point(longitude, latitude), 4326)
+    candidates = (
+        select(Farm.imovel_code, geodesic_distance(pt).label("distance_m"))
+        .order_by(Farm.geometry.distance_centroid(pt))
+        .limit(k * KNN_OVERSAMPLING)
+        .subquery("candidates")
+    )
+    nearest = select(candidates.c.distance_m).order_by(candidates.c.distance_m).limit(k).subquery("nearest")
+    return select(func.max(nearest.c.distance_m))
+
+
+def build_nearest_within_query(
+        latitude: float, longitude: float, k: int, radius_m: float, projection: Projection = None):
+    """
+    Exact second pass: every farm within the bounded geodesic distance (index friendly
+    ST_DWithin), ranked by that distance
+    """
+    pt = ST_SetSRID(ST_Point(longitude, latitude), 4326)
+    distance = geodesic_distance(pt).label("distance_m")
+    query = get_base_select(projection).add_columns(distance).filter(within_radius(longitude, latitude, radius_m))
+    query = prune_states(query, state_extents.states_for(spatial_index.radius_bbox(longitude, latitude, radius_m)))
+    return query.order_by(distance, SORT_CODE).limit(k)
+
+
+def build_batch_point_query(payload: BatchPointSearch):
+    """
+    It resolves every coordinate in one statement: the points are unnested from two
+    arrays and each one probes the GIST index through a LATERAL subquery
+    """
+    points = func.unnest(
+        bindparam("lons", [p.longitude for p in payload.points], type_=ARRAY(Float)),
+        bindparam("lats", [p.latitude for p in payload.points], type_=ARRAY(Float)),
+    ).table_valued("lon", "lat", with_ordinality="idx").render_derived(name="pts")
+
+    pt = ST_SetSRID(ST_Point(points.c.lon, points.c.lat), 4326)
+    farms = get_base_select(payload).filter(ST_Contains(Farm.geometry, pt))
+    lons = [p.longitude for p in payload.points]
+    lats = [p.latitude for p in payload.points]
+    farms = prune_states(farms, state_extents.states_for((min(lons), min(lats), max(lons), max(lats))))
+    farms = apply_extra_filters(farms, payload)
+    farms = farms.order_by(SORT_CODE).limit(payload.size).lateral("f")
+
+    return (
+        select((points.c.idx - 1).label("idx"), farms)
+        .select_from(points)
+        .join(farms, true())
+        .order_by(points.c.idx)
+    )
+
+
+def group_by_index(rows, total: int):
+    """Groups (idx, farm...) rows into one list of records per input coordinate"""
+    groups = {i: [] for i in range(total)}
+    for item in to_records(rows):
+        groups[item.pop("idx")].append(item)
+    return groups
+
+
+async def checkout(db: AsyncSession):
+    """
+    Acquires the session connection timing the pool wait (request stage and pool telemetry).
+    A session inside a transaction already holds its connection: nothing to time
+    """
+    if db.in_transaction():
+        return
+    with metrics.stage("pool"), pool_telemetry.checkout():
+        await db.connection()
+
+
+# SQLSTATE of a statement cancelled by statement_timeout (or pg_cancel_backend)
+QUERY_CANCELED = "57014"
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a select, with the same bound parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def set_statement_timeout(db: AsyncSession, kind: str):
+    """SET LOCAL: the timeout of the query kind lasts until the end of the transaction"""
+    timeout = admission.statement_timeout(kind)
+    if timeout is not None:
+        await db.execute(text(f"SET LOCAL statement_timeout = {int(timeout)}"))
+
+
+async def execute(db: AsyncSession, query, params=None, kind: str = None):
+    """
+    Runs the query timing the connection pool checkout and the execution
+    (statement plus row fetch) as stages of the current request. A query
+    cancelled by its statement_timeout is answered with 503
+    """
+    await checkout(db)
+    if kind:
+        await set_statement_timeout(db, kind)
+    with metrics.stage("db"):
+        try:
+            return await db.execute(query, params)
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != QUERY_CANCELED and getattr(e.orig, "pgcode", None) != QUERY_CANCELED:
+                raise
+            logger.warning("Consulta cancelada por tempo limite (%s).", kind or "padrão")
+            raise HTTPException(
+                status_code=503, detail="A consulta excedeu o tempo limite. Refine a busca (raio, área ou filtros).")
+
+
+async def estimated_cost(db: AsyncSession, query) -> float:
+    """Planner total cost of the query, without running it"""
+    await checkout(db)
+    with metrics.stage("db"):
+        plan = (await db.execute(Explain(query))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+@asynccontextmanager
+async def admitted(db: AsyncSession, query):
+    """
+    Cost based admission of a heavy search: from the EXPLAIN estimate the query is
+    rejected (above QUERY_COST_MAX), waits for the heavy lane (above the budget) or runs
+    """
+    if not admission.QUERY_COST_CHECK:
+        yield
+        return
+
+    cost = await estimated_cost(db, query)
+    admission.check_cost(cost)
+    if cost <= admission.QUERY_COST_BUDGET:
+        yield
+        return
+
+    logger.info("Consulta acima do orçamento (custo %.0f): fila de consultas pesadas.", cost)
+    async with admission.heavy_lane.slot():
+        yield
+
+
+def warmup_queries():
+    """
+    The fixed query shapes of the hot endpoints, with parameters that match nothing:
+    running them prepares their server-side statements on the connection
+    """
+    probe = PointSearch(latitude=0.0, longitude=0.0)
+    return [
+        (build_by_id_query("__warmup__"), None),
+        (build_point_query(probe), None),
+        (build_radius_query(RadiusSearch(latitude=0.0, longitude=0.0, radius_km=0.001)), None),
+        (build_nearest_bound_query(0.0, 0.0, 1), None),
+        (build_nearest_within_query(0.0, 0.0, 1, 1.0), None),
+        (GRID_QUERY, {"zoom": 0, "x0": 0, "y0": 0, "x1": -1, "y1": -1, "limit": 1}),
+    ]
+
+
+async def warm_up_pool(connections: int):
+    """
+    Opens the pool connections concurrently (one session each) and prepares the
+    hot statements on every one of them, so the first requests don't pay for it
+    """
+    async def warm(db: AsyncSession):
+        await db.connection()
+        for query, params in warmup_queries():
+            try:
+                await db.execute(query, params)
+            except SQLAlchemyError as e:
+                # e.g. farm_grid missing before the first seed: skip that statement
+                logger.warning("Aquecimento: consulta ignorada (%s)", e.__class__.__name__)
+                await db.rollback()
+
+    start = time.perf_counter()
+    sessions = [AsyncSessionLocal() for _ in range(connections)]
+    try:
+        await asyncio.gather(*(warm(db) for db in sessions))
+    finally:
+        await asyncio.gather(*(db.close() for db in sessions))
+    logger.info(
+        "Pool aquecido: %s conexões e %s consultas preparadas em %.2fs",
+        connections, len(warmup_queries()), time.perf_counter() - start)
+
+
 def get_by_id(db: Session, farm_id: str):
     try:
-        result = get_base_query(db)
-        result = result.filter(Farm.imovel_code == farm_id).first()
+        result = db.execute(build_by_id_query(farm_id)).first()
         if result:
             return format_records([result])[0]
         return None
     except SQLAlchemyError as e:
-        logger.error(f"Erro no banco ao buscar ID {farm_id}: {e}")
+        logger.error("Erro no banco ao buscar ID %s: %s", farm_id, e)
         raise HTTPException(
             status_code=500, detail="Erro interno na consulta ao banco de dados.")
 
 
-def search_by_point(db: Session, payload: PointSearch):
+def cache_params(payload):
     """
-    It searchs farms cointaing the location specified with support for pagination filters
+    Normalized cache key params and the payload with the same rounded coordinates,
+    so a cached entry is exactly what the query would return for any request sharing it.
+    Without a cache the payload is left untouched (exact coordinates)
     """
-    try:
-        # It creates a geografic point and define it as a WGS84
-        pt = ST_SetSRID(ST_Point(payload.longitude, payload.latitude), 4326)
-        query = get_base_query(db)
-        # It check if this point is in farm geometry
-        query = query.filter(ST_Contains(Farm.geometry, pt))
+    params = query_cache.normalize(payload.model_dump())
+    if not query_cache.enabled:
+        return params, payload
+    rounded = payload.model_copy(update={f: params[f] for f in COORDINATE_FIELDS})
+    return params, rounded
+
+
+async def get_by_id_async(db: AsyncSession, farm_id: str, projection: Projection = None):
+    """Returns the raw record (GeoJSON text geometry) or None"""
+    projection = projection or Projection()
 
-        # Applying extra filters
-        query = apply_extra_filters(query, payload)
+    async def load():
+        try:
+            result = (await execute(db, build_by_id_query(farm_id, projection))).first()
+            if result:
+                with metrics.stage("format"):
+                    return to_records([result])[0]
+            return None
+        except SQLAlchemyError as e:
+            logger.error("Erro no banco ao buscar ID %s: %s", farm_id, e)
+            raise HTTPException(
+                status_code=500, detail="Erro interno na consulta ao banco de dados.")
+
+    return await query_cache.get_or_load("id", {"id": farm_id, **projection.model_dump()}, load)
 
-        # Applying pagination before executing the query
-        query = apply_pagination(query, payload)
 
-        return format_records(query.all())
+def search_by_point(db: Session, payload: PointSearch):
+    """
+    It searchs farms cointaing the location specified with support for pagination filters
+    """
+    if spatial_index.is_active():
+        return format_records(spatial_index.farm_index.search_by_point(payload))
+
+    try:
+        return format_records(db.execute(build_point_query(payload)).all())
     except SQLAlchemyError as e:
-        logger.error(f"Erro espacial (Point): {e}")
+        logger.error("Erro espacial (Point): %s", e)
         raise HTTPException(
             status_code=500, detail="Falha ao processar consulta geoespacial.")
 
 
+async def search_by_point_async(db: AsyncSession, payload: PointSearch):
+    """
+    Async variant of search_by_point: the event loop keeps serving other
+    requests while PostGIS evaluates the query. Records keep the raw geometry text
+    """
+    params, payload = cache_params(payload)
+
+    async def load():
+        if spatial_index.is_active():
+            return spatial_index.farm_index.search_by_point(payload)
+
+        try:
+            result = await execute(db, build_point_query(payload))
+            with metrics.stage("format"):
+                return to_records(result.all())
+        except SQLAlchemyError as e:
+            logger.error("Erro espacial (Point): %s", e)
+            raise HTTPException(
+                status_code=500, detail="Falha ao processar consulta geoespacial.")
+
+    return await query_cache.get_or_load("point", params, load)
+
+
 def search_by_radius(db: Session, payload: RadiusSearch):
     """
     Busca fazendas em um raio informado com suporte a filtros e PAGINAÇÃO.
@@ -106,21 +649,327 @@ def search_by_radius(db: Session, payload: RadiusSearch):
     if payload.radius_km < 0:
         return []
 
+    if spatial_index.is_active():
+        return format_records(spatial_index.farm_index.search_by_radius(payload))
+
+    try:
+        return format_records(db.execute(build_radius_query(payload)).all())
+    except SQLAlchemyError as e:
+        logger.error("Erro espacial (Radius): %s", e)
+        raise HTTPException(
+            status_code=500, detail="Falha ao processar consulta por raio.")
+
+
+async def search_by_radius_async(db: AsyncSession, payload: RadiusSearch):
+    """
+    Async variant of search_by_radius. Records keep the raw geometry text
+    """
+    if payload.radius_km < 0:
+        return []
+
+    params, payload = cache_params(payload)
+
+    async def load():
+        if spatial_index.is_active():
+            return spatial_index.farm_index.search_by_radius(payload)
+
+        try:
+            query = build_radius_query(payload)
+            async with admitted(db, query):
+                result = await execute(db, query, kind="radius")
+            with metrics.stage("format"):
+                return to_records(result.all())
+        except SQLAlchemyError as e:
+            logger.error("Erro espacial (Radius): %s", e)
+            raise HTTPException(
+                status_code=500, detail="Falha ao processar consulta por raio.")
+
+    return await query_cache.get_or_load("radius", params, load)
+
+
+async def search_by_points_async(db: AsyncSession, payload: BatchPointSearch):
+    """
+    It returns the farms containing each coordinate, keyed by the input index
+    """
+    if spatial_index.is_active():
+        return spatial_index.farm_index.search_by_points(payload)
+
+    try:
+        result = await execute(db, build_batch_point_query(payload))
+        with metrics.stage("format"):
+            return group_by_index(result.all(), len(payload.points))
+    except SQLAlchemyError as e:
+        logger.error("Erro espacial (Batch Point): %s", e)
+        raise HTTPException(
+            status_code=500, detail="Falha ao processar consulta geoespacial em lote.")
+
+
+async def search_by_area_async(db: AsyncSession, payload: AreaSearch, area):
+    """
+    It returns the farms intersecting the area (shapely geometry already validated),
+    with support for pagination. Records keep the raw geometry text
+    """
+    params = query_cache.normalize(payload.model_dump())
+
+    async def load():
+        if spatial_index.is_active():
+            return spatial_index.farm_index.search_by_area(payload, area)
+
+        try:
+            query = build_area_query(payload, area)
+            async with admitted(db, query):
+                result = await execute(db, query, kind="area")
+            with metrics.stage("format"):
+                return to_records(result.all())
+        except SQLAlchemyError as e:
+            logger.error("Erro espacial (Area): %s", e)
+            raise HTTPException(
+                status_code=500, detail="Falha ao processar consulta por área.")
+
+    return await query_cache.get_or_load("area", params, load)
+
+
+async def search_nearest_async(
+        db: AsyncSession, latitude: float, longitude: float, k: int, projection: Projection = None):
+    """
+    It returns the k farms closest to the point, ordered by distance
+    """
+    if spatial_index.is_active():
+        return spatial_index.farm_index.search_nearest(latitude, longitude, k, projection)
+
+    try:
+        bound = (await execute(db, build_nearest_bound_query(latitude, longitude, k))).scalar()
+        # No farm at all. With fewer than k, the bound is the farthest one: all are read
+        if bound is None:
+            return []
+        result = await execute(
+            db, build_nearest_within_query(latitude, longitude, k, bound + KNN_BOUND_SLACK_M, projection))
+        with metrics.stage("format"):
+            return to_records(result.all())
+    except SQLAlchemyError as e:
+        logger.error("Erro espacial (KNN): %s", e)
+        raise HTTPException(
+            status_code=500, detail="Falha ao processar consulta de fazendas próximas.")
+
+
+async def get_tile(db: AsyncSession, z: int, x: int, y: int) -> bytes:
+    """
+    It renders a Mapbox Vector Tile with the farms clipped to the tile and
+    simplified according to the zoom level
+    """
+    tolerance = WEB_MERCATOR_WORLD_SIZE / (256 * 2 ** z) * TILE_SIMPLIFY_PIXELS
+    params = {
+        "z": z, "x": x, "y": y, "tolerance": tolerance,
+        "extent": TILE_EXTENT, "buffer": TILE_BUFFER,
+    }
+    states = state_extents.states_for(farm_grid.tile_bounds(z, x, y))
+    if states is None:
+        result = await execute(db, TILE_QUERY, params)
+    else:
+        result = await execute(db, TILE_QUERY_PRUNED, {**params, "states": states})
+    tile = result.scalar()
+    return bytes(tile) if tile else b""
+
+
+async def get_grid_cells_async(db: AsyncSession, bbox, zoom: int):
+    """
+    It returns the aggregated cells covering the bbox at the map zoom, read from
+    the pyramid built at seed time (cost bounded by the cells, not by the farms)
+    """
+    level = farm_grid.cell_zoom(zoom)
+    x0, y0, x1, y1 = farm_grid.cell_range(bbox, level)
+    # Every bbox inside the same cells shares the cache entry
+    params = {"zoom": level, "x0": x0, "y0": y0, "x1": x1, "y1": y1}
+
+    async def load():
+        try:
+            result = await execute(db, GRID_QUERY, {**params, "limit": farm_grid.GRID_MAX_CELLS})
+            with metrics.stage("format"):
+                return [dict(row._mapping) for row in result.all()]
+        except SQLAlchemyError as e:
+            logger.error("Erro ao consultar agregados: %s", e)
+            raise HTTPException(
+                status_code=500, detail="Falha ao consultar agregados de fazendas.")
+
+    return await query_cache.get_or_load("grid", params, load)
+
+
+async def get_overlaps_async(db: AsyncSession, farm_id: str):
+    """
+    Farms overlapping the farm, largest overlap first, read from the precomputed pairs
+    (primary key lookup). None when the farm doesn't exist
+    """
+    try:
+        result = await execute(db, OVERLAPS_QUERY, {"id": farm_id})
+        rows = result.all()
+    except DBAPIError as e:
+        if getattr(e.orig, "sqlstate", None) != UNDEFINED_TABLE and getattr(e.orig, "pgcode", None) != UNDEFINED_TABLE:
+            logger.error("Erro ao consultar sobreposições de %s: %s", farm_id, e)
+            raise HTTPException(
+                status_code=500, detail="Falha ao consultar sobreposições.")
+        logger.warning("Tabela %s inexistente: execute python -m scripts.overlaps.", OVERLAPS_TABLE)
+        raise HTTPException(
+            status_code=503, detail="Sobreposições ainda não calculadas para esta base.")
+    except SQLAlchemyError as e:
+        logger.error("Erro ao consultar sobreposições de %s: %s", farm_id, e)
+        raise HTTPException(
+            status_code=500, detail="Falha ao consultar sobreposições.")
+
+    if not rows:
+        return None
+    with metrics.stage("format"):
+        return [dict(row._mapping) for row in rows if row.imovel_code is not None]
+
+
+async def get_cached_tile(db: AsyncSession, version: int, z: int, x: int, y: int) -> bytes:
+    """Serves the tile from the cache, rendering and storing it on a miss"""
+    tile = tile_cache.get(version, z, x, y)
+    if tile is not None:
+        return tile
+
     try:
+        tile = await get_tile(db, z, x, y)
+    except SQLAlchemyError as e:
+        logger.error("Erro ao gerar tile %s/%s/%s: %s", z, x, y, e)
+        raise HTTPException(
+            status_code=500, detail="Falha ao gerar tile vetorial.")
+
+    tile_cache.put(version, z, x, y, tile)
+    return tile
+
+
+def build_export_query(payload: ExportRequest, wkb: bool = False):
+    """Same filters of the searches, without pagination"""
+    query = get_base_select(payload, wkb)
+    if payload.latitude is not None:
         pt = ST_SetSRID(ST_Point(payload.longitude, payload.latitude), 4326)
-        query = get_base_query(db)
-        query = query.filter(
-            ST_DWithin(Farm.geometry, pt, payload.radius_km * 1000, True)
-        )
+        if payload.radius_km is not None:
+            query = query.filter(
+                within_radius(payload.longitude, payload.latitude, payload.radius_km * 1000))
+            bbox = spatial_index.radius_bbox(payload.longitude, payload.latitude, payload.radius_km * 1000)
+        else:
+            query = query.filter(ST_Contains(Farm.geometry, pt))
+            bbox = point_bbox(payload.longitude, payload.latitude)
+        query = prune_states(query, state_extents.states_for(bbox))
+
+    return apply_extra_filters(query, payload)
+
+
+async def stream_export(payload: ExportRequest):
+    """
+    It streams every matching farm as GeoJSON (FeatureCollection or one Feature
+    per line) reading from a server-side cursor, so memory stays constant
+    """
+    # The response outlives the request dependencies, so the stream owns its session
+    total = 0
+    async with AsyncSessionLocal() as db:
+        try:
+            await checkout(db)
+            await set_statement_timeout(db, "export")
+            query = build_export_query(payload).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            result = await db.stream(query)
 
-        # Applying extra filters
-        query = apply_extra_filters(query, payload)
+            ndjson = payload.format == "ndjson"
+            if not ndjson:
+                yield '{"type":"FeatureCollection","features":['
 
-        # Applying pagination before executing the query
-        query = apply_pagination(query, payload)
+            async for rows in result.partitions(EXPORT_BATCH_SIZE):
+                yield join_features([format_feature(r) for r in rows], ndjson, first=total == 0)
+                total += len(rows)
 
-        return format_records(query.all())
+            if not ndjson:
+                yield "]}\n"
+            logger.info("Exportação finalizada: %s imóveis enviados.", total)
+        except SQLAlchemyError as e:
+            # Headers were already sent: the client sees a truncated stream
+            logger.error("Erro no banco durante a exportação após %s imóveis: %s", total, e)
+            raise
+
+
+async def search_rows_async(db: AsyncSession, query, kind: str = None):
+    """
+    Column names and raw rows (WKB geometry) of a search for the binary formats:
+    the rows go straight to the encoder, without records nor the query cache.
+    Heavy kinds (radius, area) go through the same cost admission of the JSON path
+    """
+    try:
+        if kind:
+            async with admitted(db, query):
+                result = await execute(db, query, kind=kind)
+        else:
+            result = await execute(db, query)
+        return list(result.keys()), result.all()
     except SQLAlchemyError as e:
-        logger.error(f"Erro espacial (Radius): {e}")
+        logger.error("Erro espacial (formato binário): %s", e)
         raise HTTPException(
-            status_code=500, detail="Falha ao processar consulta por raio.")
+            status_code=500, detail="Falha ao processar consulta geoespacial.")
+
+
+async def check_export_cost(db: AsyncSession, payload: ExportRequest):
+    """Rejects (413) an export whose estimated cost is above QUERY_COST_MAX, before streaming"""
+    if not admission.QUERY_COST_CHECK:
+        return
+    try:
+        admission.check_cost(await estimated_cost(db, build_export_query(payload)))
+    except SQLAlchemyError as e:
+        logger.error("Erro ao estimar o custo da exportação: %s", e)
+        raise HTTPException(
+            status_code=500, detail="Falha ao processar a exportação.")
+
+
+async def stream_export_binary(payload: ExportRequest, media_type: str):
+    """
+    Same rows of stream_export encoded in a binary format (Arrow IPC, GeoParquet,
+    FlatGeobuf) batch by batch, with the geometry read as WKB
+    """
+    total = 0
+    writer = None
+    async with AsyncSessionLocal() as db:
+        try:
+            await checkout(db)
+            await set_statement_timeout(db, "export")
+            query = build_export_query(payload, wkb=True).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            result = await db.stream(query)
+            writer = binary_formats.encoder(media_type, list(result.keys()))
+
+            async for rows in result.partitions(EXPORT_BATCH_SIZE):
+                chunk = writer.write(rows)
+                total += len(rows)
+                if chunk:
+                    yield chunk
+
+            for chunk in writer.finish():
+                yield chunk
+            logger.info("Exportação (%s) finalizada: %s imóveis enviados.", media_type, total)
+        except SQLAlchemyError as e:
+            # Headers were already sent: the client sees a truncated stream
+            logger.error("Erro no banco durante a exportação após %s imóveis: %s", total, e)
+            raise
+        finally:
+            # Also on an aborted stream (error or client gone): temporary files are released
+            if writer is not None:
+                writer.close()
+
+
+async def stream_by_ids(payload: BatchIdLookup):
+    """
+    It resolves the CAR codes in chunks, yielding (records, missing ids) per chunk.
+    Records follow the input order and have the same fields of get_by_id_async
+    """
+    # Repeated codes are resolved (and returned) once
+    ids = list(dict.fromkeys(payload.ids))
+    total = 0
+    # The response outlives the request dependencies, so the stream owns its session
+    async with AsyncSessionLocal() as db:
+        try:
+            for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+                chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+                result = await execute(db, build_by_ids_query(chunk, payload), kind="lote")
+                found = {r["imovel_code"]: r for r in to_records(result.all())}
+                total += len(found)
+                yield [found[i] for i in chunk if i in found], [i for i in chunk if i not in found]
+            logger.info("Busca em lote finalizada: %s de %s imóveis encontrados.", total, len(ids))
+        except SQLAlchemyError as e:
+            # Headers were already sent: the client sees a truncated stream
+            logger.error("Erro no banco durante a busca em lote após %s imóveis: %s", total, e)
+            raise
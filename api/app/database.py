@@ -1,14 +1,54 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL", "postgresql://admin:password@db:5432/meuat_geo")
+# Same database through asyncpg, used by the API request handlers
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    make_url(DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False))
 
-engine = create_engine(DATABASE_URL)
+# Connection pool: persistent connections per worker process plus the burst overflow.
+# Requests wait up to DB_POOL_TIMEOUT seconds for a connection before failing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this (seconds) are replaced, before a proxy/firewall drops them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Server-side prepared statements kept per asyncpg connection: each query shape is parsed
+# by PostgreSQL once per connection (and its plan can be reused) instead of on every request
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# Default statement_timeout (ms, 0 = none) of the API connections: a runaway query is
+# cancelled by PostgreSQL instead of holding its connection. Heavy kinds override it
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "10000"))
+# Connections opened (and their statements prepared) before the API reports ready
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **POOL_OPTIONS,
+    connect_args={
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)},
+    })
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -16,3 +56,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,16 +1,51 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.constants import descriptions
 import logging
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers import farms, infra
-from app.logging_config import setup_logging
+from app.logging_config import RequestIdMiddleware, setup_logging
+from app.services import spatial_index
+from app.services.dataset_version import dataset_watcher
+from app.services.tile_cache import tile_cache
+from app.services.cache import query_cache
+from app.services.cities import city_index
+from app.services.state_extents import state_extents
+from app.services import admission, metrics
+from app.database import DB_POOL_WARMUP, async_engine, engine
+from app import crud
 
 # Setting Structured Logger
 setup_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Loads in-memory replicas before serving and keeps them in sync with the dataset"""
+    if spatial_index.SEARCH_BACKEND == "memory":
+        logger.info("Backend de busca em memória habilitado.")
+        dataset_watcher.subscribe(spatial_index.farm_index.reload)
+    dataset_watcher.subscribe(tile_cache.prune)
+    dataset_watcher.subscribe(city_index.reload)
+    dataset_watcher.subscribe(state_extents.reload)
+    # After the replica reload, so no entry of the new version is built from old data
+    dataset_watcher.subscribe(query_cache.on_version_change)
+    dataset_watcher.start()
+    if DB_POOL_WARMUP > 0:
+        # Before the app reports ready: connections opened, hot statements prepared
+        try:
+            await crud.warm_up_pool(DB_POOL_WARMUP)
+        except Exception as e:
+            logger.warning("Falha ao aquecer o pool de conexões: %s", e)
+    yield
+    dataset_watcher.stop()
+    await async_engine.dispose()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="🛰️ Fazendas SP - API Geoespacial",
     description=descriptions.INITIAL_DESCRIPTION,
     version="1.0.0",
@@ -20,14 +55,28 @@ app = FastAPI(
     }
 )
 
+# Innermost: a client that disconnects cancels its handler and the query it runs
+app.add_middleware(admission.CancelOnDisconnectMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Em produção, use apenas o endereço do seu front
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the keyset pagination token
+    expose_headers=["X-Next-Cursor", "Server-Timing", "X-Request-ID"],
 )
 
+if metrics.METRICS_ENABLED:
+    # Wraps CORS and the routes, so it times the whole request
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+
+# Outermost: every record logged while serving the request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 # Including Routers
 app.include_router(farms.router)
 app.include_router(infra.router)
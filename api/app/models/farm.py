@@ -8,10 +8,16 @@ class Farm(Base):
 
     imovel_code = Column(String, primary_key=True, index=True)  # cod_imovel
     city = Column(String, index=True)                         # municipio
-    state_code = Column(String)                               # cod_estado
+    city_norm = Column(String)                                # municipio sem acentos/minúsculo
+    state_code = Column(String, primary_key=True)             # cod_estado, partition key
     area_size = Column(Float)                                 # num_area
     fiscal_module = Column(Float)                             # mod_fiscal
     status = Column(String)                                   # ind_status
     type = Column(String)                                     # ind_tipo
     created_at = Column(String)                               # dat_criaca
     geometry = Column(Geometry('POLYGON', srid=4326))
+    # Topology-safe simplified copies for zoomed-out maps (services/simplification.py)
+    geom_z6 = Column(Geometry(srid=4326))
+    geom_z10 = Column(Geometry(srid=4326))
+    geom_z14 = Column(Geometry(srid=4326))
+    row_hash = Column(String)                                 # md5, incremental seed
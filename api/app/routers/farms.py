@@ -1,81 +1,312 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from app.services import validators
 from app.constants import descriptions, responses
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
 import logging
-from ..database import get_db
+from ..database import get_async_db
 from .. import crud
-from ..schemas.farm import FarmResponse, PointSearch, RadiusSearch
+from ..services import admission, binary_formats, serializers
+from ..services.dataset_version import dataset_watcher
+from ..services.tile_cache import tile_key
+from ..services.cities import city_index
+from ..schemas.farm import (
+    FarmField, FarmOverlap, FarmResponse, GeometryMode, GridCell, PointSearch, Projection, RadiusSearch, ExportRequest,
+    BatchPointSearch, AreaSearch, BatchIdLookup)
 
 # The logger uses the StructuredFormatter defined in setup_logging
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/fazendas", tags=["Fazendas"])
 
 
+ACCEPT_DESCRIPTION = (
+    "application/json (padrão), application/vnd.apache.arrow.stream, "
+    "application/vnd.apache.parquet ou application/flatgeobuf")
+
+
+async def binary_search(db: AsyncSession, query, media_type: str, payload, keys=("imovel_code",), kind=None):
+    """Search page in a binary format, with the same X-Next-Cursor of the JSON response"""
+    columns, rows = await crud.search_rows_async(db, query, kind)
+    cursor = crud.next_cursor([r._mapping for r in rows], payload, keys)
+    headers = {"X-Next-Cursor": cursor} if cursor else {}
+    return serializers.render_binary(media_type, columns, rows, headers)
+
+
+def admitted_stream(slot, stream, **kwargs):
+    """
+    StreamingResponse keeping the admission slot until the body is sent: the stream
+    releases it when it ends and the background task if the stream never started
+    """
+    release = BackgroundTask(slot.release) if slot else None
+    return StreamingResponse(admission.held(slot, stream), background=release, **kwargs)
+
+
+def projection_params(
+    fields: Optional[List[FarmField]] = Query(
+        None, description="Atributos retornados (repetível: ?fields=city&fields=area_size)"),
+    geometry: GeometryMode = Query("full", description="full, bbox, centroid ou none"),
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Zoom do mapa (geometria simplificada)")
+) -> Projection:
+    """Sparse fieldset of the GET endpoints (the POST ones take it in the body)"""
+    return Projection(fields=fields, geometry=geometry, zoom=zoom)
+
+
+# Declared before "/{id}" so the path isn't taken as a CAR code
+@router.get(
+    "/municipios",
+    response_model=List[str],
+    summary="Autocompletar municípios",
+    description=descriptions.DESC_MUNICIPIOS,
+    responses=responses.CITIES_AUTOCOMPLETE
+)
+async def get_cities(
+    q: str = Query(..., min_length=1, max_length=100, description="Início do nome do município"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugestões")
+):
+    """
+    It returns the city names starting with q (accent and case insensitive)
+    """
+    logger.info("Requisição municipios: q=%s, limit=%s", q, limit)
+
+    try:
+        return city_index.suggest(q, limit)
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint municipios: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+
+@router.get(
+    "/agregados",
+    response_model=List[GridCell],
+    summary="Agregados de fazendas por célula (mapa em zoom baixo)",
+    description=descriptions.DESC_AGREGADOS,
+    responses=responses.FARMS_GRID
+)
+async def get_grid(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: int = Query(..., ge=0, le=22, description="Zoom do mapa"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    It returns the farm count, total area and a representative point of each grid cell in the bbox
+    """
+    logger.info("Requisição agregados: Bbox=%s, Zoom=%s", bbox, zoom)
+
+    bounds = validators.validate_bbox(bbox)
+
+    try:
+        cells = await crud.get_grid_cells_async(db, bounds, zoom)
+        logger.info("Agregados finalizada. Células: %s", len(cells))
+        return cells
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint agregados: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+
+@router.get(
+    "/proximas",
+    response_model=List[FarmResponse],
+    response_model_exclude_unset=True,
+    summary="Fazendas mais próximas de um ponto",
+    description=descriptions.DESC_PROXIMAS,
+    responses=responses.FARMS_NEAREST
+)
+async def get_nearest(
+    lat: float, lon: float,
+    k: int = Query(10, ge=1, le=100, description="Número de fazendas"),
+    projection: Projection = Depends(projection_params),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    It returns the k farms closest to the point, ordered by distance
+    """
+    logger.info("Requisição proximas: Lat=%s, Lon=%s, K=%s", lat, lon, k)
+
+    validators.validate_coordinates(lat, lon)
+
+    try:
+        results = await crud.search_nearest_async(db, lat, lon, k, projection)
+        logger.info("Proximas finalizada. Resultados: %s", len(results))
+        return serializers.render_farms(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint proximas: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+
 @router.get(
     "/{id}",
     response_model=FarmResponse,
+    response_model_exclude_unset=True,
     summary="Obter fazenda por ID (CAR)",
     description=descriptions.DESC_GET_BY_ID,
     responses=responses.FARM_BY_ID
 )
-def get_farm_by_id(id: str, db: Session = Depends(get_db)):
+async def get_farm_by_id(
+    id: str,
+    projection: Projection = Depends(projection_params),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     It returns a specific farm by ID (CAR)
     """
     # Business Rule Validation ID
     validators.validate_imovel_id(id)
 
-    logger.info(f"Busca por ID iniciada: {id}")
+    logger.info("Busca por ID iniciada: %s", id)
 
     try:
-        json_farm = crud.get_by_id(db, id)
+        json_farm = await crud.get_by_id_async(db, id, projection)
         if not json_farm:
-            logger.info(f"Fazenda não encontrada: {id}")
+            logger.info("Fazenda não encontrada: %s", id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Fazenda com ID {id} não encontrada."
             )
 
-        logger.info(f"Fazenda carregada com sucesso: {id}")
-        return json_farm
+        logger.info("Fazenda carregada com sucesso: %s", id)
+        return serializers.render_farm(json_farm)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Falha crítica na busca por ID {id}- \n erro: {e}", exc_info=True)
+        logger.error("Falha crítica na busca por ID %s- \n erro: %s", id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erro interno ao processar a requisição."
         )
 
 
+@router.get(
+    "/{id}/sobreposicoes",
+    response_model=List[FarmOverlap],
+    summary="Fazendas sobrepostas a um imóvel (CAR)",
+    description=descriptions.DESC_SOBREPOSICOES,
+    responses=responses.FARM_OVERLAPS
+)
+async def get_farm_overlaps(id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    It returns the farms overlapping a specific farm, with the overlapping area
+    """
+    validators.validate_imovel_id(id)
+    logger.info("Busca de sobreposições iniciada: %s", id)
+
+    try:
+        overlaps = await crud.get_overlaps_async(db, id)
+        if overlaps is None:
+            logger.info("Fazenda não encontrada: %s", id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Fazenda com ID {id} não encontrada."
+            )
+
+        logger.info("Sobreposições de %s: %s", id, len(overlaps))
+        return overlaps
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint sobreposicoes %s: %s", id, e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+
 @router.post(
     "/busca-ponto",
     response_model=List[FarmResponse],
+    response_model_exclude_unset=True,
     description=descriptions.DESC_BUSCA_PONTO,
     responses=responses.FARMS_BY_POINTS
 )
-def get_by_point(payload: PointSearch, db: Session = Depends(get_db)):
+async def get_by_point(
+    payload: PointSearch, response: Response,
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     It searchs farm(s) containg the specified location with  support fo pagination
     """
     # Structured Log including pagination to audit performance
     logger.info(
-        f"Requisição busca-ponto: Lat={payload.latitude}, Lon={payload.longitude}, "
-        f"Pagina={payload.page}, Tamanho={payload.size}"
-    )
+        "Requisição busca-ponto: Lat=%s, Lon=%s, Pagina=%s, Tamanho=%s",
+        payload.latitude, payload.longitude, payload.page, payload.size)
 
     # Validator Coordinates
     validators.validate_coordinates(payload.latitude, payload.longitude)
+    media_type = binary_formats.negotiate(accept)
+
+    try:
+        if media_type:
+            return await binary_search(db, crud.build_point_query(payload, wkb=True), media_type, payload)
+
+        results = await crud.search_by_point_async(db, payload)
+        logger.info("Busca-ponto finalizada. Resultados na página: %s", len(results))
+
+        cursor = crud.next_cursor(results, payload)
+        headers = {"X-Next-Cursor": cursor} if cursor else {}
+        response.headers.update(headers)
+        return serializers.render_farms(results, headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint busca-ponto %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+
+@router.post(
+    "/lote",
+    response_class=StreamingResponse,
+    summary="Obter fazendas por uma lista de IDs (CAR)",
+    description=descriptions.DESC_LOTE,
+    responses=responses.FARMS_BY_IDS
+)
+async def get_farms_by_ids(payload: BatchIdLookup):
+    """
+    It resolves many CAR codes at once, streaming the farms and listing the missing ids
+    """
+    logger.info("Requisição lote: IDs=%s", len(payload.ids))
+
+    for farm_id in payload.ids:
+        validators.validate_imovel_id(farm_id)
+
+    slot = await admission.acquire("lote")
+    return admitted_stream(
+        slot, serializers.stream_lookup(crud.stream_by_ids(payload)), media_type="application/json")
+
+
+@router.post(
+    "/busca-ponto/lote",
+    response_model=Dict[int, List[FarmResponse]],
+    response_model_exclude_unset=True,
+    summary="Busca por ponto em lote",
+    description=descriptions.DESC_BUSCA_PONTO_LOTE,
+    responses=responses.FARMS_BY_POINTS_BATCH,
+    dependencies=[Depends(admission.admit("busca-ponto/lote"))]
+)
+async def get_by_points(payload: BatchPointSearch, db: AsyncSession = Depends(get_async_db)):
+    """
+    It resolves many coordinates at once, returning the farms keyed by input index
+    """
+    logger.info("Requisição busca-ponto/lote: Pontos=%s, Tamanho=%s", len(payload.points), payload.size)
+
+    for point in payload.points:
+        validators.validate_coordinates(point.latitude, point.longitude)
 
     try:
-        results = crud.search_by_point(db, payload)
-        logger.info(
-            f"Busca-ponto finalizada. Resultados na página: {len(results)}")
-        return results
+        groups = await crud.search_by_points_async(db, payload)
+        logger.info("Busca-ponto/lote finalizada. Pontos com fazendas: %s", sum(1 for g in groups.values() if g))
+        return serializers.render_farms_by_index(groups)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erro inesperado no endpoint busca-ponto {e}", exc_info=True)
+        logger.error("Erro inesperado no endpoint busca-ponto/lote: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500, detail="Erro interno no servidor.")
 
@@ -83,28 +314,164 @@ def get_by_point(payload: PointSearch, db: Session = Depends(get_db)):
 @router.post(
     "/busca-raio",
     response_model=List[FarmResponse],
+    response_model_exclude_unset=True,
     description=descriptions.DESC_BUSCA_RAIO,
-    responses=responses.FARMS_BY_RADIUS
+    responses=responses.FARMS_BY_RADIUS,
+    dependencies=[Depends(admission.admit("busca-raio"))]
 )
-def get_by_radius(payload: RadiusSearch, db: Session = Depends(get_db)):
+async def get_by_radius(
+    payload: RadiusSearch, response: Response,
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     It Returns farms inside a radius (km) with support for pagination
     """
     logger.info(
-        f"Requisição busca-raio: Lat={payload.latitude}, Lon={payload.longitude}, "
-        f"Raio={payload.radius_km}km, Pagina={payload.page}, Tamanho={payload.size}"
-    )
+        "Requisição busca-raio: Lat=%s, Lon=%s, Raio=%skm, Pagina=%s, Tamanho=%s",
+        payload.latitude, payload.longitude, payload.radius_km, payload.page, payload.size)
 
     # Business Rule Validations
     validators.validate_search_radius(payload.radius_km)
     validators.validate_coordinates(payload.latitude, payload.longitude)
+    media_type = binary_formats.negotiate(accept)
+
+    try:
+        if media_type:
+            return await binary_search(
+                db, crud.build_radius_query(payload, wkb=True), media_type, payload,
+                keys=("distance_m", "imovel_code"), kind="radius")
+
+        results = await crud.search_by_radius_async(db, payload)
+        logger.info("Busca-raio finalizada. Resultados na página: %s", len(results))
+
+        cursor = crud.next_cursor(results, payload, keys=("distance_m", "imovel_code"))
+        headers = {"X-Next-Cursor": cursor} if cursor else {}
+        response.headers.update(headers)
+        return serializers.render_farms(results, headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint busca-raio: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+
+@router.post(
+    "/busca-area",
+    response_model=List[FarmResponse],
+    response_model_exclude_unset=True,
+    summary="Busca por área (polígono ou bbox)",
+    description=descriptions.DESC_BUSCA_AREA,
+    responses=responses.FARMS_BY_AREA,
+    dependencies=[Depends(admission.admit("busca-area"))]
+)
+async def get_by_area(
+    payload: AreaSearch, response: Response,
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    It returns the farms intersecting a polygon or bbox with support for pagination
+    """
+    logger.info(
+        "Requisição busca-area: Tipo=%s, Bbox=%s, Pagina=%s, Tamanho=%s",
+        payload.area.type if payload.area else "bbox", payload.bbox, payload.page, payload.size)
+
+    area = validators.validate_search_area(payload.area, payload.bbox)
+    media_type = binary_formats.negotiate(accept)
 
     try:
-        results = crud.search_by_radius(db, payload)
-        logger.info(
-            f"Busca-raio finalizada. Resultados na página: {len(results)}")
-        return results
+        if media_type:
+            return await binary_search(
+                db, crud.build_area_query(payload, area, wkb=True), media_type, payload, kind="area")
+
+        results = await crud.search_by_area_async(db, payload, area)
+        logger.info("Busca-area finalizada. Resultados na página: %s", len(results))
+
+        cursor = crud.next_cursor(results, payload)
+        headers = {"X-Next-Cursor": cursor} if cursor else {}
+        response.headers.update(headers)
+        return serializers.render_farms(results, headers)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erro inesperado no endpoint busca-raio: {e}", exc_info=True)
+        logger.error("Erro inesperado no endpoint busca-area: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500, detail="Erro interno no servidor.")
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}.pbf",
+    response_class=Response,
+    summary="Tile vetorial (MVT) das fazendas",
+    description=descriptions.DESC_TILES,
+    responses=responses.FARM_TILES
+)
+async def get_tile(z: int, x: int, y: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    It returns the farms inside a Web Mercator tile encoded as Mapbox Vector Tile
+    """
+    validators.validate_tile(z, x, y)
+
+    version = dataset_watcher.version or 0
+    etag = f'"{tile_key(version, z, x, y)}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        tile = await crud.get_cached_tile(db, version, z, x, y)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro inesperado no endpoint de tiles %s/%s/%s: %s", z, x, y, e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Erro interno no servidor.")
+
+    return Response(
+        content=tile, media_type="application/vnd.mapbox-vector-tile", headers=headers)
+
+
+@router.post(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Exportar fazendas (GeoJSON/NDJSON)",
+    description=descriptions.DESC_EXPORT,
+    responses=responses.FARMS_EXPORT
+)
+async def export_farms(
+    payload: ExportRequest,
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    It streams every farm matching the filters, without pagination
+    """
+    logger.info(
+        "Requisição export: Lat=%s, Lon=%s, Raio=%skm, Cidade=%s, Formato=%s",
+        payload.latitude, payload.longitude, payload.radius_km, payload.city, payload.format)
+
+    validators.validate_export_area(payload.latitude, payload.longitude, payload.radius_km)
+
+    media_type = binary_formats.negotiate(accept)
+    await crud.check_export_cost(db, payload)
+    slot = await admission.acquire("export")
+
+    if media_type:
+        return admitted_stream(
+            slot, crud.stream_export_binary(payload, media_type),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{binary_formats.file_name(media_type)}"'}
+        )
+
+    if payload.format == "ndjson":
+        media_type, file_name = "application/x-ndjson", "fazendas.ndjson"
+    else:
+        media_type, file_name = "application/geo+json", "fazendas.geojson"
+
+    return admitted_stream(
+        slot, crud.stream_export(payload),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
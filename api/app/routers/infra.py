@@ -1,9 +1,13 @@
 
 import logging
-from app.database import get_db
+from app.database import async_engine, engine, get_db
+from app.services import admission, metrics
+from app.services.pool_stats import pool_counters, pool_telemetry
+from app.services.cache import query_cache
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="", tags=["Infra"])
@@ -29,9 +33,47 @@ def health_check(db: Session = Depends(get_db)):
             "database": "connected"
         }
     except Exception as e:
-        logger.critical(
-            f"Health check falhou: Conexão com o banco perdida. Erro: {e}", exc_info=True)
+        logger.critical("Health check falhou: Conexão com o banco perdida. Erro: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Serviço indisponível: falha na conexão com o banco de dados"
         )
+
+
+@router.get("/cache/stats", tags=["Infra"])
+async def cache_stats():
+    """
+    Hit/miss/eviction counters of the query-result cache
+    """
+    return await query_cache.stats()
+
+
+@router.get("/pool/stats", tags=["Infra"])
+async def pool_stats():
+    """
+    Connections in use/idle, requests waiting for one and checkout latency of the
+    API pool (asyncpg), plus the counters of the sync pool used by health and reloads
+    """
+    return {
+        "async": pool_telemetry.stats(async_engine.sync_engine.pool),
+        "sync": pool_counters(engine.pool),
+    }
+
+
+@router.get("/admission/stats", tags=["Infra"])
+async def admission_stats():
+    """
+    Slots in use, requests waiting and shed (429 full queue, 503 wait timeout) per
+    limited endpoint and in the lane of the queries above the cost budget
+    """
+    return admission.stats()
+
+
+@router.get("/metrics", tags=["Infra"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Latency histograms per endpoint and per stage (pool, db, sql, format, serialize)
+    in the Prometheus text format
+    """
+    return PlainTextResponse(
+        metrics.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
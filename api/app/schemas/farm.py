@@ -1,5 +1,19 @@
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Literal, get_args
+
+# Maximum number of coordinates resolved by a single batch point lookup
+BATCH_MAX_POINTS = 1000
+# Maximum number of CAR codes resolved by a single bulk lookup
+BATCH_MAX_IDS = 50000
+
+# Attributes of a farm (same order of the responses), imovel_code is always returned
+FarmField = Literal[
+    "imovel_code", "city", "state_code", "area_size",
+    "fiscal_module", "status", "type", "created_at",
+]
+FARM_FIELDS = get_args(FarmField)
+# full polygon, its bounding box (polygon), its centroid (point) or no geometry at all
+GeometryMode = Literal["full", "bbox", "centroid", "none"]
 
 # GeoJSON Structure for Swagger documentation
 
@@ -10,16 +24,32 @@ class GeoJSONModel(BaseModel):
     coordinates: List[Any]
 
 
-class FilterParams(BaseModel):
+class Projection(BaseModel):
+    # Sparse fieldsets: unselected columns are not even read from the database
+    fields: Optional[List[FarmField]] = Field(
+        None, description="Atributos retornados (padrão: todos). imovel_code sempre é incluído")
+    geometry: GeometryMode = Field(
+        "full", description="Geometria completa, bbox, centroid ou none (sem geometria)")
+    # Map zoom: simplified geometry (precomputed levels) and coordinates rounded to the pixel size
+    zoom: Optional[int] = Field(
+        None, ge=0, le=22, description="Zoom do mapa: geometria simplificada e precisão reduzida")
+
+
+class FarmFilters(BaseModel):
     city: Optional[str] = None
     area_min: Optional[float] = None
     area_max: Optional[float] = None
+
+
+class FilterParams(FarmFilters):
     # Adding pagination with standart values
     page: int = Field(1, ge=1, description="Número da página")
     size: int = Field(5, ge=1, le=100, description="Registros por página")
+    # Keyset pagination: token returned in the X-Next-Cursor header (replaces page)
+    cursor: Optional[str] = Field(None, description="Cursor da próxima página")
 
 
-class PointSearch(FilterParams):
+class PointSearch(FilterParams, Projection):
     latitude: float
     longitude: float
 
@@ -30,14 +60,75 @@ class RadiusSearch(PointSearch):
     model_config = ConfigDict(populate_by_name=True)
 
 
+class AreaSearch(FilterParams, Projection):
+    # Area of interest: a GeoJSON Polygon/MultiPolygon or a bbox, exactly one of them
+    area: Optional[GeoJSONModel] = Field(None, description="Polygon ou MultiPolygon (GeoJSON, WGS84)")
+    bbox: Optional[List[float]] = Field(
+        None, min_length=4, max_length=4, description="[min_lon, min_lat, max_lon, max_lat]")
+    intersection: bool = Field(
+        False, description="Inclui intersection_area_m2 (área da fazenda dentro da área buscada)")
+
+
+class Coordinate(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class BatchPointSearch(FarmFilters, Projection):
+    points: List[Coordinate] = Field(
+        ..., alias="pontos", min_length=1, max_length=BATCH_MAX_POINTS)
+    size: int = Field(5, ge=1, le=100, description="Máximo de fazendas por ponto")
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class BatchIdLookup(Projection):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_IDS, description="Códigos CAR (imovel_code)")
+
+
+class ExportRequest(FarmFilters, Projection):
+    # Optional spatial filter: point only (containment) or point + radius
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    radius_km: Optional[float] = Field(None, alias="raio_km")
+    format: Literal["geojson", "ndjson"] = Field(
+        "geojson", description="FeatureCollection (geojson) ou uma Feature por linha (ndjson)")
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class GridCell(BaseModel):
+    """Aggregate of the farms whose centroid falls in a grid cell"""
+    farms: int
+    area_size: float
+    # Representative point: mean of the farm centroids of the cell
+    latitude: float
+    longitude: float
+
+
+class FarmOverlap(BaseModel):
+    """Farm whose polygon overlaps the requested one"""
+    imovel_code: str
+    city: Optional[str] = None
+    area_size: Optional[float] = None
+    # Overlapping area (m²) and its share of the requested farm area
+    overlap_area_m2: float
+    overlap_ratio: Optional[float] = None
+
+
 class FarmResponse(BaseModel):
+    """
+    Only the selected fields are returned (the routes use response_model_exclude_unset)
+    """
     model_config = ConfigDict(from_attributes=True)
     imovel_code: str
-    city: Optional[str]
-    state_code: Optional[str]
-    area_size: Optional[float]
-    fiscal_module: Optional[float]
-    status: Optional[str]
-    type: Optional[str]
-    created_at: Optional[str]
-    geometry: GeoJSONModel
+    city: Optional[str] = None
+    state_code: Optional[str] = None
+    area_size: Optional[float] = None
+    fiscal_module: Optional[float] = None
+    status: Optional[str] = None
+    type: Optional[str] = None
+    created_at: Optional[str] = None
+    geometry: Optional[GeoJSONModel] = None
+    # Geodesic distance to the search point (radius and nearest searches only)
+    distance_m: Optional[float] = None
+    # Area (m²) of the farm inside the searched area (area search with intersection=true)
+    intersection_area_m2: Optional[float] = None
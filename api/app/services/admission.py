@@ -0,0 +1,229 @@
+# app/services/admission.py
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+def parse_pairs(value: str, cast=int) -> dict:
+    """'a=1,b/c=2' -> {"a": 1, "b/c": 2}"""
+    pairs = {}
+    for item in value.split(","):
+        name, _, number = item.partition("=")
+        if name.strip() and number.strip():
+            pairs[name.strip()] = cast(number)
+    return pairs
+
+
+# Requests of each heavy endpoint executing at the same time (per worker process)
+ADMISSION_LIMITS = parse_pairs(os.getenv(
+    "ADMISSION_LIMITS", "busca-raio=16,busca-area=8,busca-ponto/lote=4,lote=4,export=2"))
+# Requests allowed to wait for a slot; beyond it they get 429 right away
+ADMISSION_MAX_WAITING = int(os.getenv("ADMISSION_MAX_WAITING", "32"))
+# Seconds a request waits for a slot before giving up with 503
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+
+# Planner cost (EXPLAIN) of the heavy searches: above the budget the query waits for one
+# of the HEAVY_QUERY_CONCURRENCY slots of the heavy lane, above the max it is rejected
+QUERY_COST_CHECK = os.getenv("QUERY_COST_CHECK", "true").lower() in ("1", "true", "yes")
+QUERY_COST_BUDGET = float(os.getenv("QUERY_COST_BUDGET", "200000"))
+QUERY_COST_MAX = float(os.getenv("QUERY_COST_MAX", "20000000"))
+HEAVY_QUERY_CONCURRENCY = int(os.getenv("HEAVY_QUERY_CONCURRENCY", "2"))
+
+# statement_timeout (ms, 0 = none) per query kind, set with SET LOCAL in the query
+# transaction. Other kinds keep the connection default (DB_STATEMENT_TIMEOUT_MS)
+STATEMENT_TIMEOUTS = parse_pairs(os.getenv(
+    "STATEMENT_TIMEOUTS_MS", "radius=5000,area=5000,export=120000,lote=30000"))
+
+RETRY_AFTER = {"Retry-After": "1"}
+
+
+class Slot:
+    """A held limiter slot, released once (streams release it from two places)"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.limiter.active -= 1
+            self.limiter.semaphore.release()
+
+
+class Limiter:
+    """
+    Concurrency limit with a bounded wait: a full queue sheds the request with 429
+    and a slot not freed within the timeout with 503, both answered immediately
+    instead of piling up latency on every other request
+    """
+
+    def __init__(self, name: str, limit: int, max_waiting: int = ADMISSION_MAX_WAITING,
+                 timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self) -> Slot:
+        if self.semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            logger.warning("Fila cheia em %s: requisição rejeitada (429).", self.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Muitas requisições simultâneas. Tente novamente em instantes.",
+                headers=RETRY_AFTER)
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("Tempo de espera esgotado em %s: requisição rejeitada (503).", self.name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor sobrecarregado. Tente novamente em instantes.",
+                headers=RETRY_AFTER)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return Slot(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        held = await self.acquire()
+        try:
+            yield
+        finally:
+            held.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_use": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+limiters = {name: Limiter(name, limit) for name, limit in ADMISSION_LIMITS.items()}
+heavy_lane = Limiter("consultas pesadas", HEAVY_QUERY_CONCURRENCY)
+
+
+def admit(name: str):
+    """
+    Dependency holding a slot of the endpoint limiter while the handler runs
+    (streaming endpoints use acquire/held, the stream outlives the handler)
+    """
+    limiter = limiters.get(name)
+
+    async def dependency():
+        if limiter is None:
+            yield
+            return
+        async with limiter.slot():
+            yield
+
+    return dependency
+
+
+async def acquire(name: str):
+    """Slot of the endpoint limiter (None when the endpoint isn't limited)"""
+    limiter = limiters.get(name)
+    return await limiter.acquire() if limiter else None
+
+
+async def held(slot, stream):
+    """Streams the chunks keeping the slot until the response is over"""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        if slot is not None:
+            slot.release()
+
+
+def check_cost(cost: float):
+    """Rejects a query whose estimated cost is above the hard limit"""
+    if cost > QUERY_COST_MAX:
+        logger.warning("Consulta rejeitada pelo custo estimado: %.0f", cost)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Consulta muito ampla. Reduza a área/raio ou adicione filtros (cidade, área).")
+
+
+def statement_timeout(kind: str):
+    return STATEMENT_TIMEOUTS.get(kind)
+
+
+def stats() -> dict:
+    return {
+        **{name: limiter.stats() for name, limiter in limiters.items()},
+        "heavy_lane": heavy_lane.stats(),
+    }
+
+
+class CancelOnDisconnectMiddleware:
+    """
+    Pure ASGI middleware: when the client goes away before the response starts, the
+    handler task is cancelled, which makes asyncpg cancel the running query on the
+    server. Streaming responses are already cancelled by Starlette on disconnect
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # The disconnect is watched only after the request body has been read by the
+        # handler, so the watcher never takes a body message from it
+        body_read = asyncio.Event()
+        response_started = asyncio.Event()
+        if scope["method"] in ("GET", "HEAD", "DELETE", "OPTIONS"):
+            body_read.set()
+
+        async def receive_body():
+            message = await receive()
+            if message["type"] == "http.disconnect" or not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def send_tracked(message):
+            if message["type"] == "http.response.start":
+                response_started.set()
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, receive_body, send_tracked))
+
+        async def watch():
+            await body_read.wait()
+            while not response_started.is_set():
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    if not response_started.is_set():
+                        logger.info("Cliente desconectou: cancelando a consulta em andamento.")
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            # Cancelled by the watcher: nobody is waiting for this response
+            if not watcher.done() or watcher.cancelled():
+                raise
+        finally:
+            watcher.cancel()
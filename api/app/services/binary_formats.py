@@ -0,0 +1,213 @@
+# app/services/binary_formats.py
+import importlib.util
+import io
+import logging
+import math
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+import numpy as np
+import orjson
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+FLATGEOBUF = "application/flatgeobuf"
+
+# Media type -> optional dependency that produces it
+BINARY_FORMATS = {ARROW_STREAM: "pyarrow", PARQUET: "pyarrow", FLATGEOBUF: "pyogrio"}
+FILE_EXTENSIONS = {ARROW_STREAM: "arrow", PARQUET: "parquet", FLATGEOBUF: "fgb"}
+# Accept values answered with the default JSON responses
+JSON_TYPES = ("application/json", "application/geo+json", "application/x-ndjson", "application/*", "*/*")
+
+# Pieces of a finished FlatGeobuf file sent per read
+FILE_CHUNK_SIZE = 1024 * 1024
+
+# Every other column is text
+FLOAT_COLUMNS = ("area_size", "fiscal_module", "distance_m", "intersection_area_m2")
+
+
+@lru_cache(maxsize=None)
+def is_available(media_type: str) -> bool:
+    return importlib.util.find_spec(BINARY_FORMATS[media_type]) is not None
+
+
+def parse_accept(accept: str):
+    """Media types of an Accept header, most preferred first (q=0 excluded)"""
+    ranked = []
+    for position, item in enumerate((accept or "").split(",")):
+        media_type, *params = [p.strip() for p in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(ranked)]
+
+
+def negotiate(accept: str):
+    """
+    Binary media type to answer with, or None for the JSON response. 406 when only
+    binary formats are acceptable and their library isn't installed
+    """
+    unavailable = False
+    for media_type in parse_accept(accept):
+        if media_type in JSON_TYPES:
+            return None
+        if media_type in BINARY_FORMATS:
+            if is_available(media_type):
+                return media_type
+            unavailable = True
+
+    if unavailable:
+        logger.warning("Formato binário solicitado sem suporte instalado: %s", accept)
+        accepted = ", ".join(["application/json"] + [m for m in BINARY_FORMATS if is_available(m)])
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Formato não disponível neste servidor. Formatos aceitos: {accepted}."
+        )
+    return None
+
+
+def file_name(media_type: str, base: str = "fazendas") -> str:
+    return f"{base}.{FILE_EXTENSIONS[media_type]}"
+
+
+def to_columns(keys, rows):
+    """Column-wise values straight from the result rows (no per-row dicts)"""
+    columns = list(zip(*rows)) if rows else [()] * len(keys)
+    return dict(zip(keys, columns))
+
+
+def _wkb(value):
+    # asyncpg returns bytes, psycopg2 a memoryview
+    return None if value is None else bytes(value)
+
+
+class ArrowEncoder:
+    """
+    Arrow IPC stream or GeoParquet with the geometry as WKB (GeoArrow / GeoParquet 1.0
+    metadata). Each batch of rows is written as a record batch / row group and the
+    bytes produced so far are returned, so large results are sent while being read
+    """
+
+    def __init__(self, keys, parquet: bool = False):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.keys = list(keys)
+        fields = []
+        for key in self.keys:
+            if key == "geometry":
+                fields.append(pa.field(key, pa.binary(), metadata={
+                    b"ARROW:extension:name": b"geoarrow.wkb", b"ARROW:extension:metadata": b"{}"}))
+            else:
+                fields.append(pa.field(key, pa.float64() if key in FLOAT_COLUMNS else pa.string()))
+
+        metadata = None
+        if parquet and "geometry" in self.keys:
+            # No crs means OGC:CRS84 (lon/lat WGS84), the SRID of the farms table
+            metadata = {b"geo": orjson.dumps({
+                "version": "1.0.0", "primary_column": "geometry",
+                "columns": {"geometry": {"encoding": "WKB", "geometry_types": []}},
+            })}
+        self.schema = pa.schema(fields, metadata=metadata)
+
+        self.sink = io.BytesIO()
+        if parquet:
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.sink, self.schema)
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def _drain(self) -> bytes:
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def write(self, rows) -> bytes:
+        columns = to_columns(self.keys, rows)
+        arrays = [
+            self.pa.array([_wkb(v) for v in columns[f.name]] if f.name == "geometry" else columns[f.name], type=f.type)
+            for f in self.schema
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self._drain()
+
+    def finish(self):
+        """The bytes left after the last batch (footer)"""
+        self.writer.close()
+        yield self._drain()
+
+    def close(self):
+        """Nothing to release: everything is in memory"""
+
+
+class FlatGeobufEncoder:
+    """
+    FlatGeobuf written by GDAL (pyogrio) to a temporary file, appending each batch.
+    Without the spatial index the features keep the order of the query
+    """
+
+    def __init__(self, keys):
+        from pyogrio import raw
+
+        self.raw = raw
+        self.keys = [k for k in keys if k != "geometry"]
+        self.has_geometry = "geometry" in keys
+        self.directory = tempfile.mkdtemp(prefix="meuat-")
+        self.path = os.path.join(self.directory, "fazendas.fgb")
+        self.written = False
+
+    def write(self, rows) -> bytes:
+        columns = to_columns(self.keys + ["geometry"] * self.has_geometry, rows)
+        field_data = [
+            np.array([math.nan if v is None else v for v in columns[k]], dtype=float) if k in FLOAT_COLUMNS
+            else np.array(columns[k], dtype=object)
+            for k in self.keys
+        ]
+        geometry = np.array([_wkb(v) for v in columns["geometry"]], dtype=object) if self.has_geometry else None
+        self.raw.write(
+            self.path, geometry, field_data, self.keys, driver="FlatGeobuf", layer="farms",
+            geometry_type="Unknown" if self.has_geometry else None,
+            crs="EPSG:4326" if self.has_geometry else None,
+            layer_options={"SPATIAL_INDEX": "NO"}, append=self.written)
+        self.written = True
+        # The header is finalized when the file is complete, nothing can be sent yet
+        return b""
+
+    def finish(self):
+        """The finished file in FILE_CHUNK_SIZE pieces, never whole in memory"""
+        if not self.written:
+            self.write([])
+        with open(self.path, "rb") as f:
+            while chunk := f.read(FILE_CHUNK_SIZE):
+                yield chunk
+
+    def close(self):
+        """Removes the temporary file (after the last piece, or on an aborted stream)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def encoder(media_type: str, keys):
+    if media_type == FLATGEOBUF:
+        return FlatGeobufEncoder(keys)
+    return ArrowEncoder(keys, parquet=media_type == PARQUET)
+
+
+def encode(media_type: str, keys, rows) -> bytes:
+    """Whole result set (a search page) in the binary format"""
+    writer = encoder(media_type, keys)
+    try:
+        return writer.write(rows) + b"".join(writer.finish())
+    finally:
+        writer.close()
@@ -0,0 +1,204 @@
+# app/services/cache.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import orjson
+from .cities import normalize_city
+
+logger = logging.getLogger(__name__)
+
+# "memory" (in-process LRU), "redis" (shared between workers) or "none"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+# Decimal places kept from the coordinates (5 ~ 1 meter)
+CACHE_COORD_PRECISION = int(os.getenv("CACHE_COORD_PRECISION", "5"))
+
+COORDINATE_FIELDS = ("latitude", "longitude")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "expirations": self.expirations,
+        }
+
+
+class LRUCache:
+    """
+    In-process cache limited by number of entries and time to live. get/set are
+    coroutines only to share the interface of RedisCache: they never wait
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    async def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Shared cache on any client with the redis.asyncio interface (get, set with ex,
+    scan_iter), so a lookup never blocks the event loop. Entries of old dataset
+    versions are never read again (the version is in the key) and expire by TTL;
+    evictions are made by the server (maxmemory policy).
+    """
+
+    def __init__(self, client, ttl=CACHE_TTL_SECONDS, prefix="meuat:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+
+    async def count(self, match: str = "") -> int:
+        """Keys under the prefix (SCAN: only for the stats endpoint)"""
+        return len([key async for key in self.client.scan_iter(match=f"{self.prefix}{match}*")])
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return orjson.loads(raw)
+
+    async def set(self, key, value):
+        await self.client.set(self.prefix + key, orjson.dumps(value), ex=max(int(self.ttl), 1))
+
+
+class QueryCache:
+    """
+    Caches search results by normalized request. Keys carry the dataset version,
+    so a new seed never serves stale results.
+    """
+
+    def __init__(self, backend=None, precision=CACHE_COORD_PRECISION):
+        self.backend = backend
+        self.precision = precision
+        self.version = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def normalize(self, params: dict) -> dict:
+        """Rounds coordinates and normalizes the city filter like the query does"""
+        normalized = dict(params)
+        for field in COORDINATE_FIELDS:
+            if normalized.get(field) is not None:
+                normalized[field] = round(normalized[field], self.precision)
+        if isinstance(normalized.get("city"), str):
+            normalized["city"] = normalize_city(normalized["city"]) or None
+        return normalized
+
+    def make_key(self, kind: str, params: dict) -> str:
+        digest = hashlib.sha1(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        return f"v{self.version}:{kind}:{digest}"
+
+    async def get_or_load(self, kind: str, params: dict, loader):
+        """Returns the cached value or awaits loader() and stores its result"""
+        if not self.enabled:
+            return await loader()
+
+        key = self.make_key(kind, params)
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Cache indisponível (%s): %s", kind, e)
+            return await loader()
+        if value is not None:
+            return value
+
+        value = await loader()
+        if value is not None:
+            try:
+                await self.backend.set(key, value)
+            except Exception as e:
+                logger.warning("Falha ao gravar no cache (%s): %s", kind, e)
+        return value
+
+    def on_version_change(self, version):
+        """
+        Dataset watcher callback: keys of the new version miss every old entry. The
+        local LRU is also emptied to free memory; shared entries are left to their TTL
+        (no scan-and-delete on every worker)
+        """
+        self.version = version
+        if isinstance(self.backend, LRUCache):
+            self.backend.clear()
+        if self.enabled:
+            logger.info("Cache de consultas invalidado (versão %s).", version)
+
+    async def stats(self) -> dict:
+        if not self.enabled:
+            return {"backend": "none"}
+        if isinstance(self.backend, RedisCache):
+            # Only the keys of the current version are live, the others wait for their TTL
+            entries = await self.backend.count(f"v{self.version}:")
+        else:
+            entries = len(self.backend)
+        return {
+            "backend": CACHE_BACKEND,
+            "version": self.version,
+            "entries": entries,
+            **self.backend.stats.as_dict(),
+        }
+
+
+def build_backend():
+    if CACHE_BACKEND == "none":
+        return None
+    if CACHE_BACKEND == "redis":
+        # Optional dependency, only needed for the shared backend
+        import redis.asyncio
+        return RedisCache(redis.asyncio.Redis.from_url(CACHE_URL))
+    return LRUCache()
+
+
+query_cache = QueryCache(build_backend())
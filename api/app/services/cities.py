@@ -0,0 +1,63 @@
+# app/services/cities.py
+import bisect
+import logging
+import time
+import unicodedata
+from sqlalchemy import text
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_LIMIT = 10
+
+
+def normalize_city(value):
+    """
+    Accent and case insensitive form of a city name ("São José" -> "sao jose").
+    The seed stores it in farms.city_norm and every filter is normalized the same way.
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+class CityIndex:
+    """
+    Sorted list of the distinct cities of the dataset: a prefix lookup is two
+    binary searches, so autocomplete never touches the database.
+    """
+
+    def __init__(self):
+        self.entries = ([], [])
+
+    def __len__(self):
+        return len(self.entries[0])
+
+    def load(self, cities):
+        """Builds the sorted (normalized, display name) lists and swaps them in"""
+        pairs = sorted({(normalize_city(c), c) for c in cities if c and c.strip()})
+        # A single reference swap: readers never see keys and names out of sync
+        self.entries = ([k for k, _ in pairs], [n for _, n in pairs])
+
+    def reload(self, version=None):
+        """Dataset watcher callback: reads the distinct cities of the farms table"""
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            cities = conn.execute(text("SELECT DISTINCT city FROM farms")).scalars().all()
+        self.load(cities)
+        logger.info(
+            "Lista de municípios carregada: %s nomes (versão %s) em %.2fs",
+            len(self), version, time.perf_counter() - start)
+
+    def suggest(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT):
+        """Display names whose normalized form starts with the normalized prefix"""
+        keys, names = self.entries
+        key = normalize_city(prefix) or ""
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_right(keys, key + "\uffff", lo=start)
+        return names[start:min(end, start + limit)]
+
+
+city_index = CityIndex()
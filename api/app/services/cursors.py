@@ -0,0 +1,42 @@
+# app/services/cursors.py
+import base64
+import binascii
+import json
+import logging
+import math
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(values: list) -> str:
+    """Turns the sort keys of the last returned row into an opaque token."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def valid_keys(values) -> bool:
+    """
+    Sort keys of every search: [imovel_code] or [distance_m, imovel_code]. A value of
+    another type would only fail later, comparing it with the column (500)
+    """
+    *distances, code = values
+    return isinstance(code, str) and all(
+        isinstance(d, (int, float)) and not isinstance(d, bool) and math.isfinite(d) for d in distances)
+
+
+def decode_cursor(token: str, size: int) -> list:
+    """Reads the sort keys back from a token, validating that it fits the search."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size or not valid_keys(values):
+        logger.warning("Cursor inválido: %s", token)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginação inválido para esta busca."
+        )
+    return values
@@ -0,0 +1,110 @@
+# app/services/dataset_version.py
+import logging
+import os
+import threading
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "dataset_version"
+# Interval (seconds) between two checks of the dataset version
+POLL_INTERVAL = float(os.getenv("DATASET_VERSION_POLL_SECONDS", "30"))
+
+
+def read_dataset_version(conn) -> int:
+    """Returns the current dataset version (0 when the seed never bumped it)."""
+    try:
+        result = conn.execute(
+            text(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1"))
+        return result.scalar() or 0
+    except SQLAlchemyError:
+        # Table probably doesn't exist yet
+        return 0
+
+
+def bump_dataset_version(conn) -> int:
+    """Increments the dataset version. Must be called after every data load."""
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "id integer PRIMARY KEY, version integer NOT NULL, "
+        "updated_at timestamptz NOT NULL DEFAULT now());"))
+    result = conn.execute(text(
+        f"INSERT INTO {VERSION_TABLE} (id, version) VALUES (1, 1) "
+        f"ON CONFLICT (id) DO UPDATE SET version = {VERSION_TABLE}.version + 1, "
+        "updated_at = now() RETURNING version;"))
+    return result.scalar()
+
+
+class DatasetVersionWatcher:
+    """
+    Polls the dataset version in a background thread and notifies the
+    subscribers (in-memory replicas, caches) when it changes.
+    """
+
+    def __init__(self, bind, interval: float = POLL_INTERVAL):
+        self.bind = bind
+        self.interval = interval
+        self.version = None
+        self._callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Registers a callable receiving the new version number. Subscribing twice is a
+        no-op, so a restarted lifespan doesn't reload every replica twice per version.
+        """
+        if callback not in self._callbacks:
+            self._callbacks.append(callback)
+
+    def check(self):
+        """Reads the version once and notifies subscribers if it changed."""
+        with self.bind.connect() as conn:
+            version = read_dataset_version(conn)
+
+        if version == self.version:
+            return
+
+        logger.info("Nova versão do dataset detectada: %s", version)
+        self.version = version
+        for callback in self._callbacks:
+            try:
+                callback(version)
+            except Exception as e:
+                logger.error("Falha ao aplicar a versão %s do dataset: %s", version, e, exc_info=True)
+
+    def start(self):
+        """Loads the current version synchronously and starts polling."""
+        if self._thread is not None:
+            return
+        try:
+            self.check()
+        except Exception as e:
+            logger.error("Não foi possível ler a versão do dataset: %s", e)
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="dataset-version-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops polling and drops the subscriptions (the next start registers them again)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+        self._callbacks.clear()
+        # The next start reloads the subscribers even if the version didn't change
+        self.version = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning("Falha ao verificar a versão do dataset: %s", e)
+
+
+dataset_watcher = DatasetVersionWatcher(engine)
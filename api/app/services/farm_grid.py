@@ -0,0 +1,101 @@
+# app/services/farm_grid.py
+import math
+import os
+import time
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+GRID_TABLE = "farm_grid"
+# Finest level of the pyramid (cells of a z14 tile, ~2.4km wide)
+GRID_MAX_ZOOM = int(os.getenv("GRID_MAX_ZOOM", "14"))
+# Cells per tile side = 2 ** offset, e.g. 3 -> 8x8 cells (32px) per 256px map tile
+GRID_CELL_OFFSET = int(os.getenv("GRID_CELL_OFFSET", "3"))
+# Densest cells returned by a single request (very large bbox for the zoom)
+GRID_MAX_CELLS = int(os.getenv("GRID_MAX_CELLS", "5000"))
+# Web Mercator limit, keeps the tile math finite
+MAX_LATITUDE = 85.0511
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int):
+    """Converts a WGS84 coordinate to the (x, y) tile containing it at zoom z."""
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(z: int, x: int, y: int):
+    """(min_lon, min_lat, max_lon, max_lat) of the tile, inverse of lonlat_to_tile"""
+    n = 2 ** z
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)
+
+
+def cell_zoom(map_zoom: int) -> int:
+    """Pyramid level whose cells have the wanted size on screen at the map zoom"""
+    return min(map_zoom + GRID_CELL_OFFSET, GRID_MAX_ZOOM)
+
+
+def cell_range(bbox, zoom: int):
+    """(x0, y0, x1, y1) of the cells covering the bbox at the pyramid level"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x0, y0 = lonlat_to_tile(min_lon, max_lat, zoom)
+    x1, y1 = lonlat_to_tile(max_lon, min_lat, zoom)
+    return x0, y0, x1, y1
+
+
+def rebuild_grid(conn):
+    """
+    Builds the density pyramid: the finest level buckets the farm centroids in
+    the tile grid of GRID_MAX_ZOOM and every coarser level merges 2x2 cells of
+    the level below, so the whole pyramid costs a single scan of the farms table.
+    Runs in the caller's transaction (readers keep the old pyramid until commit).
+    """
+    start = time.perf_counter()
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {GRID_TABLE} (
+            zoom smallint, x integer, y integer,
+            farms integer, area_size double precision,
+            longitude double precision, latitude double precision,
+            PRIMARY KEY (zoom, x, y));
+    """))
+    conn.execute(text(f"DELETE FROM {GRID_TABLE};"))
+
+    conn.execute(text(f"""
+        INSERT INTO {GRID_TABLE}
+        SELECT :zoom, x, y, COUNT(*), COALESCE(SUM(area_size), 0), AVG(lon), AVG(lat)
+        FROM (
+            SELECT lon, lat, area_size,
+                   LEAST(FLOOR((lon + 180) / 360 * 2 ^ :zoom), 2 ^ :zoom - 1)::int AS x,
+                   LEAST(FLOOR((1 - LN(TAN(RADIANS(merc_lat)) + 1 / COS(RADIANS(merc_lat))) / PI())
+                         / 2 * 2 ^ :zoom), 2 ^ :zoom - 1)::int AS y
+            FROM (
+                SELECT ST_X(c) AS lon, ST_Y(c) AS lat, area_size,
+                       GREATEST(LEAST(ST_Y(c), {MAX_LATITUDE}), -{MAX_LATITUDE}) AS merc_lat
+                FROM (SELECT ST_Centroid(geometry) AS c, area_size FROM farms
+                      WHERE geometry IS NOT NULL) f
+            ) centroids
+        ) cells
+        GROUP BY x, y;
+    """), {"zoom": GRID_MAX_ZOOM})
+
+    for zoom in range(GRID_MAX_ZOOM - 1, -1, -1):
+        # Representative point: centroid of the farm centroids, weighted by count
+        conn.execute(text(f"""
+            INSERT INTO {GRID_TABLE}
+            SELECT :zoom, x / 2, y / 2, SUM(farms), SUM(area_size),
+                   SUM(longitude * farms) / SUM(farms), SUM(latitude * farms) / SUM(farms)
+            FROM {GRID_TABLE} WHERE zoom = :zoom + 1
+            GROUP BY x / 2, y / 2;
+        """), {"zoom": zoom})
+
+    conn.execute(text(f"ANALYZE {GRID_TABLE};"))
+    logger.info(
+        "Pirâmide de agregados gerada (zoom 0 a %s) em %.1fs",
+        GRID_MAX_ZOOM, time.perf_counter() - start)
@@ -0,0 +1,171 @@
+# app/services/metrics.py
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Timing costs a few perf_counter calls per stage, cheap enough to stay on in production
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds, from sub-millisecond cache hits up to slow exports
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage -> accumulated seconds of the request being served (None outside requests)
+_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Minimal Prometheus histogram: per label set bucket counts, sum and count."""
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _format_labels(self, label_values, extra=None):
+        pairs = list(zip(self.labels, label_values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> str:
+        """Text exposition format (version 0.0.4)"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+        for label_values, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self._format_labels(label_values, ("le", repr(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = self._format_labels(label_values, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self._format_labels(label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    "meuat_request_duration_seconds", "Tempo total das requisições HTTP.",
+    ("method", "route", "status"))
+STAGE_SECONDS = Histogram(
+    "meuat_stage_duration_seconds",
+    "Tempo por etapa (pool, db, sql, format, serialize) de cada requisição.",
+    ("route", "stage"))
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    "meuat_pool_checkout_seconds", "Espera por uma conexão do pool do banco.")
+
+REGISTRY = (REQUEST_SECONDS, STAGE_SECONDS, POOL_CHECKOUT_SECONDS)
+
+
+def render_metrics() -> str:
+    return "\n".join(h.render() for h in REGISTRY) + "\n"
+
+
+def record(stage_name: str, seconds: float):
+    """Adds time to a stage of the current request (no-op outside requests)"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage_name] = timings.get(stage_name, 0.0) + seconds
+
+
+@contextmanager
+def stage(stage_name: str):
+    """Times the block as a stage of the current request"""
+    if _timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage_name, time.perf_counter() - start)
+
+
+def server_timing(timings: dict, total: float) -> bytes:
+    """Server-Timing header value (milliseconds), readable in the browser devtools"""
+    items = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    items.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(items).encode("latin-1")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if starts:
+        record("sql", time.perf_counter() - starts.pop())
+
+
+def instrument_engine(sync_engine):
+    """Times every SQL statement run by the engine (use async_engine.sync_engine for asyncpg)"""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no response buffering): it opens the per-request stage
+    timings, adds the Server-Timing header and feeds the histograms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            # Route templates (not raw paths) keep the label cardinality bounded
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], path, str(status[0]))
+            for stage_name, seconds in timings.items():
+                STAGE_SECONDS.observe(seconds, path, stage_name)
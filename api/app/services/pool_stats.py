@@ -0,0 +1,60 @@
+# app/services/pool_stats.py
+import time
+from contextlib import contextmanager
+from . import metrics
+
+
+def pool_counters(pool) -> dict:
+    """Connections of a SQLAlchemy QueuePool (None for pools without counters, e.g. NullPool)"""
+    def counter(name):
+        method = getattr(pool, name, None)
+        return method() if callable(method) else None
+
+    return {
+        "size": counter("size"),
+        "in_use": counter("checkedout"),
+        "idle": counter("checkedin"),
+        # Negative while the persistent connections aren't all opened yet
+        "overflow": counter("overflow"),
+    }
+
+
+class PoolTelemetry:
+    """
+    Checkout counters of the async pool: requests waiting for a connection right
+    now and how long the checkouts took (also exported as a /metrics histogram).
+    Updated from the event loop thread only, so no lock is needed
+    """
+
+    def __init__(self):
+        self.waiting = 0
+        self.checkouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @contextmanager
+    def checkout(self):
+        """Times the block that acquires a connection"""
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.waiting -= 1
+            self.checkouts += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            metrics.POOL_CHECKOUT_SECONDS.observe(elapsed)
+
+    def stats(self, pool) -> dict:
+        return {
+            **pool_counters(pool),
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "checkout_avg_ms": round(self.total_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "checkout_max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+pool_telemetry = PoolTelemetry()
@@ -0,0 +1,113 @@
+# app/services/serializers.py
+import logging
+import os
+import orjson
+from fastapi.responses import Response
+from ..crud import format_records
+from ..schemas.farm import FARM_FIELDS
+from . import binary_formats, metrics
+
+logger = logging.getLogger(__name__)
+
+# Computed values appended after the geometry by some searches
+COMPUTED_FIELDS = ("distance_m", "intersection_area_m2")
+
+# When enabled the farm responses are assembled straight from the GeoJSON text
+# produced by PostGIS, skipping json.loads and the Pydantic validation of coordinates
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() in ("1", "true", "yes")
+
+
+def _geometry_bytes(geometry) -> bytes:
+    if geometry is None:
+        return b"null"
+    if isinstance(geometry, str):
+        return geometry.encode()
+    if isinstance(geometry, bytes):
+        return geometry
+    # Already parsed (dict)
+    return orjson.dumps(geometry)
+
+
+def dump_farm(record) -> bytes:
+    """
+    It serializes one farm record splicing its raw GeoJSON geometry. Only the keys
+    present in the record (the projection) are written, in the FarmResponse order
+    """
+    parts = [orjson.dumps({k: record[k] for k in FARM_FIELDS if k in record})[:-1]]
+    if "geometry" in record:
+        parts += (b',"geometry":', _geometry_bytes(record["geometry"]))
+    for key in COMPUTED_FIELDS:
+        if key in record:
+            parts += (b',"%s":' % key.encode(), orjson.dumps(record[key]))
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+def dump_farms(records) -> bytes:
+    return b"[" + b",".join(dump_farm(r) for r in records) + b"]"
+
+
+def dump_farms_by_index(groups) -> bytes:
+    """{"<input index>": [farms...]} for the batch lookups"""
+    items = (b'"%d":' % i + dump_farms(records) for i, records in groups.items())
+    return b"{" + b",".join(items) + b"}"
+
+
+class FarmJSONResponse(Response):
+    media_type = "application/json"
+
+
+def render_farm(record):
+    """
+    Returns a ready response in fast mode, otherwise the parsed record so
+    FastAPI validates it against the response_model
+    """
+    if FAST_JSON_RESPONSES:
+        with metrics.stage("serialize"):
+            return FarmJSONResponse(content=dump_farm(record))
+    with metrics.stage("format"):
+        return format_records([record])[0]
+
+
+def render_farms(records, headers=None):
+    if FAST_JSON_RESPONSES:
+        with metrics.stage("serialize"):
+            return FarmJSONResponse(content=dump_farms(records), headers=headers)
+    with metrics.stage("format"):
+        return format_records(records)
+
+
+def render_farms_by_index(groups):
+    if FAST_JSON_RESPONSES:
+        with metrics.stage("serialize"):
+            return FarmJSONResponse(content=dump_farms_by_index(groups))
+    with metrics.stage("format"):
+        return {i: format_records(records) for i, records in groups.items()}
+
+
+def render_binary(media_type: str, keys, rows, headers=None):
+    """Search page encoded column-wise from the raw rows (Arrow IPC, GeoParquet, FlatGeobuf)"""
+    with metrics.stage("serialize"):
+        content = binary_formats.encode(media_type, keys, rows)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+async def stream_lookup(chunks):
+    """
+    {"farms": [...], "missing": [...]} written chunk by chunk. The farms are serialized
+    like render_farm, the missing ids are held until the end (they are only strings)
+    """
+    missing = []
+    first = True
+    yield b'{"farms":['
+    async for records, not_found in chunks:
+        missing.extend(not_found)
+        if not records:
+            continue
+        if FAST_JSON_RESPONSES:
+            body = b",".join(dump_farm(r) for r in records)
+        else:
+            body = b",".join(orjson.dumps(r) for r in format_records(records))
+        yield body if first else b"," + body
+        first = False
+    yield b'],"missing":' + orjson.dumps(missing) + b"}"
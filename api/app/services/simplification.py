@@ -0,0 +1,40 @@
+# app/services/simplification.py
+import math
+
+# Zoom levels whose simplified geometries are stored at seed time (farms.geom_z<zoom>)
+SIMPLIFY_ZOOMS = (6, 10, 14)
+# Tolerance in screen pixels (256px tiles): differences below it are invisible on the map
+SIMPLIFY_PIXELS = 0.5
+# ST_AsGeoJSON default, used when no zoom is requested
+MAX_DECIMAL_DIGITS = 9
+
+
+def pixel_size(zoom: int) -> float:
+    """Width of one screen pixel in degrees of longitude at the zoom level"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def tolerance_for_zoom(zoom: int) -> float:
+    """Simplification tolerance (degrees) used to build the level of this zoom"""
+    return pixel_size(zoom) * SIMPLIFY_PIXELS
+
+
+def precision_for_zoom(zoom: int) -> int:
+    """Decimal digits needed to place the coordinates within half a pixel"""
+    digits = math.ceil(-math.log10(pixel_size(zoom) / 2))
+    return min(max(digits, 0), MAX_DECIMAL_DIGITS)
+
+
+def level_for_zoom(zoom: int):
+    """
+    The coarsest stored level that still has enough detail for the zoom,
+    or None when only the original geometry does (zoom above every level)
+    """
+    for level in SIMPLIFY_ZOOMS:
+        if level >= zoom:
+            return level
+    return None
+
+
+def level_column(level: int) -> str:
+    return f"geom_z{level}"
@@ -0,0 +1,330 @@
+# app/services/spatial_index.py
+import json
+import logging
+import math
+import os
+import time
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+from ..database import SessionLocal
+from ..schemas.farm import FARM_FIELDS
+from . import cursors, simplification
+from .cities import normalize_city
+
+logger = logging.getLogger(__name__)
+
+# "postgis" (default) answers every search in the database,
+# "memory" keeps an in-process replica of the farms table
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "postgis").lower()
+
+# Mean earth radius (meters), the same sphere used by the distance math below
+EARTH_RADIUS = 6371008.8
+
+
+def _azimuthal_equidistant(lon0: float, lat0: float):
+    """
+    It returns a transformation to an azimuthal equidistant projection centered
+    on (lon0, lat0): distances from the center are preserved, so the distance
+    between a projected geometry and the origin is its geodesic distance.
+    """
+    phi0, lam0 = math.radians(lat0), math.radians(lon0)
+    sin_phi0, cos_phi0 = math.sin(phi0), math.cos(phi0)
+
+    def project(coords):
+        lam = np.radians(coords[:, 0]) - lam0
+        phi = np.radians(coords[:, 1])
+        cos_phi = np.cos(phi)
+        cos_c = np.clip(sin_phi0 * np.sin(phi) + cos_phi0 * cos_phi * np.cos(lam), -1.0, 1.0)
+        c = np.arccos(cos_c)
+        sin_c = np.sin(c)
+        k = np.divide(c, sin_c, out=np.ones_like(c), where=sin_c > 1e-12)
+        x = EARTH_RADIUS * k * cos_phi * np.sin(lam)
+        y = EARTH_RADIUS * k * (cos_phi0 * np.sin(phi) - sin_phi0 * cos_phi * np.cos(lam))
+        return np.column_stack((x, y))
+
+    return project
+
+
+def azimuthal_equal_area(lon0: float, lat0: float):
+    """
+    Lambert azimuthal equal-area projection centered on (lon0, lat0): planar
+    areas of projected geometries are their areas on the sphere (square meters).
+    """
+    phi0, lam0 = math.radians(lat0), math.radians(lon0)
+    sin_phi0, cos_phi0 = math.sin(phi0), math.cos(phi0)
+
+    def project(coords):
+        lam = np.radians(coords[:, 0]) - lam0
+        phi = np.radians(coords[:, 1])
+        cos_phi, cos_lam = np.cos(phi), np.cos(lam)
+        k = np.sqrt(2.0 / np.maximum(1.0 + sin_phi0 * np.sin(phi) + cos_phi0 * cos_phi * cos_lam, 1e-12))
+        x = EARTH_RADIUS * k * cos_phi * np.sin(lam)
+        y = EARTH_RADIUS * k * (cos_phi0 * np.sin(phi) - sin_phi0 * cos_phi * cos_lam)
+        return np.column_stack((x, y))
+
+    return project
+
+
+def radius_bbox(longitude: float, latitude: float, radius_m: float):
+    """Bounding box (in degrees) that contains every point within radius_m."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS) * 1.01
+    if abs(latitude) + dlat >= 90:
+        return (-180.0, max(latitude - dlat, -90.0), 180.0, min(latitude + dlat, 90.0))
+    dlon = min(dlat / math.cos(math.radians(abs(latitude) + dlat)), 180.0)
+    return (longitude - dlon, latitude - dlat, longitude + dlon, latitude + dlat)
+
+
+class FarmSnapshot:
+    """
+    Immutable in-memory copy of the farms table indexed by a packed R-tree (STRtree).
+    A new snapshot is built on every reload, so readers never see a partial state.
+    """
+
+    def __init__(self, records, geometries, version=None):
+        self.version = version
+        self.records = records
+        self.geometries = geometries
+        self.tree = STRtree(geometries)
+        # Same simplified levels stored by the seed (farms.geom_z<zoom>)
+        self.levels = {
+            zoom: shapely.simplify(
+                geometries, simplification.tolerance_for_zoom(zoom), preserve_topology=True)
+            for zoom in simplification.SIMPLIFY_ZOOMS
+        }
+        # Same normalization as farms.city_norm, computed once per snapshot
+        self.city_keys = [normalize_city(r.get("city")) or "" for r in records]
+
+    @classmethod
+    def from_rows(cls, rows, version=None):
+        """Builds the snapshot from rows holding the API fields plus the WKB geometry."""
+        records, wkbs = [], []
+        for r in rows:
+            item = dict(r._asdict()) if hasattr(r, "_asdict") else dict(r)
+            wkb = item.pop("wkb", None)
+            if not wkb or not item.get("geometry"):
+                continue
+            try:
+                # Validated once here, the text is served without parsing
+                json.loads(item["geometry"])
+            except (json.JSONDecodeError, TypeError) as e:
+                logger.error("Erro ao decodificar geometria do imóvel %s: %s", item.get('imovel_code'), e)
+                continue
+            records.append(item)
+            wkbs.append(bytes(wkb))
+
+        geometries = shapely.from_wkb(wkbs) if wkbs else np.array([], dtype=object)
+        return cls(records, geometries, version)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _match_filters(self, idx, filters):
+        """Same semantics as crud.apply_extra_filters"""
+        item = self.records[idx]
+        city = normalize_city(filters.city)
+        if city and city not in self.city_keys[idx]:
+            return False
+
+        area = item.get("area_size")
+        if filters.area_min is not None and (area is None or area < filters.area_min):
+            return False
+        if filters.area_max is not None and (area is None or area > filters.area_max):
+            return False
+        return True
+
+    def _output(self, idx, projection=None, distance=None):
+        """Copy of the record with only the projected fields, like crud.farm_columns"""
+        record = self.records[idx]
+        fields = FARM_FIELDS if projection is None or projection.fields is None else projection.fields
+        item = {f: record.get(f) for f in FARM_FIELDS if f == "imovel_code" or f in fields}
+
+        mode = "full" if projection is None else projection.geometry
+        zoom = None if projection is None else projection.zoom
+        if mode == "full" and zoom is None:
+            item["geometry"] = record["geometry"]
+        elif mode != "none":
+            item["geometry"] = self._geometry_json(idx, mode, zoom)
+
+        if distance is not None:
+            item["distance_m"] = distance
+        return item
+
+    def _geometry_json(self, idx, mode, zoom):
+        """Equivalent of crud.geometry_column: simplified level and rounded coordinates"""
+        geom = self.geometries[idx]
+        if mode == "full":
+            level = simplification.level_for_zoom(zoom)
+            geom = geom if level is None else self.levels[level][idx]
+        elif mode == "bbox":
+            geom = shapely.envelope(geom)
+        else:
+            geom = shapely.centroid(geom)
+
+        if zoom is not None:
+            digits = simplification.precision_for_zoom(zoom)
+            geom = shapely.transform(geom, lambda coords: np.round(coords, digits))
+        return shapely.to_geojson(geom)
+
+    def _page(self, indices, filters, distances=None, computed=None):
+        """
+        Filters and paginates the candidate indices ordered like crud.apply_pagination:
+        by imovel_code, or by (distance, imovel_code) when distances are given. Code
+        point order of str is the COLLATE "C" order of crud.SORT_CODE.
+        computed(idx) adds values calculated only for the rows of the page
+        """
+        def sort_key(pos):
+            code = self.records[indices[pos]]["imovel_code"]
+            return (code,) if distances is None else (distances[pos], code)
+
+        matches = [pos for pos, i in enumerate(indices) if self._match_filters(i, filters)]
+        matches.sort(key=sort_key)
+
+        if filters.cursor:
+            last_values = tuple(cursors.decode_cursor(
+                filters.cursor, 1 if distances is None else 2))
+            matches = [pos for pos in matches if sort_key(pos) > last_values]
+            selected = matches[:filters.size]
+        else:
+            offset = (filters.page - 1) * filters.size
+            selected = matches[offset:offset + filters.size]
+
+        output = [
+            self._output(indices[pos], filters, None if distances is None else distances[pos])
+            for pos in selected
+        ]
+        if computed is not None:
+            for pos, item in zip(selected, output):
+                item.update(computed(indices[pos]))
+        return output
+
+    def search_by_point(self, payload):
+        """Equivalent of ST_Contains(geometry, point)"""
+        pt = shapely.Point(payload.longitude, payload.latitude)
+        indices = self.tree.query(pt, predicate="within")
+        return self._page(indices.tolist(), payload)
+
+    def search_by_points(self, payload):
+        """Batch of point searches resolved with a single bulk query on the tree"""
+        points = shapely.points([(p.longitude, p.latitude) for p in payload.points])
+        point_idx, farm_idx = self.tree.query(points, predicate="within")
+
+        candidates = {i: [] for i in range(len(payload.points))}
+        for i, farm in zip(point_idx.tolist(), farm_idx.tolist()):
+            if self._match_filters(farm, payload):
+                candidates[i].append(farm)
+
+        output = {}
+        for i, farms in candidates.items():
+            farms.sort(key=lambda f: self.records[f]["imovel_code"])
+            output[i] = [self._output(f, payload) for f in farms[:payload.size]]
+        return output
+
+    def search_by_area(self, payload, area):
+        """
+        Equivalent of ST_Intersects(geometry, area). The intersection areas are computed
+        on a sphere (equal-area projection), PostGIS uses the spheroid
+        """
+        indices = self.tree.query(area, predicate="intersects")
+        if not payload.intersection:
+            return self._page(indices.tolist(), payload)
+
+        centroid = area.centroid
+        project = azimuthal_equal_area(centroid.x, centroid.y)
+        projected_area = shapely.transform(area, project)
+
+        def intersection_area(idx):
+            farm = shapely.transform(self.geometries[idx], project)
+            return {"intersection_area_m2": float(shapely.intersection(farm, projected_area).area)}
+
+        return self._page(indices.tolist(), payload, computed=intersection_area)
+
+    def _within(self, longitude, latitude, radius_m):
+        """Indices and geodesic distances (meters) of the farms within radius_m"""
+        bbox = shapely.box(*radius_bbox(longitude, latitude, radius_m))
+        candidates = self.tree.query(bbox)
+        if len(candidates) == 0:
+            return candidates, np.array([])
+
+        project = _azimuthal_equidistant(longitude, latitude)
+        projected = shapely.transform(self.geometries[candidates], project)
+        distances = shapely.distance(projected, shapely.Point(0, 0))
+        inside = distances <= radius_m
+        return candidates[inside], distances[inside]
+
+    def search_by_radius(self, payload):
+        """
+        Equivalent of ST_DWithin(geometry, point, radius, use_spheroid). Distances are
+        computed on a sphere, so only borderline matches may differ from PostGIS.
+        """
+        if payload.radius_km < 0:
+            return []
+
+        indices, distances = self._within(
+            payload.longitude, payload.latitude, payload.radius_km * 1000)
+        return self._page(indices.tolist(), payload, distances.tolist())
+
+    def search_nearest(self, latitude, longitude, k, projection=None):
+        """The k closest farms: the search circle grows until it holds k farms"""
+        radius_m = 1000.0
+        while True:
+            indices, distances = self._within(longitude, latitude, radius_m)
+            if len(indices) >= k or radius_m >= math.pi * EARTH_RADIUS:
+                break
+            radius_m *= 4
+
+        order = sorted(
+            range(len(indices)),
+            key=lambda pos: (distances[pos], self.records[indices[pos]]["imovel_code"]))
+        return [self._output(indices[pos], projection, float(distances[pos])) for pos in order[:k]]
+
+
+class SpatialIndex:
+    """Holds the current snapshot and swaps it atomically when the dataset changes."""
+
+    def __init__(self):
+        self.snapshot = None
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot is not None
+
+    def reload(self, version=None):
+        """Rebuilds the replica from the database and replaces the current snapshot."""
+        from .. import crud
+
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            snapshot = FarmSnapshot.from_rows(crud.get_index_rows(db), version)
+        finally:
+            db.close()
+
+        # Assigning the reference is atomic: in-flight searches keep the old snapshot
+        self.snapshot = snapshot
+        logger.info(
+            "Índice espacial em memória carregado: %s imóveis (versão %s) em %.2fs",
+            len(snapshot), version, time.perf_counter() - start)
+
+    def search_by_point(self, payload):
+        return self.snapshot.search_by_point(payload)
+
+    def search_by_points(self, payload):
+        return self.snapshot.search_by_points(payload)
+
+    def search_by_radius(self, payload):
+        return self.snapshot.search_by_radius(payload)
+
+    def search_by_area(self, payload, area):
+        return self.snapshot.search_by_area(payload, area)
+
+    def search_nearest(self, latitude, longitude, k, projection=None):
+        return self.snapshot.search_nearest(latitude, longitude, k, projection)
+
+
+farm_index = SpatialIndex()
+
+
+def is_active() -> bool:
+    """True when searches must be answered by the in-memory replica."""
+    return SEARCH_BACKEND == "memory" and farm_index.ready
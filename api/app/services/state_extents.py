@@ -0,0 +1,94 @@
+# app/services/state_extents.py
+import logging
+import re
+import time
+from sqlalchemy import text
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+STATE_EXTENTS_TABLE = "state_extents"
+# CAR codes start with the state: "SP-3502101-..."
+CAR_STATE = re.compile(r"^([A-Z]{2})-")
+
+
+def state_of(code: str):
+    """State (partition key) encoded in a CAR code, or None"""
+    match = CAR_STATE.match(code or "")
+    return match.group(1) if match else None
+
+
+def refresh_state_extent(conn, state_code: str, table: str):
+    """
+    Stores the bbox of one state partition, in the caller's transaction (the same one
+    that swaps or syncs the partition). An empty partition has no extent
+    """
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_EXTENTS_TABLE} (
+            state_code text PRIMARY KEY, farms bigint,
+            min_lon double precision, min_lat double precision,
+            max_lon double precision, max_lat double precision);
+    """))
+    conn.execute(text(f"DELETE FROM {STATE_EXTENTS_TABLE} WHERE state_code = :state"), {"state": state_code})
+    conn.execute(text(f"""
+        INSERT INTO {STATE_EXTENTS_TABLE}
+        SELECT :state, n, ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+        FROM (SELECT ST_Extent(geometry) AS e, COUNT(*) AS n FROM {table}) t
+        WHERE e IS NOT NULL
+    """), {"state": state_code})
+
+
+class StateExtents:
+    """
+    Bbox of each state partition of the farms table. The searches send the states
+    whose bbox intersects the search bbox, so PostgreSQL only scans their partitions.
+    Empty (no pruning) while the table doesn't exist, e.g. a database seeded before
+    the partitioning.
+    """
+
+    def __init__(self):
+        self.extents = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.extents)
+
+    def load(self, rows):
+        """(state_code, min_lon, min_lat, max_lon, max_lat) rows, swapped in at once"""
+        self.extents = {state: tuple(bbox) for state, *bbox in rows}
+
+    def reload(self, version=None):
+        """Dataset watcher callback: reads the state_extents table"""
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            if conn.execute(text(f"SELECT to_regclass('{STATE_EXTENTS_TABLE}')")).scalar() is None:
+                rows = []
+            else:
+                rows = conn.execute(text(
+                    f"SELECT state_code, min_lon, min_lat, max_lon, max_lat FROM {STATE_EXTENTS_TABLE}")).all()
+        self.load(rows)
+        logger.info(
+            "Extensões por estado carregadas: %s estados (versão %s) em %.2fs",
+            len(self.extents), version, time.perf_counter() - start)
+
+    def states_for(self, bbox):
+        """States whose extent intersects the bbox, or None when pruning is off"""
+        if not self.extents:
+            return None
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return sorted(
+            state for state, (x0, y0, x1, y1) in self.extents.items()
+            if x0 <= max_lon and min_lon <= x1 and y0 <= max_lat and min_lat <= y1
+        )
+
+    def states_of(self, codes):
+        """States of CAR codes, or None when any of them has no known state prefix"""
+        if not self.extents:
+            return None
+        states = {state_of(code) for code in codes}
+        if not states.issubset(self.extents):
+            return None
+        return sorted(states)
+
+
+state_extents = StateExtents()
@@ -0,0 +1,89 @@
+# app/services/tile_cache.py
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TILE_CACHE_DIR = os.getenv(
+    "TILE_CACHE_DIR", os.path.join(os.getenv("DATA_PATH", "/app/data"), "tiles"))
+TILE_CACHE_MAX_ITEMS = int(os.getenv("TILE_CACHE_MAX_ITEMS", "2048"))
+
+
+def tile_key(version: int, z: int, x: int, y: int) -> str:
+    """Content address of a tile: it only changes when the dataset version changes"""
+    return hashlib.sha256(f"{version}/{z}/{x}/{y}".encode()).hexdigest()
+
+
+class TileCache:
+    """
+    Two level cache for MVT tiles: an in-memory LRU in front of a directory
+    of files named by their key and grouped by dataset version.
+    """
+
+    def __init__(self, directory=TILE_CACHE_DIR, max_items=TILE_CACHE_MAX_ITEMS):
+        self.directory = directory
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, version, key):
+        return os.path.join(self.directory, f"v{version}", key[:2], f"{key}.pbf")
+
+    def _remember(self, key, tile):
+        with self._lock:
+            self._memory[key] = tile
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def get(self, version, z, x, y):
+        key = tile_key(version, z, x, y)
+        with self._lock:
+            tile = self._memory.get(key)
+            if tile is not None:
+                self._memory.move_to_end(key)
+                return tile
+
+        try:
+            with open(self._path(version, key), "rb") as f:
+                tile = f.read()
+        except OSError:
+            return None
+
+        self._remember(key, tile)
+        return tile
+
+    def put(self, version, z, x, y, tile: bytes):
+        key = tile_key(version, z, x, y)
+        self._remember(key, tile)
+
+        path = self._path(version, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see partial tiles
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(tile)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # The disk level is an optimization, memory still serves the tile
+            logger.warning("Falha ao gravar tile %s/%s/%s em disco: %s", z, x, y, e)
+
+    def prune(self, version):
+        """Drops every tile that doesn't belong to the given dataset version"""
+        with self._lock:
+            self._memory.clear()
+
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith("v") and name != f"v{version}":
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                logger.info("Cache de tiles da versão %s removido.", name[1:])
+
+
+tile_cache = TileCache()
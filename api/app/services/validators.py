@@ -1,14 +1,19 @@
 # app/services/validators.py
 import logging
+import os
+import shapely
 from fastapi import HTTPException, status
 
 logger = logging.getLogger(__name__)
 
+# Vertices accepted in the polygon of an area search
+AREA_MAX_VERTICES = int(os.getenv("AREA_MAX_VERTICES", "50000"))
+
 
 def validate_coordinates(latitude: float, longitude: float):
     """Checks if coordinates are within global limits."""
     if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
-        logger.warning(f"Coordenadas inválidas: {latitude}, {longitude}")
+        logger.warning("Coordenadas inválidas: %s, %s", latitude, longitude)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Coordenadas fora dos limites globais (Lat: -90 a 90, Lon: -180 a 180)."
@@ -18,13 +23,13 @@ def validate_coordinates(latitude: float, longitude: float):
 def validate_search_radius(radius_km: float):
     """Validates the search radius according to business limits."""
     if radius_km <= 0:
-        logger.warning(f"Raio inválido: {radius_km}")
+        logger.warning("Raio inválido: %s", radius_km)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="O raio de busca deve ser um valor positivo."
         )
     if radius_km > 1000:
-        logger.warning(f"Raio excessivo: {radius_km}km")
+        logger.warning("Raio excessivo: %skm", radius_km)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="O raio de busca máximo permitido é de 1000km."
@@ -39,3 +44,96 @@ def validate_imovel_id(id: str):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="O ID da fazenda não pode estar vazio."
         )
+
+
+def validate_tile(z: int, x: int, y: int):
+    """Checks if the tile coordinates exist in the Web Mercator pyramid."""
+    if not (0 <= z <= 22) or not (0 <= x < 2 ** z) or not (0 <= y < 2 ** z):
+        logger.warning("Tile inválido: %s/%s/%s", z, x, y)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Coordenadas de tile inválidas (zoom de 0 a 22)."
+        )
+
+
+def validate_export_area(latitude, longitude, radius_km):
+    """Checks if the optional spatial filter of an export is complete."""
+    if (latitude is None) != (longitude is None) or (radius_km is not None and latitude is None):
+        logger.warning("Filtro espacial incompleto: %s, %s, %s", latitude, longitude, radius_km)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe latitude e longitude juntas (e o raio apenas com um ponto)."
+        )
+    if latitude is not None:
+        validate_coordinates(latitude, longitude)
+    if radius_km is not None:
+        validate_search_radius(radius_km)
+
+
+def validate_bbox(bbox: str):
+    """Parses 'min_lon,min_lat,max_lon,max_lat' and checks its limits."""
+    try:
+        values = tuple(float(v) for v in bbox.split(","))
+    except ValueError:
+        values = ()
+    if len(values) != 4:
+        logger.warning("Bbox inválido: %s", bbox)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bbox deve ter o formato min_lon,min_lat,max_lon,max_lat."
+        )
+    min_lon, min_lat, max_lon, max_lat = values
+    validate_coordinates(min_lat, min_lon)
+    validate_coordinates(max_lat, max_lon)
+    if min_lon > max_lon or min_lat > max_lat:
+        logger.warning("Bbox invertido: %s", bbox)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bbox inválido: o mínimo deve ser menor ou igual ao máximo."
+        )
+    return values
+
+
+def validate_search_area(area, bbox):
+    """
+    Checks the area of an area search (GeoJSON polygon or bbox, exactly one)
+    and returns it as a shapely geometry.
+    """
+    if (area is None) == (bbox is None):
+        logger.warning("Área de busca ausente ou duplicada.")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe a área de busca como polígono (area) ou como bbox, apenas um deles."
+        )
+
+    if bbox is not None:
+        validate_bbox(",".join(str(v) for v in bbox))
+        return shapely.box(*bbox)
+
+    if area.type not in ("Polygon", "MultiPolygon"):
+        logger.warning("Tipo de geometria não suportado na busca por área: %s", area.type)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A área de busca deve ser um Polygon ou MultiPolygon."
+        )
+    try:
+        geom = shapely.from_geojson(area.model_dump_json())
+    except Exception:
+        geom = None
+    if geom is None or geom.is_empty or not geom.is_valid:
+        logger.warning("Polígono de busca inválido.")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Polígono inválido (anéis abertos, auto-interseção ou coordenadas malformadas)."
+        )
+
+    min_lon, min_lat, max_lon, max_lat = geom.bounds
+    validate_coordinates(min_lat, min_lon)
+    validate_coordinates(max_lat, max_lon)
+    if shapely.get_num_coordinates(geom) > AREA_MAX_VERTICES:
+        logger.warning("Polígono de busca com vértices demais: %s", shapely.get_num_coordinates(geom))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"O polígono de busca pode ter no máximo {AREA_MAX_VERTICES} vértices."
+        )
+    return geom
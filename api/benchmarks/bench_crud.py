@@ -0,0 +1,146 @@
+"""
+Latency of each crud search function, called one at a time over the synthetic dataset.
+
+* --backend memory: in-process STRtree replica built by the generator (no database)
+* --backend postgis: the API database (ASYNC_DATABASE_URL) loaded with
+  benchmarks.synthetic using the same --farms and --seed
+
+The query cache is off unless --cache is given, so every call reaches the backend.
+
+Usage (from the api folder): python -m benchmarks.bench_crud --backend memory --farms 20000
+"""
+import argparse
+import asyncio
+import random
+import time
+from app import crud
+from app.schemas.farm import AreaSearch, BatchPointSearch, PointSearch, RadiusSearch
+from app.services import spatial_index
+from app.services.cache import QueryCache
+from app.services.farm_grid import lonlat_to_tile
+from app.services.validators import validate_search_area
+from benchmarks import report, synthetic
+
+# Half side (degrees) of the bbox searches, about 11 km
+AREA_HALF_SIDE = 0.05
+RADIUS_KM = 5
+BATCH_POINTS = 100
+NEAREST_K = 10
+TILE_ZOOM = 12
+GRID_ZOOM = 8
+
+
+async def get_by_id(db, site, sites):
+    return await crud.get_by_id_async(db, site.imovel_code)
+
+
+async def search_by_point(db, site, sites):
+    return await crud.search_by_point_async(db, PointSearch(latitude=site.latitude, longitude=site.longitude))
+
+
+async def search_by_points(db, site, sites):
+    points = [{"latitude": s.latitude, "longitude": s.longitude} for s in sites[:BATCH_POINTS]]
+    groups = await crud.search_by_points_async(db, BatchPointSearch(pontos=points))
+    return [farm for farms in groups.values() for farm in farms]
+
+
+async def search_by_radius(db, site, sites):
+    payload = RadiusSearch(latitude=site.latitude, longitude=site.longitude, raio_km=RADIUS_KM)
+    return await crud.search_by_radius_async(db, payload)
+
+
+async def search_by_area(db, site, sites):
+    bbox = [site.longitude - AREA_HALF_SIDE, site.latitude - AREA_HALF_SIDE,
+            site.longitude + AREA_HALF_SIDE, site.latitude + AREA_HALF_SIDE]
+    payload = AreaSearch(bbox=bbox)
+    return await crud.search_by_area_async(db, payload, validate_search_area(None, payload.bbox))
+
+
+async def search_nearest(db, site, sites):
+    return await crud.search_nearest_async(db, site.latitude, site.longitude, NEAREST_K)
+
+
+async def get_tile(db, site, sites):
+    x, y = lonlat_to_tile(site.longitude, site.latitude, TILE_ZOOM)
+    return [await crud.get_tile(db, TILE_ZOOM, x, y)]
+
+
+async def get_grid_cells(db, site, sites):
+    bbox = (site.longitude - 1, site.latitude - 1, site.longitude + 1, site.latitude + 1)
+    return await crud.get_grid_cells_async(db, bbox, GRID_ZOOM)
+
+
+# Functions with an in-memory path run on both backends
+CASES = {
+    "search_by_point_async": search_by_point,
+    "search_by_points_async": search_by_points,
+    "search_by_radius_async": search_by_radius,
+    "search_by_area_async": search_by_area,
+    "search_nearest_async": search_nearest,
+}
+POSTGIS_CASES = {
+    "get_by_id_async": get_by_id,
+    "get_tile": get_tile,
+    "get_grid_cells_async": get_grid_cells,
+}
+
+
+async def measure(case, sites, iterations: int, warmup: int, session_factory):
+    rng = random.Random(0)
+    latencies, rows = [], 0
+    for i in range(warmup + iterations):
+        sample = rng.sample(sites, min(BATCH_POINTS, len(sites)))
+        start = time.perf_counter()
+        if session_factory:
+            async with session_factory() as db:
+                result = await case(db, sample[0], sample)
+        else:
+            result = await case(None, sample[0], sample)
+        if i >= warmup:
+            latencies.append(time.perf_counter() - start)
+            rows += len(result)
+    return {**report.summarize(latencies), "rows_mean": round(rows / max(iterations, 1), 1)}
+
+
+async def run(backend: str, farms: int, seed: int, iterations: int, warmup: int, cache: bool):
+    if not cache:
+        crud.query_cache = QueryCache()
+
+    session_factory, cases = None, dict(CASES)
+    if backend == "memory":
+        start = time.perf_counter()
+        spatial_index.SEARCH_BACKEND = "memory"
+        spatial_index.farm_index.snapshot = spatial_index.FarmSnapshot.from_rows(synthetic.snapshot_rows(farms, seed))
+        build_seconds = round(time.perf_counter() - start, 2)
+    else:
+        from app.database import AsyncSessionLocal, async_engine
+
+        session_factory, build_seconds = AsyncSessionLocal, None
+        cases.update(POSTGIS_CASES)
+
+    sites = list(synthetic.farm_sites(farms, seed).itertuples(index=False))
+    results = {}
+    for name, case in cases.items():
+        results[name] = await measure(case, sites, iterations, warmup, session_factory)
+
+    if session_factory:
+        await async_engine.dispose()
+    return {
+        "benchmark": "crud", "backend": backend, "farms": farms, "seed": seed,
+        "iterations": iterations, "cache": cache, "index_build_s": build_seconds,
+        "environment": report.environment(), "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=("memory", "postgis"), default="memory")
+    parser.add_argument("--farms", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--cache", action="store_true", help="Mantém o cache de consultas ligado")
+    parser.add_argument("--output", help="Arquivo JSON do relatório (padrão: stdout)")
+    args = parser.parse_args()
+    report.emit(asyncio.run(run(
+        args.backend, args.farms, args.seed, args.iterations, args.warmup, args.cache)), args.output)
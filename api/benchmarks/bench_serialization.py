@@ -0,0 +1,86 @@
+"""
+Compares the CPU cost of the two response paths for farm searches:
+
+* validated: json.loads of every geometry (format_records), Pydantic validation
+  and serialization against FarmResponse and json.dumps (as FastAPI's JSONResponse)
+* fast: orjson for the attributes with the PostGIS GeoJSON text spliced in
+* format_records: the geometry parsing step of the validated path alone
+
+Usage (from the api folder): python -m benchmarks.bench_serialization --rows 100 --vertices 2000
+"""
+import argparse
+import json
+import math
+import random
+import time
+from typing import List
+from pydantic import TypeAdapter
+from app.crud import format_records
+from app.schemas.farm import FarmResponse
+from app.services.serializers import dump_farms
+from benchmarks.report import environment
+
+
+def synthetic_record(code: int, vertices: int):
+    """A farm polygon with the coordinate precision of ST_AsGeoJSON (9 digits)"""
+    lon0, lat0 = random.uniform(-53, -45), random.uniform(-25, -20)
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = 0.01 * (1 + 0.2 * random.random())
+        ring.append([round(lon0 + r * math.cos(angle), 9), round(lat0 + r * math.sin(angle), 9)])
+    ring.append(ring[0])
+    return {
+        "imovel_code": f"SP-{code:010d}", "city": "Andradina", "state_code": "SP",
+        "area_size": random.uniform(1, 500), "fiscal_module": random.uniform(0.1, 10),
+        "status": "AT", "type": "IRU", "created_at": "2020-01-01",
+        "geometry": json.dumps({"type": "Polygon", "coordinates": [ring]}, separators=(",", ":")),
+    }
+
+
+def validated_path(records, adapter):
+    farms = adapter.validate_python(format_records(records))
+    content = adapter.dump_python(farms, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_path(records, adapter):
+    return dump_farms(records)
+
+
+def parse_path(records, adapter):
+    # format_records alone: the json.loads of every geometry done by the validated path
+    return format_records(records)
+
+
+def measure(func, records, adapter, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        body = func(records, adapter)
+        timings.append(time.process_time() - start)
+    return min(timings), len(body) if isinstance(body, bytes) else None
+
+
+def run(rows: int, vertices: int, repeat: int):
+    random.seed(42)
+    records = [synthetic_record(i, vertices) for i in range(rows)]
+    adapter = TypeAdapter(List[FarmResponse])
+
+    report = {"rows": rows, "vertices": vertices, "repeat": repeat, "environment": environment()}
+    for name, func in (("validated", validated_path), ("fast", fast_path)):
+        cpu, size = measure(func, records, adapter, repeat)
+        report[name] = {"cpu_ms": round(cpu * 1000, 3), "bytes": size}
+    cpu, _ = measure(parse_path, records, adapter, repeat)
+    report["format_records"] = {"cpu_ms": round(cpu * 1000, 3)}
+    report["speedup"] = round(report["validated"]["cpu_ms"] / max(report["fast"]["cpu_ms"], 1e-6), 1)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--vertices", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.vertices, args.repeat), indent=2))
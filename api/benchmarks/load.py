@@ -0,0 +1,120 @@
+"""
+HTTP load driver: replays a mix of point, radius and id requests over the synthetic
+dataset at a fixed concurrency and reports throughput, latency percentiles and status
+codes per request kind.
+
+* --url: a running API (docker compose, loaded with benchmarks.synthetic using the
+  same --farms and --seed)
+* --in-process: the app itself through the ASGI transport (same environment variables
+  as the API, e.g. SEARCH_BACKEND=memory), without network nor uvicorn
+
+Usage (from the api folder):
+    python -m benchmarks.load --url http://localhost:8004 --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+import httpx
+from app.services.admission import parse_pairs
+from benchmarks import report, synthetic
+
+RADII_KM = (1, 2, 5, 10)
+
+
+def build_request(kind: str, site, rng: random.Random):
+    """(method, path, json body) of one request of the kind"""
+    if kind == "point":
+        return "POST", "/fazendas/busca-ponto", {"latitude": site.latitude, "longitude": site.longitude}
+    if kind == "radius":
+        return "POST", "/fazendas/busca-raio", {
+            "latitude": site.latitude, "longitude": site.longitude, "raio_km": rng.choice(RADII_KM)}
+    if kind == "id":
+        return "GET", f"/fazendas/{site.imovel_code}", None
+    raise ValueError(f"Tipo de requisição desconhecido: {kind}")
+
+
+async def worker(client, sites, kinds, weights, deadline, warmup_until, rng, samples, statuses):
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            return
+        kind = rng.choices(kinds, weights)[0]
+        method, path, body = build_request(kind, rng.choice(sites), rng)
+
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        if start >= warmup_until:
+            samples[kind].append(elapsed)
+            statuses[kind][str(status)] += 1
+
+
+async def drive(client, sites, mix: dict, concurrency: int, duration: float, warmup: float, seed: int):
+    kinds, weights = list(mix), list(mix.values())
+    samples, statuses = defaultdict(list), defaultdict(Counter)
+    start = time.perf_counter()
+    warmup_until = start + warmup
+    deadline = warmup_until + duration
+    await asyncio.gather(*(
+        worker(client, sites, kinds, weights, deadline, warmup_until, random.Random(seed + i), samples, statuses)
+        for i in range(concurrency)
+    ))
+    # Requests started before the deadline finish after it: measure up to the last one
+    elapsed = time.perf_counter() - warmup_until
+
+    every = [latency for kind in kinds for latency in samples[kind]]
+    return {
+        "total": report.summarize(every, elapsed),
+        "kinds": {
+            kind: {**report.summarize(samples[kind], elapsed), "status": dict(statuses[kind])}
+            for kind in kinds
+        },
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+async def run(args):
+    sites = list(synthetic.farm_sites(args.farms, args.seed).itertuples(index=False))
+    mix = parse_pairs(args.mix, float)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.in_process:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            results = await drive(client, sites, mix, args.concurrency, args.duration, args.warmup, args.seed)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            results = await drive(client, sites, mix, args.concurrency, args.duration, args.warmup, args.seed)
+
+    return {
+        "benchmark": "load", "target": "in-process" if args.in_process else args.url,
+        "farms": args.farms, "seed": args.seed, "mix": mix, "concurrency": args.concurrency,
+        "duration_s": args.duration, "environment": report.environment(), **results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8004")
+    target.add_argument("--in-process", action="store_true", help="Chama a aplicação via ASGI, sem servidor")
+    parser.add_argument("--farms", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", default="point=6,radius=3,id=1", help="Pesos por tipo de requisição")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Segundos medidos")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos iniciais descartados")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Arquivo JSON do relatório (padrão: stdout)")
+    args = parser.parse_args()
+    report.emit(asyncio.run(run(args)), args.output)
@@ -0,0 +1,55 @@
+"""
+Report format shared by the benchmarks: latency percentiles, throughput and the run
+environment as JSON, so runs of different commits/machines can be diffed side by side
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+
+
+def summarize(latencies, elapsed: float = None) -> dict:
+    """Latencies (seconds) -> count, throughput over the elapsed wall time and percentiles in ms"""
+    values = np.asarray(latencies, dtype=float) * 1000
+    if not len(values):
+        return {"count": 0}
+
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    summary = {
+        "count": int(len(values)),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def emit(report: dict, output: str = None):
+    """Prints the report, or writes it to the output file"""
+    content = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(content + "\n")
+    else:
+        print(content)
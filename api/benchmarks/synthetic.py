@@ -0,0 +1,210 @@
+"""
+Synthetic CAR dataset: N farm polygons with the size and vertex distributions of the
+SP registry, in the farms schema. The same --farms/--seed always produce the same farms,
+so the load driver and the crud benchmarks can pick real ids and points without a query.
+
+Usage (from the api folder):
+    python -m benchmarks.synthetic --farms 100000 --seed 42        # loads DATABASE_URL
+    python -m benchmarks.synthetic --farms 1000 --output farms.fgb # file (any OGR driver)
+"""
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+import shapely
+
+logger = logging.getLogger(__name__)
+
+# Municipalities the farms are scattered around: (name, IBGE code, lon, lat)
+CITIES = [
+    ("Andradina", "3502101", -51.379, -20.896),
+    ("Araçatuba", "3502804", -50.432, -21.208),
+    ("Presidente Prudente", "3541406", -51.388, -22.125),
+    ("São José do Rio Preto", "3549805", -49.379, -20.819),
+    ("Ribeirão Preto", "3543402", -47.810, -21.177),
+    ("Franca", "3516200", -47.400, -20.539),
+    ("Bauru", "3506003", -49.060, -22.314),
+    ("Marília", "3529005", -49.946, -22.217),
+    ("Itapetininga", "3522307", -48.053, -23.591),
+    ("Registro", "3542602", -47.844, -24.487),
+]
+# Degrees (std) of the farms around the city centre, roughly the municipality size
+CITY_SPREAD = 0.2
+
+# Area (ha): log-normal with the long tail of the registry, from smallholdings to
+# the few large estates (median 20 ha)
+AREA_MEDIAN_HA = 20.0
+AREA_SIGMA = 1.4
+AREA_RANGE_HA = (0.5, 50000.0)
+# Vertices: log-normal growing with the area (larger farms follow rivers and roads)
+VERTICES_MEDIAN = 40
+VERTICES_SIGMA = 0.8
+VERTICES_RANGE = (4, 5000)
+# Boundary irregularity: low frequency lobes plus per-vertex noise (fraction of the radius)
+LOBES = (0.18, 0.08, 0.04)
+NOISE = 0.03
+
+STATUS = (("AT", 0.85), ("PE", 0.10), ("SU", 0.04), ("CA", 0.01))
+TYPES = (("IRU", 0.95), ("AST", 0.03), ("PCT", 0.02))
+# Hectares of one fiscal module in the SP municipalities
+FISCAL_MODULES_HA = (10, 12, 16, 20, 22, 24, 28, 30, 35, 40)
+
+# Polygons are built (and loaded) in chunks of fixed size, part of the reproducible output
+CHUNK_SIZE = 20000
+
+METERS_PER_DEGREE = 111320.0
+
+
+def _choice(rng, options, size):
+    values, weights = zip(*options)
+    return rng.choice(values, size=size, p=weights)
+
+
+def farm_sites(count: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Attributes of the farms (API column names) plus the centre (longitude, latitude),
+    which is always inside the polygon, and the vertex count. Cheap: no geometry
+    """
+    rng = np.random.default_rng(seed)
+    cities = rng.integers(0, len(CITIES), count)
+    centres = np.array([(lon, lat) for _, _, lon, lat in CITIES])[cities]
+    centres = centres + rng.normal(0, CITY_SPREAD, (count, 2))
+
+    area = np.clip(
+        rng.lognormal(np.log(AREA_MEDIAN_HA), AREA_SIGMA, count), *AREA_RANGE_HA)
+    vertices = np.clip(
+        rng.lognormal(np.log(VERTICES_MEDIAN) + 0.25 * np.log(area / AREA_MEDIAN_HA), VERTICES_SIGMA, count),
+        *VERTICES_RANGE).astype(int)
+    created = np.datetime64("2014-05-01") + rng.integers(0, 3650, count).astype("timedelta64[D]")
+    codes = [
+        f"SP-{CITIES[c][1]}-{rng.bytes(16).hex().upper()}" for c in cities
+    ]
+
+    return pd.DataFrame({
+        "imovel_code": codes,
+        "city": [CITIES[c][0] for c in cities],
+        "state_code": "SP",
+        "area_size": area.round(4),
+        "fiscal_module": (area / rng.choice(FISCAL_MODULES_HA, count)).round(4),
+        "status": _choice(rng, STATUS, count),
+        "type": _choice(rng, TYPES, count),
+        "created_at": created.astype(str),
+        "longitude": centres[:, 0],
+        "latitude": centres[:, 1],
+        "vertices": vertices,
+    })
+
+
+def farm_polygons(sites: pd.DataFrame, seed: int = 42, offset: int = 0):
+    """
+    Star-shaped polygons around each centre (always valid), with the vertex count of
+    the site and scaled to its area. Built with a single vectorized pass per chunk
+    """
+    rng = np.random.default_rng([seed, offset])
+    count = len(sites)
+    vertices = sites["vertices"].to_numpy()
+    farm = np.repeat(np.arange(count), vertices)
+    total = len(farm)
+
+    # Jittered, strictly increasing angles around the whole turn
+    starts = np.concatenate(([0], np.cumsum(vertices)[:-1]))
+    position = np.arange(total) - starts[farm]
+    angles = 2 * np.pi * (position + 0.8 * rng.uniform(0, 1, total)) / vertices[farm]
+    radius = 1 + NOISE * rng.uniform(-1, 1, total)
+    for harmonic, amplitude in enumerate(LOBES, start=2):
+        phase = rng.uniform(0, 2 * np.pi, count)[farm]
+        radius += amplitude * np.cos(harmonic * angles + phase)
+    x, y = radius * np.cos(angles), radius * np.sin(angles)
+
+    # Shoelace area of each unit polygon, then the scale that gives the farm area
+    following = np.arange(total) + 1
+    following[np.cumsum(vertices) - 1] = starts
+    unit_area = np.add.reduceat(x * y[following] - x[following] * y, starts) / 2
+    scale = np.sqrt(sites["area_size"].to_numpy() * 10000 / unit_area)[farm]
+
+    latitude = sites["latitude"].to_numpy()[farm]
+    longitude = sites["longitude"].to_numpy()[farm]
+    coords = np.column_stack((
+        longitude + x * scale / (METERS_PER_DEGREE * np.cos(np.radians(latitude))),
+        latitude + y * scale / METERS_PER_DEGREE,
+    ))
+    return shapely.polygons(shapely.linearrings(coords, indices=farm))
+
+
+def chunks(count: int, seed: int = 42):
+    """(attributes frame, polygons) of each chunk of the dataset"""
+    sites = farm_sites(count, seed)
+    for offset in range(0, count, CHUNK_SIZE):
+        chunk = sites.iloc[offset:offset + CHUNK_SIZE]
+        yield chunk.drop(columns=["longitude", "latitude", "vertices"]), farm_polygons(chunk, seed, offset)
+
+
+def snapshot_rows(count: int, seed: int = 42):
+    """Rows of the in-memory backend (FarmSnapshot.from_rows), without a database"""
+    for frame, polygons in chunks(count, seed):
+        geojson = shapely.to_geojson(polygons)
+        wkb = shapely.to_wkb(polygons)
+        for record, text, binary in zip(frame.to_dict("records"), geojson, wkb):
+            yield {**record, "geometry": text, "wkb": binary}
+
+
+def load_database(count: int, seed: int = 42):
+    """
+    Replaces the SP partition of the farms table by the synthetic dataset through the
+    seed pipeline (staging COPY, indexes, partition swap, aggregates pyramid and
+    dataset version bump)
+    """
+    from app.database import engine
+    from app.services.dataset_version import bump_dataset_version
+    from app.services.farm_grid import rebuild_grid
+    from scripts import ingest
+
+    start = time.perf_counter()
+    ingest.ensure_partitioned()
+    staging = ingest.staging_name("SP")
+    ingest.create_staging_table(staging)
+    raw_conn = engine.raw_connection()
+    try:
+        for frame, polygons in chunks(count, seed):
+            payload, rows = ingest.copy_payload(frame, polygons)
+            ingest.copy_chunk(raw_conn, payload, staging)
+            logger.info("Fazendas sintéticas carregadas: %s", rows)
+    finally:
+        raw_conn.close()
+
+    ingest.prepare_staging("SP")
+    ingest.swap_partition("SP")
+    with engine.begin() as conn:
+        rebuild_grid(conn)
+        version = bump_dataset_version(conn)
+    logger.info(
+        "Dataset sintético (%s fazendas, seed %s) carregado em %.1fs, versão %s.",
+        count, seed, time.perf_counter() - start, version)
+
+
+def write_file(count: int, seed: int, path: str):
+    import geopandas
+
+    frames = [
+        geopandas.GeoDataFrame(frame, geometry=polygons, crs="EPSG:4326")
+        for frame, polygons in chunks(count, seed)
+    ]
+    pd.concat(frames).to_file(path, engine="pyogrio")
+    logger.info("Dataset sintético (%s fazendas, seed %s) gravado em %s.", count, seed, path)
+
+
+if __name__ == "__main__":
+    from app.logging_config import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--farms", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo de saída em vez do banco (extensão define o formato)")
+    args = parser.parse_args()
+
+    if args.output:
+        write_file(args.farms, args.seed, args.output)
+    else:
+        load_database(args.farms, args.seed)
@@ -0,0 +1,507 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import resource
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from importlib.util import find_spec
+import numpy as np
+import pandas as pd
+import pyogrio
+import shapely
+from sqlalchemy import text
+from app.database import engine
+from app.services.cities import normalize_city
+from app.services.state_extents import refresh_state_extent
+from app.services import simplification
+
+logger = logging.getLogger(__name__)
+
+# Partitioned parent: one LIST partition per state (farms_sp, farms_mg...)
+TABLE_NAME = "farms"
+# Flat farms table of databases seeded before the partitioning, while it's converted
+LEGACY_TABLE = "farms_legacy"
+
+CHANGES_TABLE = "farm_changes"
+
+# Features read (and reprojected) by each worker task
+CHUNK_SIZE = int(os.getenv("SEED_CHUNK_SIZE", "20000"))
+WORKERS = int(os.getenv("SEED_WORKERS", str(os.cpu_count() or 2)))
+# Changed farms written per statement in the incremental sync (one transaction for all)
+SYNC_BATCH_SIZE = int(os.getenv("SEED_SYNC_BATCH_SIZE", "5000"))
+# Arrow batches are much faster to decode when pyarrow is available
+USE_ARROW = find_spec("pyarrow") is not None
+
+# Map internal CAR names to our API Schema
+COLUMN_MAPPING = {
+    'cod_imovel': 'imovel_code',
+    'municipio': 'city',
+    'cod_estado': 'state_code',
+    'num_area': 'area_size',
+    'mod_fiscal': 'fiscal_module',
+    'ind_status': 'status',
+    'ind_tipo': 'type',
+    'dat_criaca': 'created_at',
+}
+
+STATE_CODE = re.compile(r"^[A-Z]{2}$")
+
+# Column order of the COPY stream (geometry as hex EWKB, md5 of the whole row last)
+COLUMNS = [
+    ("imovel_code", "text"),
+    ("city", "text"),
+    ("state_code", "text"),
+    ("area_size", "double precision"),
+    ("fiscal_module", "double precision"),
+    ("status", "text"),
+    ("type", "text"),
+    ("created_at", "text"),
+    ("city_norm", "text"),
+    ("geometry", "geometry(Geometry, 4326)"),
+    *((simplification.level_column(z), "geometry(Geometry, 4326)") for z in simplification.SIMPLIFY_ZOOMS),
+    ("row_hash", "text"),
+]
+
+
+def transform_chunk(file_path: str, offset: int, count: int):
+    """
+    Worker task: reads one slice of the file, reprojects it to WGS84, renames the
+    columns and encodes it as CSV ready for COPY. Returns (payload, rows).
+    """
+    df = pyogrio.read_dataframe(
+        file_path, skip_features=offset, max_features=count, use_arrow=USE_ARROW)
+    if df.empty:
+        return b"", 0
+
+    # Transform to WGS84 (Standard for Web/Leaflet)
+    df = df.to_crs(epsg=4326)
+
+    frame = pd.DataFrame(index=df.index)
+    for source, target in COLUMN_MAPPING.items():
+        frame[target] = df[source] if source in df.columns else None
+    frame = frame[frame["imovel_code"].notna()]
+    return copy_payload(frame, np.asarray(df.geometry.loc[frame.index].values))
+
+
+def copy_payload(frame: pd.DataFrame, geometries):
+    """
+    Farms with the API attribute names (WGS84 geometries apart) encoded as CSV in the
+    COPY column order, with the derived columns. Returns (payload, rows).
+    """
+    frame = frame.copy()
+    # Accent/case insensitive city used by the filters and its trigram index
+    frame["city_norm"] = frame["city"].map(normalize_city)
+
+    geometries = shapely.set_srid(geometries, 4326)
+    frame["geometry"] = shapely.to_wkb(geometries, hex=True, include_srid=True)
+    # Simplified levels for zoomed-out maps, computed once here instead of on every request
+    for zoom in simplification.SIMPLIFY_ZOOMS:
+        simplified = shapely.simplify(
+            geometries, simplification.tolerance_for_zoom(zoom), preserve_topology=True)
+        frame[simplification.level_column(zoom)] = shapely.to_wkb(
+            shapely.set_srid(simplified, 4326), hex=True, include_srid=True)
+    # Change detection key for the incremental sync (attributes + geometry)
+    frame["row_hash"] = [
+        hashlib.md5("\x1f".join(map(str, row)).encode()).hexdigest()
+        for row in frame.itertuples(index=False)
+    ]
+
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    return buffer.getvalue().encode(), len(frame)
+
+
+def partition_name(state_code: str) -> str:
+    """farms partition holding the state ("SP" -> farms_sp)"""
+    if not STATE_CODE.match(state_code or ""):
+        raise ValueError(f"Código de estado inválido: {state_code!r}")
+    return f"{TABLE_NAME}_{state_code.lower()}"
+
+
+def staging_name(state_code: str) -> str:
+    return f"{partition_name(state_code)}_staging"
+
+
+def read_state(file_path: str) -> str:
+    """State of a SICAR file (one file per state), read from its first feature"""
+    df = pyogrio.read_dataframe(file_path, columns=["cod_estado"], read_geometry=False, max_features=1)
+    if df.empty or "cod_estado" not in df.columns:
+        raise ValueError(f"Arquivo sem a coluna cod_estado: {file_path}")
+    state_code = str(df["cod_estado"].iloc[0]).strip().upper()
+    partition_name(state_code)
+    return state_code
+
+
+def table_kind(conn, table_name: str):
+    """pg_class.relkind: 'p' partitioned, 'r' plain table, None when missing"""
+    return conn.execute(text(
+        "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(:name)"), {"name": table_name}).scalar()
+
+
+def create_parent_table(conn):
+    """
+    farms partitioned by LIST (state_code). Its indexes are partitioned indexes: an
+    attached partition brings its own equivalent ones, which are just linked to them
+    """
+    columns = ", ".join(f"{name} {kind}" for name, kind in COLUMNS)
+    conn.execute(text(f"CREATE TABLE {TABLE_NAME} ({columns}) PARTITION BY LIST (state_code);"))
+    # The partition key must be part of the primary key of a partitioned table
+    conn.execute(text(
+        f"ALTER TABLE {TABLE_NAME} ADD CONSTRAINT {TABLE_NAME}_pkey PRIMARY KEY (imovel_code, state_code);"))
+    conn.execute(text(
+        f"CREATE INDEX idx_{TABLE_NAME}_geom ON {TABLE_NAME} USING GIST (geometry);"))
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+    conn.execute(text(
+        f"CREATE INDEX idx_{TABLE_NAME}_city ON {TABLE_NAME} USING GIN (city_norm gin_trgm_ops);"))
+
+
+def ensure_partitioned():
+    """
+    Creates the partitioned farms table. A flat table seeded before the partitioning is
+    renamed to farms_legacy and its rows moved, state by state, into partitions.
+    Returns True when such a conversion happened.
+    """
+    with engine.begin() as conn:
+        kind = table_kind(conn, TABLE_NAME)
+        if kind == "p":
+            # Columns added after the table was created reach every partition
+            for name, column_kind in COLUMNS:
+                conn.execute(text(
+                    f"ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS {name} {column_kind};"))
+        else:
+            if kind == "r":
+                logger.info("Tabela %s sem particionamento: convertendo por estado.", TABLE_NAME)
+                conn.execute(text(f"ALTER TABLE {TABLE_NAME} RENAME TO {LEGACY_TABLE};"))
+                conn.execute(text(f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT IF EXISTS {TABLE_NAME}_pkey;"))
+                for suffix in ("geom", "city"):
+                    conn.execute(text(f"DROP INDEX IF EXISTS idx_{TABLE_NAME}_{suffix};"))
+            create_parent_table(conn)
+        # Also resumes a conversion interrupted midway (states already swapped are redone)
+        legacy = table_kind(conn, LEGACY_TABLE) is not None
+
+    if legacy:
+        convert_legacy()
+    return legacy
+
+
+def legacy_frame(rows):
+    """
+    Rows of the flat table (COLUMN_MAPPING attributes, WKB geometry) as the input of
+    copy_payload, so the converted partitions get the derived columns of a fresh load
+    """
+    frame = pd.DataFrame([row[:-1] for row in rows], columns=list(COLUMN_MAPPING.values()))
+    geometries = shapely.from_wkb([bytes(row[-1]) if row[-1] is not None else None for row in rows])
+    return frame, geometries
+
+
+def convert_legacy():
+    """
+    Each state of the flat table is streamed through copy_payload into a staging table
+    and attached as its partition. The flat table may predate city_norm, the simplified
+    levels and row_hash: they're rebuilt here instead of copied, or the converted states
+    would look loaded while the city filter and the zoomed-out tiles find nothing
+    """
+    with engine.connect() as conn:
+        states = conn.execute(text(
+            f"SELECT DISTINCT state_code FROM {LEGACY_TABLE} WHERE state_code IS NOT NULL")).scalars().all()
+        orphans = conn.execute(text(
+            f"SELECT COUNT(*) FROM {LEGACY_TABLE} WHERE state_code IS NULL")).scalar()
+    if orphans:
+        logger.warning("%s imóveis sem cod_estado não foram migrados.", orphans)
+
+    attributes = ", ".join(COLUMN_MAPPING.values())
+    for state_code in states:
+        start = time.perf_counter()
+        staging = staging_name(state_code)
+        create_staging_table(staging)
+        loaded = 0
+        raw_conn = engine.raw_connection()
+        try:
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, max_row_buffer=CHUNK_SIZE).execute(text(
+                    f"SELECT {attributes}, ST_AsBinary(geometry) FROM {LEGACY_TABLE} "
+                    "WHERE state_code = :state AND imovel_code IS NOT NULL"), {"state": state_code})
+                for rows in result.partitions(CHUNK_SIZE):
+                    payload, count = copy_payload(*legacy_frame(rows))
+                    copy_chunk(raw_conn, payload, staging)
+                    loaded += count
+        finally:
+            raw_conn.close()
+
+        prepare_staging(state_code)
+        swap_partition(state_code)
+        logger.info("Estado %s convertido: %s imóveis em %.1fs.", state_code, loaded, time.perf_counter() - start)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {LEGACY_TABLE};"))
+    logger.info("Conversão concluída: %s estados particionados.", len(states))
+
+
+def is_loaded(state_code: str) -> bool:
+    """True when the state partition exists and has farms"""
+    with engine.connect() as conn:
+        if table_kind(conn, partition_name(state_code)) is None:
+            return False
+        return conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {partition_name(state_code)})")).scalar()
+
+
+def create_staging_table(staging: str):
+    """UNLOGGED table: no WAL is written while loading"""
+    columns = ", ".join(f"{name} {kind}" for name, kind in COLUMNS)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging};"))
+        conn.execute(text(f"CREATE UNLOGGED TABLE {staging} ({columns});"))
+
+
+def copy_chunk(raw_conn, payload: bytes, staging: str):
+    """Streams one CSV chunk into the staging table with COPY FROM STDIN"""
+    columns = ", ".join(name for name, _ in COLUMNS)
+    with raw_conn.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)",
+            io.BytesIO(payload))
+    raw_conn.commit()
+
+
+def create_indexes(conn, table_name: str):
+    """Create Spatial (GIST) and B-Tree indexes for performance."""
+    # Primary Key (Unique CAR ID, with the partition key)
+    conn.execute(text(
+        f"ALTER TABLE {table_name} ADD CONSTRAINT {table_name}_pkey PRIMARY KEY (imovel_code, state_code);"))
+    # Spatial Index for Geo queries
+    conn.execute(text(
+        f"CREATE INDEX idx_{table_name}_geom ON {table_name} USING GIST (geometry);"))
+    # Trigram index: serves the '%city%' filter, which a B-tree cannot
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+    conn.execute(text(
+        f"CREATE INDEX idx_{table_name}_city ON {table_name} USING GIN (city_norm gin_trgm_ops);"))
+
+
+def prepare_staging(state_code: str):
+    """
+    Deduplicates, makes the table durable and builds its indexes (old partition still
+    serving). The CHECK constraint equal to the partition bound lets ATTACH skip the scan
+    """
+    staging = staging_name(state_code)
+    with engine.begin() as conn:
+        # Keeps the first occurrence of each CAR code
+        conn.execute(text(
+            f"DELETE FROM {staging} a USING {staging} b "
+            "WHERE a.imovel_code = b.imovel_code AND a.ctid > b.ctid;"))
+        others = conn.execute(text(
+            f"SELECT COUNT(*) FROM {staging} WHERE state_code IS DISTINCT FROM :state"), {"state": state_code}).scalar()
+        if others:
+            raise ValueError(f"{others} imóveis de outro estado no arquivo de {state_code}.")
+        conn.execute(text(
+            f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_state CHECK (state_code = '{state_code}');"))
+        conn.execute(text(f"ALTER TABLE {staging} SET LOGGED;"))
+        create_indexes(conn, staging)
+        conn.execute(text(f"ANALYZE {staging};"))
+
+
+def swap_partition(state_code: str):
+    """
+    Replaces the partition of one state by its staging table in a single short
+    transaction (the other states keep serving untouched) and stores its extent
+    """
+    partition, staging = partition_name(state_code), staging_name(state_code)
+    with engine.begin() as conn:
+        if table_kind(conn, partition) is not None:
+            conn.execute(text(f"ALTER TABLE {TABLE_NAME} DETACH PARTITION {partition};"))
+            conn.execute(text(f"DROP TABLE {partition};"))
+        conn.execute(text(f"ALTER TABLE {staging} RENAME TO {partition};"))
+        for suffix in ("pkey", "state"):
+            conn.execute(text(
+                f"ALTER TABLE {partition} RENAME CONSTRAINT {staging}_{suffix} TO {partition}_{suffix};"))
+        for suffix in ("geom", "city"):
+            conn.execute(text(
+                f"ALTER INDEX idx_{staging}_{suffix} RENAME TO idx_{partition}_{suffix};"))
+        conn.execute(text(
+            f"ALTER TABLE {TABLE_NAME} ATTACH PARTITION {partition} FOR VALUES IN ('{state_code}');"))
+        refresh_state_extent(conn, state_code, partition)
+
+
+def peak_memory_mb() -> float:
+    """
+    Peak resident memory of the calling process (Linux: KB). RUSAGE_CHILDREN would only
+    count workers already reaped, so each worker reports its own with the chunk
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def chunk_task(file_path: str, offset: int, count: int):
+    """Worker task: transform_chunk plus the worker's peak memory (a new pool per load)"""
+    return (*transform_chunk(file_path, offset, count), peak_memory_mb())
+
+
+def copy_to_staging(file_path: str, staging: str, limit: int = 0):
+    """
+    Streaming ingestion: chunks are transformed in worker processes and loaded
+    with COPY into an unlogged staging table. At most 2 chunks per worker are
+    in flight, so memory stays bounded. Returns the number of rows loaded.
+    """
+    total = pyogrio.read_info(file_path)["features"]
+    if limit:
+        total = min(total, limit)
+    if total == 0:
+        logger.warning("O arquivo de entrada está vazio.")
+        return 0
+
+    logger.info(
+        "Ingerindo %s registros de %s (lotes de %s, %s processos, arrow=%s)",
+        total, file_path, CHUNK_SIZE, WORKERS, USE_ARROW)
+    start = time.perf_counter()
+    create_staging_table(staging)
+
+    offsets = iter(range(0, total, CHUNK_SIZE))
+    loaded, worker_peak = 0, 0.0
+    raw_conn = engine.raw_connection()
+    try:
+        with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+            pending = set()
+            while True:
+                for offset in offsets:
+                    count = min(CHUNK_SIZE, total - offset)
+                    pending.add(pool.submit(chunk_task, file_path, offset, count))
+                    if len(pending) >= WORKERS * 2:
+                        break
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    payload, rows, peak = future.result()
+                    worker_peak = max(worker_peak, peak)
+                    if rows:
+                        copy_chunk(raw_conn, payload, staging)
+                        loaded += rows
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    "Progresso: %s/%s registros (%.0f registros/s, pico de memória: principal %.0f MB, "
+                    "maior worker %.0f MB)", loaded, total, loaded / elapsed, peak_memory_mb(), worker_peak)
+    finally:
+        raw_conn.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "COPY concluído: %s registros em %.1fs (%.0f registros/s, pico de memória: principal %.0f MB, "
+        "maior worker %.0f MB)", loaded, elapsed, loaded / max(elapsed, 1e-6), peak_memory_mb(), worker_peak)
+    return loaded
+
+
+def load_file(file_path: str, state_code: str, limit: int = 0):
+    """Full load of one state: its staging table replaces the state partition"""
+    start = time.perf_counter()
+    loaded = copy_to_staging(file_path, staging_name(state_code), limit)
+    if not loaded:
+        return 0
+
+    prepare_staging(state_code)
+    swap_partition(state_code)
+    logger.info("Carga completa de %s finalizada em %.1fs.", state_code, time.perf_counter() - start)
+    return loaded
+
+
+def build_changes(state_code: str):
+    """
+    Compares the staging rows with the state partition by imovel_code and row_hash and
+    records what must be inserted (I), updated (U) or deleted (D)
+    """
+    partition, staging = partition_name(state_code), staging_name(state_code)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"DELETE FROM {staging} a USING {staging} b "
+            "WHERE a.imovel_code = b.imovel_code AND a.ctid > b.ctid;"))
+        conn.execute(text(
+            f"ALTER TABLE {staging} ADD PRIMARY KEY (imovel_code);"))
+
+        conn.execute(text(f"DROP TABLE IF EXISTS {CHANGES_TABLE};"))
+        conn.execute(text(f"""
+            CREATE UNLOGGED TABLE {CHANGES_TABLE} AS
+            SELECT s.imovel_code, CASE WHEN f.imovel_code IS NULL THEN 'I' ELSE 'U' END AS op
+            FROM {staging} s
+            LEFT JOIN {partition} f ON f.imovel_code = s.imovel_code
+            WHERE f.imovel_code IS NULL OR f.row_hash IS DISTINCT FROM s.row_hash
+            UNION ALL
+            SELECT f.imovel_code, 'D'
+            FROM {partition} f
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {staging} s WHERE s.imovel_code = f.imovel_code);
+        """))
+        conn.execute(text(f"ALTER TABLE {CHANGES_TABLE} ADD PRIMARY KEY (imovel_code);"))
+
+        counts = dict(conn.execute(text(
+            f"SELECT op, COUNT(*) FROM {CHANGES_TABLE} GROUP BY op")).all())
+    return {op: counts.get(op, 0) for op in ("I", "U", "D")}
+
+
+def apply_changes(conn, state_code: str):
+    """
+    Applies the recorded changes in batches of SYNC_BATCH_SIZE codes (bounded statements),
+    all in the caller's transaction: a failure midway rolls the whole sync back instead
+    of leaving the partition half synced under the old dataset version
+    """
+    partition, staging = partition_name(state_code), staging_name(state_code)
+    columns = [name for name, _ in COLUMNS]
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in ("imovel_code", "state_code"))
+
+    last_code, batches = "", 0
+    while True:
+        batch = conn.execute(text(
+            f"SELECT imovel_code, op FROM {CHANGES_TABLE} WHERE imovel_code > :last "
+            "ORDER BY imovel_code LIMIT :size"), {"last": last_code, "size": SYNC_BATCH_SIZE}).all()
+        if not batch:
+            break
+
+        removed = [code for code, op in batch if op == "D"]
+        upserted = [code for code, op in batch if op != "D"]
+        if removed:
+            conn.execute(text(
+                f"DELETE FROM {partition} WHERE imovel_code = ANY(:codes)"), {"codes": removed})
+        if upserted:
+            conn.execute(text(
+                f"INSERT INTO {partition} ({column_list}) "
+                f"SELECT {column_list} FROM {staging} WHERE imovel_code = ANY(:codes) "
+                f"ON CONFLICT (imovel_code, state_code) DO UPDATE SET {updates}"), {"codes": upserted})
+
+        last_code = batch[-1][0]
+        batches += 1
+    return batches
+
+
+def sync_file(file_path: str, state_code: str, limit: int = 0):
+    """
+    Incremental sync of one state: only the farms whose hash changed are written, so
+    the refresh time and WAL volume follow the size of the diff. A state without a
+    partition yet is fully loaded instead. Returns the number of changed farms.
+    """
+    with engine.connect() as conn:
+        if table_kind(conn, partition_name(state_code)) is None:
+            return load_file(file_path, state_code, limit)
+
+    start = time.perf_counter()
+    if not copy_to_staging(file_path, staging_name(state_code), limit):
+        return 0
+
+    changes = build_changes(state_code)
+    logger.info(
+        "Diferenças encontradas em %s: %s inclusões, %s alterações, %s remoções",
+        state_code, changes['I'], changes['U'], changes['D'])
+
+    # Changes, extent and cleanup commit together. After a failure nothing was applied:
+    # running the sync again rebuilds the same diff from the file
+    with engine.begin() as conn:
+        batches = apply_changes(conn, state_code)
+        conn.execute(text(f"DROP TABLE IF EXISTS {CHANGES_TABLE};"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging_name(state_code)};"))
+        if sum(changes.values()):
+            conn.execute(text(f"ANALYZE {partition_name(state_code)};"))
+            refresh_state_extent(conn, state_code, partition_name(state_code))
+
+    logger.info(
+        "Sincronização de %s finalizada em %.1fs (%s lotes de até %s registros)",
+        state_code, time.perf_counter() - start, batches, SYNC_BATCH_SIZE)
+    return sum(changes.values())
@@ -0,0 +1,211 @@
+import argparse
+import io
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.strtree import STRtree
+from sqlalchemy import text
+from app.crud import OVERLAPS_TABLE
+from app.database import engine
+from app.services.farm_grid import cell_range, lonlat_to_tile, tile_bounds
+from app.services.spatial_index import azimuthal_equal_area
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "farms"
+STAGING_TABLE = "farm_overlaps_staging"
+
+# Web Mercator tiles the state is split into (z10: ~36 km in SP), one task per tile
+TILE_ZOOM = int(os.getenv("OVERLAP_TILE_ZOOM", "10"))
+WORKERS = int(os.getenv("OVERLAP_WORKERS", str(os.cpu_count() or 2)))
+# Smaller intersections are slivers of shared borders (digitizing noise), not overlaps
+MIN_OVERLAP_M2 = float(os.getenv("OVERLAP_MIN_M2", "1"))
+PROGRESS_SECONDS = 5
+
+TILE_FARMS_QUERY = text(f"""
+    SELECT imovel_code, ST_AsBinary(geometry)
+    FROM {TABLE_NAME}
+    WHERE geometry && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
+""")
+
+
+def overlap_rows(codes, geometries, zoom: int, x: int, y: int):
+    """
+    Overlaps of the farms read for one tile, in both directions (imovel_code,
+    overlap_code, overlap_m2, overlap_ratio). A pair whose bboxes cross tile borders is
+    read by every tile they touch: it's kept only by the tile holding the lower-left
+    corner of the intersection of both bboxes, so each pair is written exactly once.
+    """
+    if len(geometries) < 2:
+        return []
+
+    left, right = STRtree(geometries).query(geometries, predicate="intersects")
+    pairs = left < right
+    left, right = left[pairs], right[pairs]
+
+    bounds = shapely.bounds(geometries)
+    corner_lon = np.maximum(bounds[left, 0], bounds[right, 0])
+    corner_lat = np.maximum(bounds[left, 1], bounds[right, 1])
+    owned = np.array(
+        [lonlat_to_tile(lon, lat, zoom) == (x, y) for lon, lat in zip(corner_lon, corner_lat)], dtype=bool)
+    left, right = left[owned], right[owned]
+    if not len(left):
+        return []
+
+    # Equal-area projection: planar areas are the areas on the sphere (m²) anywhere
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(zoom, x, y)
+    project = azimuthal_equal_area((min_lon + max_lon) / 2, (min_lat + max_lat) / 2)
+    used = np.unique(np.concatenate((left, right)))
+    projected = np.empty(len(geometries), dtype=object)
+    projected[used] = [shapely.transform(g, project) for g in geometries[used]]
+    farm_area = np.zeros(len(geometries))
+    farm_area[used] = shapely.area(projected[used])
+
+    overlap = shapely.area(shapely.intersection(projected[left], projected[right]))
+    rows = []
+    for a, b, area in zip(left, right, overlap):
+        if area < MIN_OVERLAP_M2:
+            continue
+        rows.append((codes[a], codes[b], area, area / farm_area[a] if farm_area[a] else None))
+        rows.append((codes[b], codes[a], area, area / farm_area[b] if farm_area[b] else None))
+    return rows
+
+
+def reset_pool():
+    """Worker initializer: the connections inherited from the parent are not reused"""
+    engine.dispose(close=False)
+
+
+def tile_task(zoom: int, x: int, y: int):
+    """Worker task: overlaps owned by one tile encoded as CSV for COPY. Returns (payload, rows)."""
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(zoom, x, y)
+    with engine.connect() as conn:
+        farms = conn.execute(TILE_FARMS_QUERY, {
+            "min_lon": min_lon, "min_lat": min_lat, "max_lon": max_lon, "max_lat": max_lat}).all()
+    if len(farms) < 2:
+        return b"", 0
+
+    codes = [code for code, _ in farms]
+    geometries = shapely.from_wkb([bytes(wkb) for _, wkb in farms])
+    # Self-declared polygons may be invalid (self-intersections): repaired for the overlay
+    invalid = ~shapely.is_valid(geometries)
+    geometries[invalid] = shapely.make_valid(geometries[invalid])
+
+    rows = overlap_rows(codes, geometries, zoom, x, y)
+    if not rows:
+        return b"", 0
+    buffer = io.StringIO()
+    pd.DataFrame(rows).to_csv(buffer, index=False, header=False)
+    return buffer.getvalue().encode(), len(rows)
+
+
+def dataset_tiles(zoom: int):
+    """Every tile of the zoom covering the extent of the farms table"""
+    with engine.connect() as conn:
+        extent = conn.execute(text(
+            f"SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e) "
+            f"FROM (SELECT ST_Extent(geometry) AS e FROM {TABLE_NAME}) t")).first()
+    if not extent or extent[0] is None:
+        return []
+    x0, y0, x1, y1 = cell_range(extent, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def create_staging_table():
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE};"))
+        conn.execute(text(f"""
+            CREATE UNLOGGED TABLE {STAGING_TABLE} (
+                imovel_code text, overlap_code text,
+                overlap_m2 double precision, overlap_ratio double precision);
+        """))
+
+
+def copy_tile(raw_conn, payload: bytes):
+    with raw_conn.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (imovel_code, overlap_code, overlap_m2, overlap_ratio) "
+            "FROM STDIN WITH (FORMAT csv)", io.BytesIO(payload))
+    raw_conn.commit()
+
+
+def swap_staging():
+    """Indexes the new overlaps, then replaces the served table in a short transaction"""
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} SET LOGGED;"))
+        # Lookup by farm: the primary key prefix serves WHERE imovel_code = :id
+        conn.execute(text(
+            f"ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {STAGING_TABLE}_pkey "
+            "PRIMARY KEY (imovel_code, overlap_code);"))
+        conn.execute(text(f"ANALYZE {STAGING_TABLE};"))
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {OVERLAPS_TABLE};"))
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} RENAME TO {OVERLAPS_TABLE};"))
+        conn.execute(text(
+            f"ALTER TABLE {OVERLAPS_TABLE} RENAME CONSTRAINT {STAGING_TABLE}_pkey TO {OVERLAPS_TABLE}_pkey;"))
+
+
+def run_overlaps(zoom: int = TILE_ZOOM, workers: int = WORKERS):
+    """
+    Tiles are processed in worker processes (each reads its farms by the GiST index and
+    overlays them with shapely) and their rows loaded with COPY into a staging table
+    swapped in at the end. At most 2 tiles per worker are in flight.
+    """
+    start = time.perf_counter()
+    tiles = dataset_tiles(zoom)
+    if not tiles:
+        logger.warning("Nenhuma fazenda encontrada. Nada a calcular.")
+        return 0
+
+    logger.info("Calculando sobreposições: %s tiles (zoom %s, %s processos)", len(tiles), zoom, workers)
+    create_staging_table()
+    pending_tiles = iter(tiles)
+    done_tiles, loaded, logged = 0, 0, 0.0
+    raw_conn = engine.raw_connection()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=reset_pool) as pool:
+            pending = set()
+            while True:
+                for x, y in pending_tiles:
+                    pending.add(pool.submit(tile_task, zoom, x, y))
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    payload, rows = future.result()
+                    if rows:
+                        copy_tile(raw_conn, payload)
+                        loaded += rows
+                    done_tiles += 1
+                elapsed = time.perf_counter() - start
+                if elapsed - logged >= PROGRESS_SECONDS or not pending:
+                    logged = elapsed
+                    logger.info(
+                        "Progresso: %s/%s tiles (%.1f tiles/s), %s sobreposições",
+                        done_tiles, len(tiles), done_tiles / elapsed, loaded // 2)
+    finally:
+        raw_conn.close()
+
+    swap_staging()
+    logger.info(
+        "Sobreposições calculadas: %s pares em %.1fs.", loaded // 2, time.perf_counter() - start)
+    return loaded // 2
+
+
+if __name__ == "__main__":
+    from app.logging_config import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Calcula as sobreposições entre os polígonos do CAR (tabela farm_overlaps).")
+    parser.add_argument("--zoom", type=int, default=TILE_ZOOM, help="Zoom dos tiles de processamento")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+    run_overlaps(args.zoom, args.workers)
@@ -1,11 +1,14 @@
+import glob
 import os
 import logging
+import sys
 import time
-import geopandas as gpd
 from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
 from app.logging_config import setup_logging
 from app.database import engine
+from app.services.dataset_version import bump_dataset_version
+from app.services.farm_grid import GRID_TABLE, rebuild_grid
+from scripts import ingest
 
 # Initialize structured logging
 setup_logging()
@@ -15,8 +18,12 @@ logger = logging.getLogger(__name__)
 # Note: The 'data' folder is at the root, mapped to /app/data in Docker
 DATA_DIR = os.getenv("DATA_PATH", "/app/data")
 FILE_NAME = "AREA_IMOVEL_1.shp"
-TABLE_NAME = "farms"
-LIMIT_ROWS = 3000  # Limit for technical test performance
+# One SICAR file per state: comma separated names or glob patterns inside DATA_DIR
+SEED_FILES = [name.strip() for name in os.getenv("SEED_FILES", FILE_NAME).split(",") if name.strip()]
+# Opt-in cap on the farms read per file, e.g. 3000 for a quick demo (0: the whole file)
+LIMIT_ROWS = int(os.getenv("SEED_LIMIT_ROWS", "0"))
+# "once" only seeds an empty database, "sync" applies the file diff to a populated one
+SEED_MODE = os.getenv("SEED_MODE", "once").lower()
 
 
 def wait_for_db(retries=10, interval=3):
@@ -28,113 +35,72 @@ def wait_for_db(retries=10, interval=3):
                 conn.execute(text("SELECT 1"))
                 return True
         except Exception:
-            logger.warning(
-                f"Banco de dados não está pronto... ({i+1}/{retries})")
+            logger.warning("Banco de dados não está pronto... (%s/%s)", i + 1, retries)
             time.sleep(interval)
     return False
 
 
-def is_db_populated():
-    """Check if the table exists and already contains data."""
-    try:
-        with engine.connect() as conn:
-            # Check if table 'farms' exists and has rows
-            query = text(f"SELECT COUNT(*) FROM {TABLE_NAME}")
-            result = conn.execute(query)
-            count = result.scalar()
-            return count > 0
-    except Exception:
-        # Table probably doesn't exist yet
-        return False
-
-
-def create_indexes():
-    """Create Spatial (GIST) and B-Tree indexes for performance."""
-    logger.info("Criando chaves primárias e índices espaciais...")
-    with engine.connect() as conn:
-        try:
-            # Primary Key (Unique CAR ID)
-            conn.execute(
-                text(f"ALTER TABLE {TABLE_NAME} ADD PRIMARY KEY (imovel_code);"))
-            # Spatial Index for Geo queries
-            conn.execute(text(
-                f"CREATE INDEX IF NOT EXISTS idx_geom ON {TABLE_NAME} USING GIST (geometry);"))
-            # City index for text search
-            conn.execute(
-                text(f"CREATE INDEX IF NOT EXISTS idx_city ON {TABLE_NAME} (city);"))
-            conn.commit()
-            logger.info("Otimização: Índices criados com sucesso.")
-        except SQLAlchemyError as e:
-            logger.error(f"Falha ao criar índices: {e}")
-            conn.rollback()
-
-
-def run_seed():
+def seed_files(patterns=SEED_FILES):
+    """Files matched by the SEED_FILES patterns, in order and without repetitions"""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.path.join(DATA_DIR, pattern)))
+        if not matches:
+            logger.error("Arquivo não encontrado em: %s", os.path.join(DATA_DIR, pattern))
+        files.extend(path for path in matches if path not in files)
+    return files
+
+
+def ensure_grid():
+    """Builds the aggregates pyramid of databases seeded before it existed."""
+    with engine.begin() as conn:
+        if conn.execute(text(f"SELECT to_regclass('{GRID_TABLE}')")).scalar() is None:
+            rebuild_grid(conn)
+
+
+def run_seed(mode: str = SEED_MODE):
     """Main execution flow for seeding the database."""
     if not wait_for_db():
         logger.error(
             "Não foi possível conectar ao banco de dados. Abortando seed.")
         return
 
-    # REQUIREMENT: Only execute once
-    if is_db_populated():
-        logger.info(
-            "O banco de dados já está populado. Pulando o processo de seed.")
-        return
-
-    # Support multiple extensions for flexibility (GeoJSON or Shapefile)
-    file_path = os.path.join(DATA_DIR, FILE_NAME)
-
-    if not os.path.exists(file_path):
-        logger.error(f"Arquivo não encontrado em: {file_path}")
-        return
-
     try:
-        logger.info(f"Carregando dados de: {file_path}")
-        # GeoPandas handles the .shp/.dbf/.shx cluster automatically
-        df = gpd.read_file(file_path, rows=LIMIT_ROWS)
-
-        if df.empty:
-            logger.warning("O arquivo de entrada está vazio.")
+        # Databases seeded before the partitioning are converted in place
+        changed = ingest.ensure_partitioned()
+
+        for file_path in seed_files():
+            state_code = ingest.read_state(file_path)
+            # REQUIREMENT: Only execute once per state (unless an incremental sync was requested)
+            if mode != "sync" and ingest.is_loaded(state_code):
+                logger.info("Estado %s já está populado. Pulando %s.", state_code, file_path)
+                continue
+
+            logger.info("Carregando dados de %s: %s", state_code, file_path)
+            if mode == "sync":
+                # Only the farms whose attributes or geometry changed are written
+                changed = bool(ingest.sync_file(file_path, state_code, limit=LIMIT_ROWS)) or changed
+            else:
+                # Chunked reads + COPY into a staging table swapped in as the state partition
+                changed = bool(ingest.load_file(file_path, state_code, limit=LIMIT_ROWS)) or changed
+
+        if not changed:
+            logger.info("Nenhuma alteração encontrada. Versão do dataset mantida.")
+            ensure_grid()
             return
 
-        # Transform to WGS84 (Standard for Web/Leaflet)
-        df = df.to_crs(epsg=4326)
-
-        # Map internal CAR names to our API Schema
-        column_mapping = {
-            'cod_imovel': 'imovel_code',
-            'municipio': 'city',
-            'cod_estado': 'state_code',
-            'num_area': 'area_size',
-            'mod_fiscal': 'fiscal_module',
-            'ind_status': 'status',
-            'ind_tipo': 'type',
-            'dat_criaca': 'created_at',
-            'geometry': 'geometry'
-        }
-
-        # Filter only available columns
-        existing_cols = {k: v for k,
-                         v in column_mapping.items() if k in df.columns}
-        # Renaming columns to english
-        df = df[list(existing_cols.keys())].rename(columns=existing_cols)
-        # Removing duplicates
-        df = df.drop_duplicates(subset=['imovel_code'])
-
-        logger.info(f"Ingerindo {len(df)} registros no PostGIS...")
-        # Write to database
-        df.to_postgis(TABLE_NAME, engine, if_exists="replace", index=False)
-
-        # Add indexes after ingestion for faster writes
-        create_indexes()
+        # Aggregates pyramid and version bump commit together: replicas and
+        # caches reload against a pyramid that matches the new data
+        with engine.begin() as conn:
+            rebuild_grid(conn)
+            version = bump_dataset_version(conn)
+        logger.info("Versão do dataset atualizada para %s.", version)
 
         logger.info("Processo de seed finalizado com sucesso!")
 
     except Exception as e:
-        logger.critical(
-            f"Falha crítica durante o seed: {str(e)}", exc_info=True)
+        logger.critical("Falha crítica durante o seed: %s", e, exc_info=True)
 
 
 if __name__ == "__main__":
-    run_seed()
+    run_seed("sync" if "--sync" in sys.argv[1:] else SEED_MODE)
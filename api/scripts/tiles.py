@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+from app.logging_config import setup_logging
+from app.database import AsyncSessionLocal, engine
+from app.services.dataset_version import read_dataset_version
+from app.services.farm_grid import lonlat_to_tile
+from app import crud
+
+# Initialize structured logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "farms"
+
+
+def get_dataset_bbox():
+    """Extent (min_lon, min_lat, max_lon, max_lat) of every farm in the table."""
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            f"SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e) "
+            f"FROM (SELECT ST_Extent(geometry) AS e FROM {TABLE_NAME}) t")).first()
+    return tuple(row) if row and row[0] is not None else None
+
+
+async def pregenerate(min_zoom: int, max_zoom: int, bbox=None):
+    """Renders every tile covering the bbox for the zoom range into the tile cache."""
+    with engine.connect() as conn:
+        version = read_dataset_version(conn)
+
+    bbox = bbox or get_dataset_bbox()
+    if bbox is None:
+        logger.warning("Nenhuma fazenda encontrada. Nada a gerar.")
+        return
+
+    min_lon, min_lat, max_lon, max_lat = bbox
+    async with AsyncSessionLocal() as db:
+        for z in range(min_zoom, max_zoom + 1):
+            start = time.perf_counter()
+            x0, y0 = lonlat_to_tile(min_lon, max_lat, z)
+            x1, y1 = lonlat_to_tile(max_lon, min_lat, z)
+            total = 0
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    await crud.get_cached_tile(db, version, z, x, y)
+                    total += 1
+            logger.info(
+                "Zoom %s: %s tiles gerados em %.1fs (versão %s)",
+                z, total, time.perf_counter() - start, version)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Pré-gera tiles vetoriais (MVT) das fazendas no cache.")
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, default=12)
+    parser.add_argument(
+        "--bbox", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+        help="Área a ser gerada (padrão: extensão de todas as fazendas)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(pregenerate(args.min_zoom, args.max_zoom, args.bbox))
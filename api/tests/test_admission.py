@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from app.crud import Explain
+from app.models.farm import Farm
+from app.services import admission
+from app.services.admission import CancelOnDisconnectMiddleware, Limiter
+
+
+def test_limiter_sheds_with_429_and_503():
+    async def scenario():
+        limiter = Limiter("teste", 1, max_waiting=1, timeout=0.05)
+        held = await limiter.acquire()
+
+        # The waiting request gives up after the timeout
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # The queue is full: shed right away
+        with pytest.raises(HTTPException) as full:
+            await limiter.acquire()
+        with pytest.raises(HTTPException) as timeout:
+            await waiter
+
+        held.release()
+        held.release()
+        async with limiter.slot():
+            in_use = limiter.stats()["in_use"]
+        return full.value, timeout.value, in_use, limiter.stats()
+
+    full, timeout, in_use, stats = asyncio.run(scenario())
+    assert full.status_code == 429 and full.headers["Retry-After"]
+    assert timeout.status_code == 503
+    assert in_use == 1
+    assert stats == {"limit": 1, "in_use": 0, "waiting": 0, "rejected": 1, "timeouts": 1}
+
+
+def test_cost_above_max_is_rejected():
+    admission.check_cost(admission.QUERY_COST_MAX)
+    with pytest.raises(HTTPException) as exc:
+        admission.check_cost(admission.QUERY_COST_MAX + 1)
+    assert exc.value.status_code == 413
+
+
+def test_explain_keeps_the_query_parameters():
+    query = select(Farm.imovel_code).where(Farm.city == "Andradina")
+    sql = str(Explain(query).compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    assert "%(city_1)s" in sql
+
+
+def test_disconnect_cancels_the_handler():
+    async def scenario():
+        cancelled = asyncio.Event()
+
+        async def handler(scope, receive, send):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        middleware = CancelOnDisconnectMiddleware(handler)
+        await asyncio.wait_for(middleware({"type": "http", "method": "GET"}, receive, send), 1)
+        return cancelled.is_set()
+
+    assert asyncio.run(scenario())
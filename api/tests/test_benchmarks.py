@@ -0,0 +1,29 @@
+import shapely
+from pyproj import Geod
+from benchmarks import synthetic
+from benchmarks.report import summarize
+
+
+def test_synthetic_farms_are_valid_and_reproducible():
+    (frame, polygons), = synthetic.chunks(200, seed=7)
+    (_, again), = synthetic.chunks(200, seed=7)
+    sites = synthetic.farm_sites(200, seed=7)
+
+    assert shapely.is_valid(polygons).all()
+    assert shapely.equals(polygons, again).all()
+    assert frame["imovel_code"].is_unique
+    # The centre used by the load driver is inside its farm
+    assert shapely.contains(polygons, shapely.points(sites[["longitude", "latitude"]].to_numpy())).all()
+    # Geodesic area matches the generated area_size (ha)
+    area_ha = abs(Geod(ellps="WGS84").geometry_area_perimeter(polygons[0])[0]) / 10000
+    assert abs(area_ha - frame["area_size"].iloc[0]) / frame["area_size"].iloc[0] < 0.02
+
+
+def test_summary_percentiles_and_throughput():
+    summary = summarize([i / 1000 for i in range(1, 101)], elapsed=2)
+
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 50.5
+    assert summary["p99_ms"] > summary["p95_ms"] > summary["p50_ms"]
+    assert summary["throughput_rps"] == 50
+    assert summarize([]) == {"count": 0}
@@ -0,0 +1,71 @@
+import io
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+import pytest
+import shapely
+from fastapi import HTTPException
+from app.services import binary_formats
+from app.services.binary_formats import ARROW_STREAM, FLATGEOBUF, PARQUET, encode, negotiate, parse_accept
+
+KEYS = ["imovel_code", "city", "area_size", "geometry"]
+ROWS = [
+    ("SP-1", "Andradina", 12.5, shapely.to_wkb(shapely.box(-51.1, -21.1, -51.0, -21.0))),
+    ("SP-2", None, None, shapely.to_wkb(shapely.Point(-51.0, -21.0))),
+]
+
+
+def test_accept_is_ranked_by_quality():
+    accept = "application/json;q=0.5, application/flatgeobuf, text/html;q=0"
+    assert parse_accept(accept) == ["application/flatgeobuf", "application/json"]
+
+
+def test_negotiation_defaults_to_json(monkeypatch):
+    monkeypatch.setattr(binary_formats, "is_available", lambda media_type: media_type == FLATGEOBUF)
+
+    assert negotiate(None) is None
+    assert negotiate("*/*") is None
+    assert negotiate(f"{PARQUET}, application/json;q=0.1") is None
+    assert negotiate(f"{ARROW_STREAM}, {FLATGEOBUF};q=0.5") == FLATGEOBUF
+
+    # Only formats whose library is missing: not acceptable
+    with pytest.raises(HTTPException) as exc:
+        negotiate(ARROW_STREAM)
+    assert exc.value.status_code == 406
+
+
+def test_flatgeobuf_keeps_rows_and_order():
+    content = encode(FLATGEOBUF, KEYS, ROWS)
+
+    meta, _, geometry, fields = pyogrio.raw.read(io.BytesIO(content))
+    assert list(meta["fields"]) == ["imovel_code", "city", "area_size"]
+    assert list(fields[0]) == ["SP-1", "SP-2"]
+    assert shapely.from_wkb(geometry[1]).geom_type == "Point"
+
+
+def test_geoparquet_metadata_and_wkb_geometry():
+    table = pq.read_table(io.BytesIO(encode(PARQUET, KEYS, ROWS)))
+    assert b"geo" in table.schema.metadata
+    assert table.column("imovel_code").to_pylist() == ["SP-1", "SP-2"]
+    assert shapely.from_wkb(table.column("geometry")[0].as_py()).geom_type == "Polygon"
+
+
+def test_arrow_stream_keeps_rows_and_nulls():
+    table = pa.ipc.open_stream(io.BytesIO(encode(ARROW_STREAM, KEYS, ROWS))).read_all()
+
+    assert table.column_names == KEYS
+    assert table.column("city").to_pylist() == ["Andradina", None]
+    assert shapely.from_wkb(table.column("geometry")[1].as_py()).geom_type == "Point"
+
+
+def test_flatgeobuf_file_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(binary_formats, "FILE_CHUNK_SIZE", 64)
+    writer = binary_formats.encoder(FLATGEOBUF, KEYS)
+    writer.write(ROWS)
+    chunks = list(writer.finish())
+    writer.close()
+
+    assert len(chunks) > 1 and all(len(c) <= 64 for c in chunks)
+    assert b"".join(chunks) == encode(FLATGEOBUF, KEYS, ROWS)
+    assert not os.path.exists(writer.directory)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from app import crud
+from app.schemas.farm import PointSearch
+from app.services.cache import LRUCache, QueryCache, RedisCache
+
+
+class FakeRedis:
+    """Local stand-in with the subset of the redis.asyncio client used by RedisCache"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        for key in [k for k in list(self.data) if k.startswith(prefix)]:
+            yield key
+
+
+def load_counter(value):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return value
+    return loader, calls
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+
+    async def scenario():
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+        return await cache.get("b"), await cache.get("a")
+
+    assert asyncio.run(scenario()) == (None, 1)
+    assert cache.stats.evictions == 1
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_entries=10, ttl=0.01)
+    asyncio.run(cache.set("a", 1))
+    time.sleep(0.02)
+
+    assert asyncio.run(cache.get("a")) is None
+    assert cache.stats.expirations == 1
+
+
+def test_query_cache_rounds_coordinates_and_city():
+    cache = QueryCache(LRUCache(), precision=4)
+    loader, calls = load_counter([{"imovel_code": "SP-1"}])
+
+    first = cache.normalize({"latitude": -22.123401, "longitude": -47.5, "city": " Campinas"})
+    second = cache.normalize({"latitude": -22.123449, "longitude": -47.5, "city": "campinas "})
+    asyncio.run(cache.get_or_load("point", first, loader))
+    result = asyncio.run(cache.get_or_load("point", second, loader))
+
+    assert result == [{"imovel_code": "SP-1"}]
+    assert len(calls) == 1
+    assert asyncio.run(cache.stats())["hits"] == 1
+
+
+def test_query_cache_invalidated_on_new_version():
+    cache = QueryCache(RedisCache(FakeRedis()))
+    loader, calls = load_counter({"imovel_code": "SP-1", "area_size": 10.5})
+
+    asyncio.run(cache.get_or_load("id", {"id": "SP-1"}, loader))
+    assert asyncio.run(cache.get_or_load("id", {"id": "SP-1"}, loader)) == {"imovel_code": "SP-1", "area_size": 10.5}
+
+    cache.on_version_change(2)
+    asyncio.run(cache.get_or_load("id", {"id": "SP-1"}, loader))
+
+    assert len(calls) == 2
+    # The old entry is left to its TTL, only the new version's one is live
+    assert len(cache.backend.client.data) == 2
+    assert asyncio.run(cache.stats())["entries"] == 1
+
+
+def test_coordinates_are_exact_without_cache(monkeypatch):
+    payload = PointSearch(latitude=-22.1234567, longitude=-47.7654321)
+
+    monkeypatch.setattr(crud, "query_cache", QueryCache(None))
+    assert crud.cache_params(payload)[1].latitude == -22.1234567
+
+    monkeypatch.setattr(crud, "query_cache", QueryCache(LRUCache(), precision=5))
+    assert crud.cache_params(payload)[1].latitude == -22.12346
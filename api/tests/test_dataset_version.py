@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from app.services.dataset_version import DatasetVersionWatcher
+
+
+class FakeBind:
+    """Engine stand-in whose dataset_version table holds a settable version"""
+
+    def __init__(self, version):
+        self.version = version
+
+    @contextmanager
+    def connect(self):
+        bind = self
+
+        class Result:
+            def scalar(self):
+                return bind.version
+
+        class Connection:
+            def execute(self, statement):
+                return Result()
+        yield Connection()
+
+
+def test_watcher_subscriptions_survive_lifespan_restarts():
+    watcher = DatasetVersionWatcher(bind=None)
+    versions = []
+    watcher.subscribe(versions.append)
+    watcher.subscribe(versions.append)
+    assert len(watcher._callbacks) == 1
+
+    watcher.stop()
+    assert watcher._callbacks == [] and watcher.version is None
+
+
+def test_subscribers_notified_once_per_version():
+    bind = FakeBind(3)
+    watcher = DatasetVersionWatcher(bind)
+    versions = []
+    watcher.subscribe(versions.append)
+
+    watcher.check()
+    watcher.check()
+    bind.version = 4
+    watcher.check()
+    assert versions == [3, 4]
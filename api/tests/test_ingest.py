@@ -0,0 +1,149 @@
+import io
+import re
+from contextlib import contextmanager
+import geopandas
+import pandas as pd
+import pytest
+import shapely
+import shapely.affinity
+from sqlalchemy.dialects import postgresql
+from app.crud import apply_extra_filters, get_base_select
+from app.schemas.farm import FilterParams
+from app.services import simplification
+from benchmarks import synthetic
+from scripts import ingest
+
+FARMS = 25
+
+
+@pytest.fixture(scope="module")
+def sicar_file(tmp_path_factory):
+    """Small shapefile with the SICAR column names, in SIRGAS 2000 like the real downloads"""
+    (frame, polygons), = synthetic.chunks(FARMS, seed=3)
+    frame = frame.rename(columns={target: source for source, target in ingest.COLUMN_MAPPING.items()})
+    path = tmp_path_factory.mktemp("sicar") / "AREA_IMOVEL_1.shp"
+    geopandas.GeoDataFrame(frame, geometry=polygons, crs="EPSG:4326").to_crs("EPSG:4674").to_file(path)
+    return str(path), list(frame["cod_imovel"])
+
+
+def read_payload(payload: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(payload), header=None, names=[name for name, _ in ingest.COLUMNS])
+
+
+def test_transform_chunk_follows_the_copy_columns(sicar_file):
+    path, codes = sicar_file
+    payload, rows = ingest.transform_chunk(path, 0, FARMS)
+    frame = read_payload(payload)
+
+    assert rows == len(frame) == FARMS
+    assert list(frame["imovel_code"]) == codes
+    assert (frame["state_code"] == "SP").all()
+    # Hex EWKB in WGS84 with the SRID, then the md5 of the row
+    geometries = shapely.from_wkb(frame["geometry"])
+    assert (shapely.get_srid(geometries) == 4326).all()
+    assert shapely.bounds(geometries)[:, 0].min() > -54
+    assert frame["row_hash"].str.fullmatch("[0-9a-f]{32}").all()
+
+
+def test_chunk_boundaries_keep_every_row_once(sicar_file):
+    path, codes = sicar_file
+    chunked = [
+        read_payload(ingest.transform_chunk(path, offset, 7)[0])["imovel_code"]
+        for offset in range(0, FARMS, 7)
+    ]
+
+    assert list(pd.concat(chunked)) == codes
+    assert ingest.transform_chunk(path, FARMS, 7) == (b"", 0)
+
+
+def row_hashes(frame, polygons):
+    return read_payload(ingest.copy_payload(frame, polygons)[0])["row_hash"]
+
+
+def test_row_hash_is_stable_and_tracks_changes():
+    (frame, polygons), = synthetic.chunks(3, seed=5)
+    hashes = row_hashes(frame, polygons)
+    assert hashes.equals(row_hashes(frame.copy(), polygons.copy()))
+
+    # An attribute change only touches the hash of its farm
+    edited = frame.copy()
+    edited.loc[edited.index[0], "status"] = "CA"
+    assert (row_hashes(edited, polygons) != hashes).tolist() == [True, False, False]
+
+    moved = polygons.copy()
+    moved[1] = shapely.affinity.translate(moved[1], xoff=0.001)
+    assert (row_hashes(frame, moved) != hashes).tolist() == [False, True, False]
+
+
+def test_converted_legacy_rows_are_found_by_the_city_filter():
+    # A row of the flat table from before city_norm/levels/row_hash existed
+    polygon = shapely.box(-49.40, -20.82, -49.38, -20.80)
+    rows = [("SP-3549805-ABC", "São José do Rio Preto", "SP", 120.5, 20.0, "AT", "IRU", "2020-01-01",
+             shapely.to_wkb(polygon))]
+    converted = read_payload(ingest.copy_payload(*ingest.legacy_frame(rows))[0]).iloc[0]
+
+    sql = str(apply_extra_filters(get_base_select(), FilterParams(city="SAO JOSÉ")).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    pattern = re.search(r"city_norm LIKE '%+(.*?)%+'", sql).group(1)
+    assert pattern in converted["city_norm"]
+    assert pd.notna(converted[simplification.level_column(simplification.SIMPLIFY_ZOOMS[0])])
+    assert len(converted["row_hash"]) == 32
+
+
+def test_chunk_task_reports_the_worker_peak_memory(sicar_file):
+    path, _ = sicar_file
+    payload, rows, peak = ingest.chunk_task(path, 0, 5)
+
+    assert rows == 5 and payload
+    # In-process here: the peak of this process so far, in MB
+    assert 0 < peak <= ingest.peak_memory_mb()
+
+
+class RecordingConnection:
+    """Connection stand-in: serves the recorded changes in pages and logs every statement"""
+
+    def __init__(self, changes):
+        self.changes = sorted(changes)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append((sql, params))
+        rows = []
+        if sql.startswith(f"SELECT imovel_code, op FROM {ingest.CHANGES_TABLE}"):
+            rows = [c for c in self.changes if c[0] > params["last"]][:params["size"]]
+        return type("Result", (), {"all": lambda _: rows})()
+
+
+def test_changes_are_applied_in_the_callers_transaction(monkeypatch):
+    monkeypatch.setattr(ingest, "SYNC_BATCH_SIZE", 2)
+    conn = RecordingConnection([("SP-1", "I"), ("SP-2", "D"), ("SP-3", "U"), ("SP-4", "D"), ("SP-5", "U")])
+
+    assert ingest.apply_changes(conn, "SP") == 3
+    writes = [(sql.split()[0], params["codes"]) for sql, params in conn.statements if not sql.startswith("SELECT")]
+    assert writes == [
+        ("DELETE", ["SP-2"]), ("INSERT", ["SP-1"]),
+        ("DELETE", ["SP-4"]), ("INSERT", ["SP-3"]),
+        ("INSERT", ["SP-5"]),
+    ]
+    upsert = next(sql for sql, _ in conn.statements if sql.startswith("INSERT"))
+    assert "INTO farms_sp " in upsert and "FROM farms_sp_staging" in upsert
+    assert "ON CONFLICT (imovel_code, state_code) DO UPDATE" in upsert and "state_code = EXCLUDED" not in upsert
+
+
+def test_change_detection_compares_hashes_with_the_state_partition(monkeypatch):
+    conn = RecordingConnection([])
+
+    class Engine:
+        @contextmanager
+        def begin(self):
+            yield conn
+    monkeypatch.setattr(ingest, "engine", Engine())
+
+    assert ingest.build_changes("MG") == {"I": 0, "U": 0, "D": 0}
+    sql = " ".join(" ".join(statement.split()) for statement, _ in conn.statements)
+    # Duplicated codes of the file are dropped before the diff
+    assert "DELETE FROM farms_mg_staging a USING farms_mg_staging b" in sql
+    assert "LEFT JOIN farms_mg f ON f.imovel_code = s.imovel_code" in sql
+    assert "f.imovel_code IS NULL OR f.row_hash IS DISTINCT FROM s.row_hash" in sql
+    assert "SELECT f.imovel_code, 'D' FROM farms_mg f WHERE NOT EXISTS" in sql
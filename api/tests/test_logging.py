@@ -0,0 +1,66 @@
+import json
+import logging
+import queue
+import sys
+from fastapi.testclient import TestClient
+from app.main import app
+from app.logging_config import (
+    NonBlockingQueueHandler, RequestIdFilter, SamplingFilter, StructuredFormatter,
+    parse_sample_rates, request_id_var,
+)
+
+
+def make_record(name, level=logging.INFO, msg="Busca %s finalizada", args=("raio",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_sampling_uses_most_specific_logger():
+    sampler = SamplingFilter(parse_sample_rates("app=1,app.routers.farms=0"))
+
+    assert not sampler.filter(make_record("app.routers.farms"))
+    assert sampler.filter(make_record("app.crud"))
+    # Warnings are never sampled out
+    assert sampler.filter(make_record("app.routers.farms", level=logging.WARNING))
+
+
+def test_formatter_renders_lazy_args_and_request_id():
+    record = make_record("app.crud")
+    token = request_id_var.set("abc123")
+    RequestIdFilter().filter(record)
+    request_id_var.reset(token)
+
+    output = json.loads(StructuredFormatter().format(record))
+    assert output["message"] == "Busca raio finalizada"
+    assert output["request_id"] == "abc123"
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    before = NonBlockingQueueHandler.dropped
+    handler.handle(make_record("app.crud"))
+    handler.handle(make_record("app.crud"))
+
+    assert NonBlockingQueueHandler.dropped == before + 1
+
+
+def test_queued_record_is_formatted_at_the_call():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    ids = ["SP-1"]
+    handler.handle(make_record("app.crud", msg="Imóveis %s", args=(ids,)))
+    ids.append("SP-2")
+    try:
+        raise ValueError("falha")
+    except ValueError:
+        record = make_record("app.crud", level=logging.ERROR, msg="Erro", args=())
+        record.exc_info = sys.exc_info()
+        handler.handle(record)
+
+    first, second = (json.loads(StructuredFormatter().format(handler.queue.get_nowait())) for _ in range(2))
+    assert first["message"] == "Imóveis ['SP-1']"
+    assert "ValueError: falha" in second["exception"]
+
+
+def test_request_id_is_echoed():
+    client = TestClient(app)
+    assert client.get("/", headers={"X-Request-ID": "req-1"}).headers["x-request-id"] == "req-1"
+    assert len(client.get("/").headers["x-request-id"]) == 32
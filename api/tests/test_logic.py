@@ -1,5 +1,17 @@
 import json
-from app.crud import format_records
+import numpy as np
+import pytest
+import shapely
+from sqlalchemy.dialects import postgresql
+from fastapi import HTTPException
+from app.crud import (
+    apply_extra_filters, build_area_query, build_by_ids_query, build_nearest_bound_query, build_nearest_within_query,
+    build_point_query, format_feature, format_records, get_base_select, join_features)
+from app.schemas.farm import AreaSearch, FilterParams, PointSearch
+from app.services.cursors import decode_cursor, encode_cursor
+from app.services.farm_grid import GRID_MAX_ZOOM, cell_range, cell_zoom, lonlat_to_tile, tile_bounds
+from app.services.state_extents import StateExtents, state_extents, state_of
+from scripts.overlaps import overlap_rows
 
 
 def test_format_records_with_invalid_geometry():
@@ -40,3 +52,160 @@ def test_format_records_success():
     assert len(formatted) == 1
     assert formatted[0]["imovel_code"] == "456"
     assert formatted[0]["geometry"]["type"] == "Point"
+
+
+def test_cursor_round_trip_and_validation():
+    """ Tests if the keyset cursor keeps the sort keys and rejects foreign tokens"""
+    token = encode_cursor([1520.5, "SP-123"])
+    assert decode_cursor(token, 2) == [1520.5, "SP-123"]
+
+    # A radius cursor can't be used in a point search (different sort keys)
+    with pytest.raises(HTTPException):
+        decode_cursor(token, 1)
+    with pytest.raises(HTTPException):
+        decode_cursor("not-a-cursor", 1)
+
+
+@pytest.mark.parametrize("values", [[1], [None], ["1520.5", "SP-123"], [float("inf"), "SP-123"], [True, "SP-1"]])
+def test_cursor_with_wrong_key_types_is_rejected(values):
+    """ A tampered cursor with the right length but wrong types is a 400, not a failed comparison"""
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(encode_cursor(values), len(values))
+    assert error.value.status_code == 400
+
+
+def test_export_feature_splices_geometry():
+    """ Tests if export features keep the PostGIS geometry text untouched"""
+    class MockRecord:
+        def _asdict(self):
+            return {"imovel_code": "789", "city": "Andradina",
+                    "geometry": '{"type":"Point","coordinates":[-51.0,-21.0]}'}
+
+    features = [format_feature(MockRecord()), format_feature(MockRecord())]
+    collection = json.loads(
+        '{"type":"FeatureCollection","features":[' + join_features(features, False, True) + "]}")
+    lines = join_features(features, True, True).splitlines()
+
+    assert collection["features"][0]["geometry"]["coordinates"] == [-51.0, -21.0]
+    assert collection["features"][1]["properties"]["imovel_code"] == "789"
+    assert json.loads(lines[1])["type"] == "Feature"
+
+
+def test_city_filter_uses_normalized_column():
+    query = apply_extra_filters(get_base_select(), FilterParams(city=" Águas_de "))
+    compiled = query.compile()
+
+    assert "farms.city_norm LIKE" in str(compiled)
+    assert compiled.params["city_norm_1"] == "%aguas\\_de%"
+
+
+def test_projection_is_pushed_down_to_sql():
+    payload = PointSearch(latitude=-21.0, longitude=-51.0, fields=["area_size"], geometry="centroid")
+    sql = str(build_point_query(payload).compile())
+    columns = sql.split(" FROM ")[0]
+
+    assert "farms.area_size" in columns and "farms.city" not in columns
+    assert "ST_AsGeoJSON(ST_Centroid(farms.geometry))" in columns
+
+    payload = PointSearch(latitude=-21.0, longitude=-51.0, geometry="none")
+    assert "ST_AsGeoJSON" not in str(build_point_query(payload).compile())
+
+
+def test_zoom_reads_precomputed_level():
+    payload = PointSearch(latitude=-21.0, longitude=-51.0, zoom=5)
+    sql = str(build_point_query(payload).compile())
+
+    assert "coalesce(farms.geom_z6, farms.geometry)" in sql
+
+
+def test_grid_cells_cover_the_bbox():
+    # 8x8 cells per map tile, capped at the finest level of the pyramid
+    assert cell_zoom(4) == 7
+    assert cell_zoom(20) == GRID_MAX_ZOOM
+
+    # North-west corner -> smallest x and y (y grows to the south)
+    x0, y0, x1, y1 = cell_range((-53.0, -25.0, -44.0, -19.0), 7)
+    assert x0 <= x1 and y0 <= y1
+    assert cell_range((-180.0, -90.0, 180.0, 90.0), 0) == (0, 0, 0, 0)
+
+
+def test_area_query_subdivides_and_prefilters():
+    payload = AreaSearch(bbox=[-51.1, -21.1, -51.0, -21.0], intersection=True)
+    sql = str(build_area_query(payload, shapely.box(*payload.bbox)).compile())
+
+    assert "ST_Subdivide" in sql
+    assert "&&" in sql and "ST_Intersects" in sql
+    assert "intersection_area_m2" in sql
+
+
+def test_bulk_lookup_binds_a_single_array():
+    sql = str(build_by_ids_query(["SP-1", "SP-2"]).compile(dialect=postgresql.dialect()))
+
+    assert "farms.imovel_code = ANY (%(ids)s::VARCHAR[])" in sql
+
+
+def test_nearest_second_pass_is_bounded_by_geodesic_distance():
+    sql = str(build_nearest_within_query(-21.0, -51.0, 5, 1500.0).compile(dialect=postgresql.dialect()))
+
+    # Index probe by the circle bbox, exact geography distance, ranked by it (no planar <->)
+    assert "&&" in sql and "ST_DWithin" in sql and "<->" not in sql
+    assert 'ORDER BY distance_m, farms.imovel_code COLLATE "C"' in sql
+
+
+def test_nearest_first_pass_reads_no_geometry():
+    sql = str(build_nearest_bound_query(-21.0, -51.0, 5).compile(dialect=postgresql.dialect()))
+
+    assert "<->" in sql and "max(nearest.distance_m)" in sql
+    assert "ST_AsGeoJSON" not in sql
+
+
+def test_overlap_crossing_tiles_is_written_once():
+    zoom = 10
+    x, y = lonlat_to_tile(-51.0, -21.0, zoom)
+    east = tile_bounds(zoom, x, y)[2]
+    # A and B overlap across the east border of the tile, C only touches B
+    farms = {
+        "A": shapely.box(east - 0.02, -21.0, east + 0.01, -20.99),
+        "B": shapely.box(east - 0.005, -21.005, east + 0.02, -20.995),
+        "C": shapely.box(east + 0.02, -21.0, east + 0.03, -20.99),
+    }
+
+    rows = []
+    for tx in range(x - 1, x + 3):
+        for ty in range(y - 1, y + 2):
+            tile = shapely.box(*tile_bounds(zoom, tx, ty))
+            read = {code: g for code, g in farms.items() if shapely.intersects(g.envelope, tile)}
+            rows += overlap_rows(list(read), np.array(list(read.values()), dtype=object), zoom, tx, ty)
+
+    assert sorted((a, b) for a, b, _, _ in rows) == [("A", "B"), ("B", "A")]
+    (_, _, area, ratio_a), (_, _, _, ratio_b) = rows
+    assert 8.5e5 < area < 8.8e5
+    assert ratio_a == pytest.approx(0.25, rel=1e-3) and ratio_b == pytest.approx(0.30, rel=1e-3)
+
+
+@pytest.fixture
+def known_states():
+    previous = state_extents.extents
+    state_extents.load([("SP", -53.1, -25.3, -44.2, -19.8), ("MG", -51.1, -22.9, -39.9, -14.2)])
+    yield
+    state_extents.extents = previous
+
+
+def test_state_extents_pick_intersecting_states():
+    extents = StateExtents()
+    assert extents.states_for((-47.0, -23.0, -47.0, -23.0)) is None
+
+    extents.load([("SP", -53.1, -25.3, -44.2, -19.8), ("MG", -51.1, -22.9, -39.9, -14.2)])
+    assert extents.states_for((-47.0, -24.0, -47.0, -24.0)) == ["SP"]
+    assert extents.states_for((-46.0, -21.0, -45.0, -20.0)) == ["MG", "SP"]
+    assert extents.states_for((-60.0, -10.0, -59.0, -9.0)) == []
+    assert state_of("SP-3502101-ABC") == "SP" and state_of("3502101") is None
+    assert extents.states_of(["SP-1", "MG-2"]) == ["MG", "SP"]
+    assert extents.states_of(["SP-1", "XX-2"]) is None
+
+
+def test_point_query_prunes_state_partitions(known_states):
+    sql = str(build_point_query(PointSearch(latitude=-24.0, longitude=-47.0)).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    assert "farms.state_code = ANY (ARRAY['SP'])" in sql
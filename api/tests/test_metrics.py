@@ -0,0 +1,70 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app import crud
+from app.main import app
+from app.services.metrics import Histogram
+from app.services.pool_stats import PoolTelemetry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Teste.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "db")
+    histogram.observe(0.5, "db")
+    histogram.observe(5.0, "db")
+
+    text = histogram.render()
+    assert 'test_seconds_bucket{stage="db",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="db",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{stage="db",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="db"} 3' in text
+
+
+def test_server_timing_header_and_metrics_endpoint():
+    client = TestClient(app)
+    response = client.get("/")
+    assert "total;dur=" in response.headers["server-timing"]
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert 'meuat_request_duration_seconds_count{method="GET",route="/",status="200"}' in metrics.text
+
+
+def test_pool_telemetry_tracks_waiting_checkouts():
+    telemetry = PoolTelemetry()
+    with telemetry.checkout():
+        assert telemetry.waiting == 1
+
+    stats = telemetry.stats(object())
+    assert stats["waiting"] == 0 and stats["checkouts"] == 1
+    # A pool without counters (NullPool) still reports the checkout telemetry
+    assert stats["size"] is None
+
+
+def test_checkout_is_timed_once_per_transaction(monkeypatch):
+    telemetry = PoolTelemetry()
+    monkeypatch.setattr(crud, "pool_telemetry", telemetry)
+
+    class Session:
+        """Holds its connection from the first acquisition until the transaction ends"""
+        active = False
+
+        def in_transaction(self):
+            return self.active
+
+        async def connection(self):
+            self.active = True
+
+    async def requests():
+        db = Session()
+        for _ in range(3):
+            await crud.checkout(db)
+
+    asyncio.run(requests())
+    assert telemetry.checkouts == 1
+
+
+def test_pool_stats_endpoint():
+    response = TestClient(app).get("/pool/stats")
+
+    assert response.status_code == 200
+    assert {"size", "in_use", "idle", "waiting", "checkout_avg_ms"} <= set(response.json()["async"])
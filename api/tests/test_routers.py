@@ -4,7 +4,7 @@ from unittest.mock import MagicMock
 
 # Importação absoluta (ajustada para o PYTHONPATH=api)
 from app.main import app
-from app.database import get_db
+from app.database import get_async_db, get_db
 
 
 @pytest.fixture
@@ -15,6 +15,7 @@ def client():
     def override_get_db():
         yield mock_db
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_db
 
     # Criamos o cliente usando a sintaxe mais segura para evitar o TypeError
     c = TestClient(app)
@@ -44,3 +45,63 @@ def test_pagination_invalid_values(client):
     response = client.post("/fazendas/busca-raio", json=payload)
     # Se retornar 422, o seu Pydantic (ge=1) está funcionando!
     assert response.status_code == 422
+
+
+def test_tile_out_of_range(client):
+    # At zoom 1 there are only tiles 0 and 1 on each axis
+    response = client.get("/fazendas/tiles/1/2/0.pbf")
+    assert response.status_code == 400
+
+
+def test_export_requires_complete_point(client):
+    # A radius without a center point can't be exported
+    response = client.post("/fazendas/export", json={"raio_km": 10})
+    assert response.status_code == 400
+
+
+def test_batch_point_rejects_empty_list(client):
+    response = client.post("/fazendas/busca-ponto/lote", json={"pontos": []})
+    assert response.status_code == 422
+
+
+def test_nearest_is_not_taken_as_id(client):
+    # "/proximas" must not be routed to the get-by-id endpoint
+    response = client.get("/fazendas/proximas", params={"lat": 100, "lon": 0})
+    assert response.status_code == 400
+
+
+def test_cities_autocomplete(client, monkeypatch):
+    from app.services.cities import city_index
+    monkeypatch.setattr(city_index, "entries", ([], []))
+    city_index.load(["São Paulo", "São José dos Campos", "Santos", "Sorocaba"])
+
+    response = client.get("/fazendas/municipios", params={"q": "SAO"})
+    assert response.status_code == 200
+    assert response.json() == ["São José dos Campos", "São Paulo"]
+
+
+def test_grid_rejects_invalid_bbox(client):
+    # Malformed, out of range and inverted bboxes never reach the database
+    for bbox in ["-51,-21,-50", "-51,-91,-50,-20", "-50,-21,-51,-20"]:
+        response = client.get("/fazendas/agregados", params={"bbox": bbox, "zoom": 5})
+        assert response.status_code == 400
+
+
+def test_area_search_requires_a_single_valid_area(client):
+    square = {"type": "Polygon", "coordinates": [[[-51, -21], [-50, -21], [-50, -20], [-51, -20], [-51, -21]]]}
+    bowtie = {"type": "Polygon", "coordinates": [[[-51, -21], [-50, -20], [-50, -21], [-51, -20], [-51, -21]]]}
+    for payload in [{}, {"area": square, "bbox": [-51, -21, -50, -20]}, {"area": bowtie},
+                    {"area": {"type": "Point", "coordinates": [-51, -21]}}]:
+        response = client.post("/fazendas/busca-area", json=payload)
+        assert response.status_code == 400
+
+
+def test_overlaps_of_unknown_farm(client, monkeypatch):
+    from app import crud
+
+    async def missing(db, farm_id):
+        return None
+    monkeypatch.setattr(crud, "get_overlaps_async", missing)
+
+    response = client.get("/fazendas/SP-123/sobreposicoes")
+    assert response.status_code == 404
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from app.crud import format_records
+from app.schemas.farm import FarmResponse
+from app.services.serializers import dump_farm, dump_farms, dump_farms_by_index, stream_lookup
+
+
+def make_record(code):
+    """Record as returned by the async crud functions (raw GeoJSON text)"""
+    return {
+        "imovel_code": code, "city": "Andradina", "state_code": "SP",
+        "area_size": 12.5, "fiscal_module": 0.6, "status": "AT",
+        "type": "IRU", "created_at": "2020-01-01",
+        "geometry": '{"type":"Polygon","coordinates":[[[-51,-21],[-51,-20],[-50,-20],[-51,-21]]]}',
+        "distance_m": 10.0,
+    }
+
+
+def test_fast_path_matches_validated_response():
+    """ Tests if the spliced JSON has the same shape of the FarmResponse output"""
+    records = [make_record("SP-1"), make_record("SP-2")]
+    validated = [FarmResponse(**r).model_dump(exclude_unset=True) for r in format_records(records)]
+
+    assert json.loads(dump_farms(records)) == validated
+
+
+def test_fast_path_accepts_parsed_geometry():
+    record = make_record("SP-3")
+    parsed = format_records([dict(record)])[0]
+
+    assert dump_farm(parsed) == dump_farm(record)
+
+
+def test_batch_output_keyed_by_input_index():
+    groups = {0: [make_record("SP-1")], 1: []}
+    body = json.loads(dump_farms_by_index(groups))
+
+    assert list(body) == ["0", "1"]
+    assert body["0"][0]["geometry"]["type"] == "Polygon"
+    assert body["1"] == []
+
+
+def test_fast_path_writes_only_projected_fields():
+    record = {"imovel_code": "SP-1", "area_size": 12.5}
+
+    assert json.loads(dump_farm(record)) == {"imovel_code": "SP-1", "area_size": 12.5}
+
+
+def test_lookup_stream_lists_farms_and_missing_ids():
+    async def chunks():
+        yield [make_record("SP-1")], ["SP-X"]
+        yield [], ["SP-Y"]
+        yield [make_record("SP-2")], []
+
+    async def collect():
+        return b"".join([part async for part in stream_lookup(chunks())])
+
+    body = json.loads(asyncio.run(collect()))
+    assert [f["imovel_code"] for f in body["farms"]] == ["SP-1", "SP-2"]
+    assert body["farms"][0] == json.loads(dump_farm(make_record("SP-1")))
+    assert body["missing"] == ["SP-X", "SP-Y"]
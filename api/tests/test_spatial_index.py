@@ -0,0 +1,156 @@
+import json
+import shapely
+from sqlalchemy.dialects import postgresql
+from app.schemas.farm import AreaSearch, BatchPointSearch, PointSearch, Projection, RadiusSearch
+from app.crud import build_point_query, next_cursor
+from app.services.spatial_index import FarmSnapshot
+
+
+def make_row(code, city, area, bounds):
+    """Mimics a row coming from crud.get_index_rows"""
+    geom = shapely.box(*bounds)
+    return {
+        "imovel_code": code, "city": city, "state_code": "SP",
+        "area_size": area, "fiscal_module": 1.0, "status": "AT",
+        "type": "IRU", "created_at": "2020-01-01",
+        "geometry": shapely.to_geojson(geom), "wkb": shapely.to_wkb(geom),
+    }
+
+
+def make_snapshot():
+    return FarmSnapshot.from_rows([
+        make_row("SP-B", "Andradina", 50.0, (-51.10, -21.10, -51.00, -21.00)),
+        make_row("SP-A", "Andradina", 10.0, (-51.05, -21.05, -50.95, -20.95)),
+        make_row("SP-C", "Castilho", 80.0, (-51.50, -21.50, -51.40, -21.40)),
+    ], version=1)
+
+
+def test_point_search_contains_and_ordering():
+    snapshot = make_snapshot()
+    results = snapshot.search_by_point(PointSearch(latitude=-21.02, longitude=-51.02))
+
+    # Both overlapping farms contain the point, ordered by imovel_code
+    assert [r["imovel_code"] for r in results] == ["SP-A", "SP-B"]
+    assert json.loads(results[0]["geometry"])["type"] == "Polygon"
+
+
+def test_point_search_filters_and_pagination():
+    snapshot = make_snapshot()
+    payload = PointSearch(latitude=-21.02, longitude=-51.02, area_min=20)
+    assert [r["imovel_code"] for r in snapshot.search_by_point(payload)] == ["SP-B"]
+
+    payload = PointSearch(latitude=-21.02, longitude=-51.02, page=2, size=1)
+    assert [r["imovel_code"] for r in snapshot.search_by_point(payload)] == ["SP-B"]
+
+
+def test_radius_search_uses_geodesic_distance():
+    snapshot = make_snapshot()
+    # SP-C is ~55km away from the point, the other farms contain it
+    near = RadiusSearch(latitude=-21.02, longitude=-51.02, radius_km=5)
+    far = RadiusSearch(latitude=-21.02, longitude=-51.02, radius_km=80, city="castilho")
+
+    assert [r["imovel_code"] for r in snapshot.search_by_radius(near)] == ["SP-A", "SP-B"]
+    assert [r["imovel_code"] for r in snapshot.search_by_radius(far)] == ["SP-C"]
+
+
+def test_cursor_pagination_matches_offset_pages():
+    snapshot = make_snapshot()
+    first = RadiusSearch(latitude=-21.02, longitude=-51.02, radius_km=80, size=2)
+    page_one = snapshot.search_by_radius(first)
+    cursor = next_cursor(page_one, first, keys=("distance_m", "imovel_code"))
+
+    second = RadiusSearch(latitude=-21.02, longitude=-51.02, radius_km=80, size=2, cursor=cursor)
+    offset = RadiusSearch(latitude=-21.02, longitude=-51.02, radius_km=80, size=2, page=2)
+
+    assert [r["imovel_code"] for r in page_one] == ["SP-A", "SP-B"]
+    assert snapshot.search_by_radius(second) == snapshot.search_by_radius(offset)
+    assert [r["imovel_code"] for r in snapshot.search_by_radius(second)] == ["SP-C"]
+
+
+def test_batch_point_search_keyed_by_index():
+    snapshot = make_snapshot()
+    payload = BatchPointSearch(pontos=[
+        {"latitude": -21.02, "longitude": -51.02},
+        {"latitude": 0.0, "longitude": 0.0},
+        {"latitude": -21.45, "longitude": -51.45},
+    ], size=1)
+
+    results = snapshot.search_by_points(payload)
+
+    assert [r["imovel_code"] for r in results[0]] == ["SP-A"]
+    assert results[1] == []
+    assert [r["imovel_code"] for r in results[2]] == ["SP-C"]
+
+
+def test_nearest_orders_by_distance():
+    snapshot = make_snapshot()
+    # Far from every farm: the search circle has to grow to find them
+    results = snapshot.search_nearest(-21.60, -51.60, 2)
+
+    assert [r["imovel_code"] for r in results] == ["SP-C", "SP-B"]
+    assert results[0]["distance_m"] < results[1]["distance_m"]
+
+
+def test_city_filter_ignores_accents_and_case():
+    snapshot = FarmSnapshot.from_rows([
+        make_row("SP-D", "São José do Rio Preto", 10.0, (-49.40, -20.85, -49.35, -20.80)),
+    ])
+    payload = PointSearch(latitude=-20.82, longitude=-49.38, city="  sao JOSE ")
+
+    assert [r["imovel_code"] for r in snapshot.search_by_point(payload)] == ["SP-D"]
+
+
+def test_projection_on_memory_backend():
+    snapshot = make_snapshot()
+    payload = PointSearch(latitude=-21.02, longitude=-51.02, fields=["city"], geometry="bbox")
+    result = snapshot.search_by_point(payload)[0]
+
+    assert set(result) == {"imovel_code", "city", "geometry"}
+    assert json.loads(result["geometry"])["type"] == "Polygon"
+
+    nearest = snapshot.search_nearest(-21.02, -51.02, 1, Projection(geometry="none"))
+    assert "geometry" not in nearest[0] and nearest[0]["distance_m"] == 0
+
+
+def test_zoom_returns_simplified_rounded_geometry():
+    circle = shapely.Point(-51.0, -21.0).buffer(0.05, quad_segs=64)
+    row = make_row("SP-Z", "Andradina", 10.0, (0, 0, 1, 1))
+    row.update(geometry=shapely.to_geojson(circle), wkb=shapely.to_wkb(circle))
+    snapshot = FarmSnapshot.from_rows([row])
+
+    full = json.loads(snapshot.search_by_point(PointSearch(latitude=-21.0, longitude=-51.0))[0]["geometry"])
+    zoomed = json.loads(snapshot.search_by_point(
+        PointSearch(latitude=-21.0, longitude=-51.0, zoom=6))[0]["geometry"])
+
+    assert len(zoomed["coordinates"][0]) < len(full["coordinates"][0])
+    assert all(round(x, 2) == x for x, _ in zoomed["coordinates"][0])
+
+
+def test_area_search_with_intersection_area():
+    snapshot = make_snapshot()
+    area = shapely.box(-51.10, -21.10, -51.00, -21.00)
+    payload = AreaSearch(bbox=[-51.10, -21.10, -51.00, -21.00], intersection=True)
+    results = {r["imovel_code"]: r for r in snapshot.search_by_area(payload, area)}
+
+    # SP-C is far away; SP-B lies inside the area and a quarter of SP-A overlaps it
+    assert sorted(results) == ["SP-A", "SP-B"]
+    full, quarter = results["SP-B"]["intersection_area_m2"], results["SP-A"]["intersection_area_m2"]
+    assert 110e6 < full < 120e6
+    assert abs(full / quarter - 4) < 0.01
+
+
+def test_code_order_matches_the_sql_collation():
+    # en_US skips hyphens ("SP1A" < "SP1B"), bytewise '-' sorts before digits and letters
+    codes = ["SP1A", "SP-1-B", "SP-1A", "SP-10"]
+    snapshot = FarmSnapshot.from_rows(
+        [make_row(code, "Andradina", 10.0, (-51.05, -21.05, -50.95, -20.95)) for code in codes], version=1)
+    payload = PointSearch(latitude=-21.0, longitude=-51.0, size=2)
+
+    first = snapshot.search_by_point(payload)
+    second = snapshot.search_by_point(payload.model_copy(update={"cursor": next_cursor(first, payload)}))
+    assert [r["imovel_code"] for r in first + second] == ["SP-1-B", "SP-10", "SP-1A", "SP1A"]
+
+    sql = str(build_point_query(payload.model_copy(update={"cursor": next_cursor(first, payload)})).compile(
+        dialect=postgresql.dialect()))
+    assert 'ORDER BY farms.imovel_code COLLATE "C"' in sql
+    assert '(farms.imovel_code COLLATE "C") > ' in sql
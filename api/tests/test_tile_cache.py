@@ -0,0 +1,23 @@
+from app.services.tile_cache import TileCache
+
+
+def test_tile_cache_memory_and_disk(tmp_path):
+    cache = TileCache(directory=str(tmp_path), max_items=1)
+    cache.put(1, 10, 1, 2, b"tile-a")
+    cache.put(1, 10, 1, 3, b"tile-b")
+
+    # The first tile was evicted from memory but is still on disk
+    assert cache.get(1, 10, 1, 2) == b"tile-a"
+    # A different dataset version never hits the old tiles
+    assert cache.get(2, 10, 1, 2) is None
+
+
+def test_tile_cache_prune_old_versions(tmp_path):
+    cache = TileCache(directory=str(tmp_path))
+    cache.put(1, 0, 0, 0, b"old")
+    cache.put(2, 0, 0, 0, b"new")
+
+    cache.prune(2)
+
+    assert cache.get(1, 0, 0, 0) is None
+    assert cache.get(2, 0, 0, 0) == b"new"